@@ -4,17 +4,34 @@ Provides machine learning capabilities for demand forecasting,
 customer segmentation, and personalized promotions.
 """
 
-from .data_preprocessing import DataPreprocessor
-from .demand_forecasting import DemandForecaster
-from .customer_segmentation import CustomerSegmentation
-from .personalized_promotions import PromotionEngine
+import importlib
 
 __version__ = "1.0.0"
 __author__ = "Walmart Analytics Team"
 
+# Public name -> submodule; submodules (and sklearn, xgboost, pandas behind
+# them) are only imported when a name is first used
+_LAZY_IMPORTS = {
+    'DataPreprocessor': 'data_preprocessing',
+    'DemandForecaster': 'demand_forecasting',
+    'CustomerSegmentation': 'customer_segmentation',
+    'PromotionEngine': 'personalized_promotions'
+}
+
 __all__ = [
     'DataPreprocessor',
     'DemandForecaster', 
     'CustomerSegmentation',
     'PromotionEngine'
 ]
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        module = importlib.import_module(f'.{_LAZY_IMPORTS[name]}', __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,160 @@
+"""
+Persistent category dictionary for Walmart Analytics Platform
+Maps category values to stable integer codes shared across models and services
+"""
+
+import pandas as pd
+import numpy as np
+import json
+import os
+from contextlib import nullcontext
+
+try:
+    from .file_lock import file_lock
+except ImportError:
+    from file_lock import file_lock
+
+# Next to the module, so every service shares one file whatever its working directory
+DEFAULT_CATEGORY_CODES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data_cache', 'category_codes.json')
+
+# Code used for missing values and categories not in the dictionary
+UNKNOWN_CODE = -1
+
+class CategoryDictionary:
+    """Append-only value -> code lists per column, shared through a JSON file
+
+    With a path, new values are appended under a lock on path + '.lock'
+    after re-reading the file, and written back at once, so processes
+    growing the dictionary concurrently never hand out the same code for
+    different values.
+    """
+
+    def __init__(self, path=None, unknown_code=UNKNOWN_CODE):
+        self.path = path
+        self.unknown_code = unknown_code
+        self.categories = {}
+        self._indexes = {}
+        self._dirty = False
+        self._merge_from_disk()
+
+    @classmethod
+    def from_categories(cls, categories, unknown_code=UNKNOWN_CODE):
+        """In-memory dictionary with the given value lists (no file)"""
+        dictionary = cls(unknown_code=unknown_code)
+        dictionary.categories = {column: list(values) for column, values in categories.items()}
+        return dictionary
+
+    def _lock(self):
+        return file_lock(self.path + '.lock') if self.path else nullcontext()
+
+    def _merge_from_disk(self):
+        """Adopt the codes on disk; values only known here go after them"""
+        if not (self.path and os.path.exists(self.path)):
+            return
+        with open(self.path) as f:
+            on_disk = json.load(f)['categories']
+        for column, values in self.categories.items():
+            known = set(on_disk.get(column, []))
+            on_disk.setdefault(column, []).extend(value for value in values if value not in known)
+        self.categories = on_disk
+        self._indexes = {}
+
+    def _index(self, column):
+        if column not in self._indexes:
+            self._indexes[column] = pd.Index(self.categories.get(column, []))
+        return self._indexes[column]
+
+    def encode(self, column, values, grow=True):
+        """Vectorized value -> code mapping for one column
+
+        Codes are positions in an append-only list, so a category keeps its
+        code forever. With grow=True unseen values are appended (in order of
+        first appearance); otherwise they map to unknown_code, as do NaNs.
+        """
+        series = pd.Series(values).reset_index(drop=True)
+        present = series.notna().to_numpy()
+        strings = series[present].astype(str)
+
+        if grow and not strings.isin(self._index(column)).all():
+            self._append(column, strings)
+
+        codes = np.full(len(series), self.unknown_code, dtype=np.int32)
+        indexer = self._index(column).get_indexer(strings)
+        codes[present] = np.where(indexer >= 0, indexer, self.unknown_code)
+        return codes
+
+    def _append(self, column, strings):
+        """Append the values of strings missing from column, persisting them"""
+        with self._lock():
+            self._merge_from_disk()
+            unseen = pd.unique(strings[~strings.isin(self._index(column))])
+            if len(unseen):
+                self.categories.setdefault(column, []).extend(unseen.tolist())
+                self._indexes.pop(column, None)
+                self._dirty = True
+                if self.path:
+                    self._write(self.path)
+
+    def matches(self, categories):
+        """True if every value in categories (column -> value list) has the
+        same code here, after re-reading the file
+
+        Lists only grow at the end, so this holds when each saved list is a
+        prefix of the live one.
+        """
+        self._merge_from_disk()
+        return all(
+            self.categories.get(column, [])[:len(values)] == list(values)
+            for column, values in categories.items()
+        )
+
+    def encode_value(self, column, value, grow=False):
+        """Code of a single value (unknown_code if absent)"""
+        return int(self.encode(column, [value], grow=grow)[0])
+
+    def code(self, record, column='category', default=0):
+        """Code of column in a record (dict or row), preferring a precomputed
+        '<column>_encoded' field; default when the record has neither"""
+        if f'{column}_encoded' in record:
+            return record[f'{column}_encoded']
+        if column in record:
+            return self.encode_value(column, record[column])
+        return default
+
+    def decode(self, column, codes):
+        """Map codes back to category values (None for the unknown bucket)"""
+        known = np.asarray(self.categories.get(column, []), dtype=object)
+        codes = np.asarray(codes)
+        valid = (codes >= 0) & (codes < len(known))
+        decoded = np.full(len(codes), None, dtype=object)
+        decoded[valid] = known[codes[valid]]
+        return decoded
+
+    def save(self, path=None):
+        """Persist the dictionary as JSON (write-then-rename)
+
+        Saving to the dictionary's own path first merges in codes other
+        processes wrote since it was read.
+        """
+        path = path or self.path
+        if not path:
+            raise ValueError("No path given for the category dictionary.")
+        if path != self.path:
+            self._write(path)
+            return
+        with self._lock():
+            self._merge_from_disk()
+            self._write(path)
+
+    def _write(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'categories': self.categories}, f, indent=2)
+        os.replace(path + '.tmp', path)
+        self._dirty = False
+
+    def save_if_changed(self):
+        if self._dirty and self.path:
+            self.save()
@@ -0,0 +1,294 @@
+"""
+Compiled tree ensembles for Walmart Analytics Platform
+Flattens trained random forests, gradient boosting and XGBoost models into
+contiguous NumPy arrays and evaluates them with a vectorized traversal
+"""
+
+import pandas as pd
+import numpy as np
+import json
+
+# XGBoost objectives whose prediction is the raw margin
+IDENTITY_OBJECTIVES = {'reg:squarederror', 'reg:absoluteerror', 'reg:pseudohubererror', 'reg:quantileerror'}
+
+# Ensembles no deeper than this are stored as perfect binary trees
+MAX_PERFECT_DEPTH = 10
+
+# Largest batch for which the compiled traversal beats native predict;
+# bigger batches amortize the native per-call overhead and are faster there
+COMPILED_BATCH_LIMIT = 128
+
+# (row, tree) pairs evaluated at once; keeps the working set cache-sized
+PAIRS_PER_BLOCK = 1 << 16
+
+class CompiledTreeEnsemble:
+    """A tree ensemble as flat node arrays
+
+    Nodes of all trees share one set of arrays; roots holds each tree's first
+    node and leaves point to themselves. Shallow ensembles (boosting) are
+    additionally laid out as perfect binary trees: node i has children
+    2i + 1 and 2i + 2 and every leaf is copied down to the last level, so
+    evaluation is exactly `depth` steps of index arithmetic. Outputs are
+    accumulated tree by tree in the same order and precision as the source
+    library, so predictions are bit-identical to the native predict.
+    """
+
+    def __init__(self, feature, threshold, left, right, missing_left, value, roots,
+                 base_score, scale, average, strict, dtype, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.is_leaf = left == np.arange(len(left))
+        self.base_score = base_score
+        self.scale = scale
+        # Random forests average the trees, boosting adds them up
+        self.average = average
+        # XGBoost goes left on x < threshold, sklearn on x <= threshold
+        self.strict = strict
+        self.dtype = dtype
+        self.n_features = n_features
+        self.depth = self._max_depth()
+        self.perfect = self._perfect_layout() if self.depth <= MAX_PERFECT_DEPTH else None
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        arrays = [self.feature, self.threshold, self.left, self.right, self.missing_left, self.value, self.roots]
+        if self.perfect is not None:
+            arrays += list(self.perfect.values())
+        return sum(array.nbytes for array in arrays)
+
+    def _max_depth(self):
+        depth, frontier = 0, self.roots[~self.is_leaf[self.roots]]
+        while len(frontier):
+            depth += 1
+            children = np.concatenate((self.left[frontier], self.right[frontier]))
+            frontier = children[~self.is_leaf[children]]
+        return depth
+
+    def _perfect_layout(self):
+        """Node arrays of every tree padded to a perfect tree of self.depth"""
+        depth, n_trees = self.depth, self.n_trees
+        n_internal, n_leaves = 2 ** depth - 1, 2 ** depth
+        feature = np.zeros((n_trees, n_internal), dtype=np.intp)
+        threshold = np.zeros((n_trees, n_internal), dtype=self.threshold.dtype)
+        missing_left = np.zeros((n_trees, n_internal), dtype=bool)
+        value = np.zeros((n_trees, n_leaves), dtype=self.value.dtype)
+
+        for tree, root in enumerate(self.roots):
+            nodes, positions = np.array([root]), np.array([0])
+            for level in range(depth + 1):
+                leaf = self.is_leaf[nodes]
+                # A leaf above the last level fills every last-level slot below it
+                span = 2 ** (depth - level)
+                for node, position in zip(nodes[leaf], positions[leaf]):
+                    first = (position + 1) * span - 1 - n_internal
+                    value[tree, first:first + span] = self.value[node]
+
+                nodes, positions = nodes[~leaf], positions[~leaf]
+                feature[tree, positions] = self.feature[nodes]
+                threshold[tree, positions] = self.threshold[nodes]
+                missing_left[tree, positions] = self.missing_left[nodes]
+                nodes = np.concatenate((self.left[nodes], self.right[nodes]))
+                positions = np.concatenate((2 * positions + 1, 2 * positions + 2))
+
+        return {
+            'feature': feature.ravel(), 'threshold': threshold.ravel(),
+            'missing_left': missing_left.ravel(), 'value': value.ravel()
+        }
+
+    def _as_matrix(self, X):
+        X = np.ascontiguousarray(X.to_numpy() if isinstance(X, pd.DataFrame) else X, dtype=np.float32)
+        return X[None, :] if X.ndim == 1 else X
+
+    def _leaf_values_perfect(self, X, has_missing):
+        """Leaf value of every (row, tree) pair via the perfect layout"""
+        layout, n_internal = self.perfect, 2 ** self.depth - 1
+        node_offsets = np.arange(self.n_trees) * n_internal
+        row_offsets = (np.arange(len(X)) * X.shape[1])[:, None]
+        X = X.ravel()
+
+        position = np.zeros((len(row_offsets), self.n_trees), dtype=np.intp)
+        for _ in range(self.depth):
+            node = position + node_offsets
+            x = X[row_offsets + layout['feature'][node]]
+            threshold = layout['threshold'][node]
+            go_right = ~(x < threshold) if self.strict else ~(x <= threshold)
+            if has_missing:
+                go_right = np.where(np.isnan(x), ~layout['missing_left'][node], go_right)
+            position *= 2
+            position += 1
+            position += go_right
+
+        leaf_offsets = np.arange(self.n_trees) * (n_internal + 1) - n_internal
+        return layout['value'][position + leaf_offsets]
+
+    def _leaf_values_deep(self, X, has_missing):
+        """Leaf value of every (row, tree) pair by walking the flat node arrays
+
+        Only pairs still on an internal node are touched at each level.
+        """
+        n_rows, n_trees = len(X), self.n_trees
+        nodes = np.tile(self.roots.astype(np.intp), n_rows)
+        row_offsets = np.repeat(np.arange(n_rows) * X.shape[1], n_trees)
+        X = X.ravel()
+        active = np.flatnonzero(~self.is_leaf[nodes])
+
+        while len(active):
+            node = nodes[active]
+            x = X[row_offsets[active] + self.feature[node]]
+            go_left = x < self.threshold[node] if self.strict else x <= self.threshold[node]
+            if has_missing:
+                go_left = np.where(np.isnan(x), self.missing_left[node], go_left)
+            node = np.where(go_left, self.left[node], self.right[node])
+            nodes[active] = node
+            active = active[~self.is_leaf[node]]
+
+        return self.value[nodes].reshape(n_rows, n_trees)
+
+    def predict(self, X):
+        X = self._as_matrix(X)
+        rows_per_block = max(1, PAIRS_PER_BLOCK // self.n_trees)
+        leaf_values = self._leaf_values_perfect if self.perfect is not None else self._leaf_values_deep
+        out = np.empty(len(X), dtype=self.dtype)
+
+        for start in range(0, len(X), rows_per_block):
+            block = X[start:start + rows_per_block]
+            values = leaf_values(block, bool(np.isnan(block).any()))
+            # Running sum over base score and trees, in tree order like the native code
+            terms = np.empty((len(block), self.n_trees + 1), dtype=self.dtype)
+            terms[:, 0] = self.base_score
+            terms[:, 1:] = values if self.scale == 1 else self.scale * values
+            out[start:start + len(block)] = np.cumsum(terms, axis=1, dtype=self.dtype)[:, -1]
+
+        if self.average:
+            out /= self.n_trees
+        return out
+
+    @classmethod
+    def from_trees(cls, trees, **kwargs):
+        """Concatenate per-tree node arrays into one ensemble
+
+        trees is a list of dicts with feature, threshold, left, right,
+        missing_left and value arrays; child indices are local to the tree
+        and -1 marks a leaf.
+        """
+        offsets = np.cumsum([0] + [len(tree['left']) for tree in trees])
+        parts = {key: [] for key in ('feature', 'threshold', 'left', 'right', 'missing_left', 'value')}
+
+        for offset, tree in zip(offsets, trees):
+            own = np.arange(len(tree['left'])) + offset
+            leaf = np.asarray(tree['left']) < 0
+            parts['feature'].append(np.where(leaf, 0, tree['feature']))
+            parts['threshold'].append(np.asarray(tree['threshold']))
+            parts['left'].append(np.where(leaf, own, np.asarray(tree['left']) + offset))
+            parts['right'].append(np.where(leaf, own, np.asarray(tree['right']) + offset))
+            parts['missing_left'].append(np.asarray(tree['missing_left'], dtype=bool))
+            parts['value'].append(np.asarray(tree['value']))
+
+        dtype = kwargs['dtype']
+        return cls(
+            feature=np.concatenate(parts['feature']).astype(np.intp),
+            threshold=np.concatenate(parts['threshold']).astype(kwargs.pop('threshold_dtype')),
+            left=np.concatenate(parts['left']).astype(np.intp),
+            right=np.concatenate(parts['right']).astype(np.intp),
+            missing_left=np.concatenate(parts['missing_left']),
+            value=np.concatenate(parts['value']).astype(dtype),
+            roots=offsets[:-1].astype(np.intp),
+            **kwargs
+        )
+
+def _sklearn_tree(estimator):
+    tree = estimator.tree_
+    if tree.n_outputs != 1:
+        raise ValueError("Only single-output trees can be compiled.")
+    missing_left = getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=bool))
+    return {
+        'feature': tree.feature,
+        'threshold': tree.threshold,
+        'left': tree.children_left,
+        'right': tree.children_right,
+        'missing_left': missing_left,
+        'value': tree.value[:, 0, 0]
+    }
+
+def _xgboost_trees(booster):
+    """Node arrays and base score of a gbtree regression booster, or None"""
+    model = json.loads(booster.save_raw(raw_format='json'))['learner']
+    if model['gradient_booster']['name'] != 'gbtree' or model['objective']['name'] not in IDENTITY_OBJECTIVES:
+        return None
+
+    trees = []
+    for tree in model['gradient_booster']['model']['trees']:
+        if any(tree.get('split_type', [])):
+            return None  # categorical splits are not supported
+        trees.append({
+            'feature': tree['split_indices'],
+            # Leaves store their (already shrunk) value in split_conditions
+            'threshold': tree['split_conditions'],
+            'left': tree['left_children'],
+            'right': tree['right_children'],
+            'missing_left': tree['default_left'],
+            'value': tree['split_conditions']
+        })
+    base_score = float(model['learner_model_param']['base_score'].strip('[]'))
+    return trees, base_score, int(model['learner_model_param']['num_feature'])
+
+def compile_tree_ensemble(model):
+    """Compile a fitted tree ensemble, or return None if it is not supported
+
+    Supports RandomForestRegressor / ExtraTreesRegressor,
+    GradientBoostingRegressor and XGBoost gbtree regressors (XGBRegressor or
+    a raw Booster). Other models (e.g. LinearRegression) return None so
+    callers can fall back to the native predict.
+    """
+    from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor, GradientBoostingRegressor
+    import xgboost as xgb
+
+    if isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)) and hasattr(model, 'estimators_'):
+        if model.n_outputs_ != 1:
+            return None
+        return CompiledTreeEnsemble.from_trees(
+            [_sklearn_tree(tree) for tree in model.estimators_],
+            base_score=0.0, scale=1, average=True, strict=False,
+            dtype=np.float64, threshold_dtype=np.float64, n_features=model.n_features_in_
+        )
+
+    if isinstance(model, GradientBoostingRegressor) and hasattr(model, 'estimators_'):
+        if model.init_ == 'zero':
+            base_score = 0.0
+        elif hasattr(model.init_, 'constant_'):
+            base_score = float(np.ravel(model.init_.constant_)[0])
+        else:
+            return None  # a custom init estimator is not a constant
+        return CompiledTreeEnsemble.from_trees(
+            [_sklearn_tree(tree) for tree in model.estimators_[:, 0]],
+            base_score=base_score, scale=model.learning_rate, average=False, strict=False,
+            dtype=np.float64, threshold_dtype=np.float64, n_features=model.n_features_in_
+        )
+
+    if isinstance(model, xgb.XGBRegressor):
+        try:
+            model.best_iteration
+            return None  # early-stopped models predict with a tree subset
+        except AttributeError:
+            model = model.get_booster()
+
+    if isinstance(model, xgb.Booster):
+        parsed = _xgboost_trees(model)
+        if parsed is None:
+            return None
+        trees, base_score, n_features = parsed
+        return CompiledTreeEnsemble.from_trees(
+            trees, base_score=base_score, scale=1, average=False, strict=True,
+            dtype=np.float32, threshold_dtype=np.float32, n_features=n_features
+        )
+
+    return None
@@ -9,8 +9,6 @@ from sklearn.cluster import KMeans, DBSCAN
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 from sklearn.metrics import silhouette_score
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime, timedelta
 import sqlite3
 
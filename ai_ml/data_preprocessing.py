@@ -6,113 +6,626 @@ Handles data cleaning, feature engineering, and preparation for ML models
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.impute import SimpleImputer
 import sqlite3
+import hashlib
+import os
+
+try:
+    from .feature_engine import LagFeatureEngine
+    from .sales_panel import SalesPanel
+    from .feature_state import RollingFeatureState
+    from .sales_cache import CleanSalesCache, db_fingerprint
+    from .quantile_sketch import KLLSketch
+    from .category_dictionary import CategoryDictionary, DEFAULT_CATEGORY_CODES_PATH
+except ImportError:
+    from feature_engine import LagFeatureEngine
+    from sales_panel import SalesPanel
+    from feature_state import RollingFeatureState
+    from sales_cache import CleanSalesCache, db_fingerprint
+    from quantile_sketch import KLLSketch
+    from category_dictionary import CategoryDictionary, DEFAULT_CATEGORY_CODES_PATH
+
+# Inventory columns denormalized into every loaded sales row
+JOINED_INVENTORY_COLUMNS = ['id', 'name', 'category', 'price', 'cost']
+
+# Numeric sales columns imputed with their median during cleaning
+NUMERIC_SALES_COLUMNS = ['quantity', 'unit_price', 'total_amount']
+
+# Currency columns keep float64: float32 loses cents above ~$100k
+MONEY_COLUMNS = ['price', 'cost', 'unit_price', 'total_amount', 'total_spent']
+
+# Rows per read when sales are compacted while loading
+SALES_CHUNK_ROWS = 100000
+
+class FrameMemory:
+    """Memory footprint of one frame before and after dtype compaction"""
+    __slots__ = ('frame', 'rows', 'before_bytes', 'after_bytes')
+    
+    def __init__(self, frame, rows, before_bytes, after_bytes):
+        self.frame = frame
+        self.rows = rows
+        self.before_bytes = before_bytes
+        self.after_bytes = after_bytes
+    
+    @property
+    def saved_ratio(self):
+        return 1 - self.after_bytes / self.before_bytes if self.before_bytes else 0.0
+    
+    def __repr__(self):
+        return (f"FrameMemory({self.frame}: {self.before_bytes / 1e6:.2f}MB -> "
+                f"{self.after_bytes / 1e6:.2f}MB, {self.saved_ratio:.0%} saved)")
+
+def compact_dtypes(df, category_threshold=0.5, inplace=False, categorize=True):
+    """Return df with downcast numerics and categorical strings
+    
+    Integers are downcast to the smallest type holding their range, floats
+    other than MONEY_COLUMNS to float32, and (with categorize) string columns
+    whose distinct/total ratio is at most category_threshold become
+    categoricals. With inplace the columns of df are replaced one at a time
+    instead of copying the whole frame first.
+    """
+    compact = df if inplace else df.copy()
+    
+    for column in compact.columns:
+        series = compact[column]
+        if pd.api.types.is_bool_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            compact[column] = pd.to_numeric(series, downcast='integer')
+        elif pd.api.types.is_float_dtype(series):
+            if column not in MONEY_COLUMNS:
+                compact[column] = pd.to_numeric(series, downcast='float')
+        elif categorize and (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+            if len(series) and series.nunique(dropna=True) / len(series) <= category_threshold:
+                compact[column] = series.astype('category')
+    
+    return compact
 
 class DataPreprocessor:
-    def __init__(self, db_path='walmart_analytics.db'):
+    def __init__(self, db_path='walmart_analytics.db', cache_dir='data_cache', compact=False,
+                 category_codes_path=None):
         self.db_path = db_path
-        self.scaler = StandardScaler()
-        self.label_encoders = {}
+        self.cache_dir = cache_dir
+        self.compact = compact
+        self.memory_report = {}
+        self._scaler = None
+        # The same file the pricing, inventory and global demand models use
+        self.category_dictionary = CategoryDictionary(category_codes_path or DEFAULT_CATEGORY_CODES_PATH)
+        self.watermark = None
+        self._read_sales_bytes = None
+        self.sales_by_product = None
+        self.product_offsets = {}
+        self.sales_panel = None
+        
+    @property
+    def scaler(self):
+        if self._scaler is None:
+            # sklearn is imported on first use to keep module imports fast
+            from sklearn.preprocessing import StandardScaler
+            self._scaler = StandardScaler()
+        return self._scaler
+    
+    def load_data_from_db(self, incremental=False):
+        """Load data from SQLite database
         
-    def load_data_from_db(self):
-        """Load data from SQLite database"""
+        With incremental=True the previously loaded sales frame is read from
+        cache_dir and only sales rows above the stored high-water mark are
+        fetched. A change in the joined inventory columns forces a full reload.
+        In compact mode sales are read in chunks that are downcast as they
+        arrive, so the full-width frame is never held, and every frame is
+        then compacted in place; footprints are recorded in memory_report.
+        """
         conn = sqlite3.connect(self.db_path)
+        self.sales_by_product = None
+        self.product_offsets = {}
+        self.sales_panel = None
+        
+        # Load inventory data
+        inventory_query = 'SELECT * FROM inventory'
+        self.inventory_df = pd.read_sql_query(inventory_query, conn)
+        inventory_signature = self._inventory_signature(self.inventory_df)
         
         # Load sales data with product information
+        previous = self._read_sales_snapshot() if incremental else None
+        if previous is not None and previous[1]['inventory_signature'] == inventory_signature:
+            snapshot, watermark = previous
+            new_sales = self._query_sales(conn, after_id=watermark['max_sale_id'])
+            if new_sales.empty:
+                self.sales_df = snapshot
+            else:
+                self.sales_df = pd.concat([snapshot, new_sales], ignore_index=True)
+                self.sales_df = self.sales_df.sort_values('sale_date', kind='mergesort').reset_index(drop=True)
+            self.last_load_stats = {'mode': 'incremental', 'new_rows': len(new_sales)}
+        else:
+            self.sales_df = self._query_sales(conn)
+            self.last_load_stats = {'mode': 'full', 'new_rows': len(self.sales_df)}
+        
+        # Load customer data
+        customer_query = 'SELECT * FROM customers'
+        self.customers_df = pd.read_sql_query(customer_query, conn)
+        
+        conn.close()
+        
+        if incremental:
+            self._write_sales_snapshot(inventory_signature)
+        
+        if self.compact:
+            # Bytes as read are only known for a full load; an incremental one
+            # is measured after the (already compact) snapshot is appended to
+            full = self.last_load_stats['mode'] == 'full'
+            self._compact_frame('sales_df', self.sales_df, before=self._read_sales_bytes if full else None)
+            self._compact_frame('inventory_df', self.inventory_df)
+            self._compact_frame('customers_df', self.customers_df)
+    
+    def _compact_frame(self, name, df, before=None):
+        """Compact a frame in place and record its memory before and after"""
+        before = int(df.memory_usage(deep=True).sum()) if before is None else before
+        compact_dtypes(df, inplace=True)
+        self.memory_report[name] = FrameMemory(name, len(df), before, int(df.memory_usage(deep=True).sum()))
+        return df
+    
+    def _query_sales(self, conn, after_id=None):
+        """Query sales joined with product information, optionally above an id
+        
+        In compact mode the rows are read in SALES_CHUNK_ROWS chunks and each
+        is downcast before the next is read; the bytes as read are kept in
+        _read_sales_bytes for the memory report.
+        """
         sales_query = '''
             SELECT s.*, i.name, i.category, i.price, i.cost
             FROM sales s
             JOIN inventory i ON s.product_id = i.id
+            WHERE s.id > ?
             ORDER BY s.sale_date
         '''
-        self.sales_df = pd.read_sql_query(sales_query, conn)
+        params = (after_id if after_id is not None else -1,)
+        if not self.compact:
+            return pd.read_sql_query(sales_query, conn, params=params)
         
-        # Load inventory data
-        inventory_query = 'SELECT * FROM inventory'
-        self.inventory_df = pd.read_sql_query(inventory_query, conn)
+        chunks = []
+        self._read_sales_bytes = 0
+        for chunk in pd.read_sql_query(sales_query, conn, params=params, chunksize=SALES_CHUNK_ROWS):
+            self._read_sales_bytes += int(chunk.memory_usage(deep=True).sum())
+            # Strings are categorized once on the whole frame, since chunks
+            # with different categories would concatenate back to objects
+            chunks.append(compact_dtypes(chunk, inplace=True, categorize=False))
+        return pd.concat(chunks, ignore_index=True)
+    
+    def _inventory_signature(self, inventory_df):
+        """Hash the inventory columns that are joined into the sales frame"""
+        columns = [col for col in JOINED_INVENTORY_COLUMNS if col in inventory_df.columns]
+        frame = inventory_df[columns].sort_values('id')
+        return hashlib.sha1(frame.to_csv(index=False).encode('utf-8')).hexdigest()
+    
+    def _snapshot_path(self):
+        return os.path.join(self.cache_dir, 'sales_snapshot.pkl')
+    
+    def _read_sales_snapshot(self):
+        """Return (frame, watermark) from the last incremental load, or None"""
+        snapshot_path = self._snapshot_path()
+        if not os.path.exists(snapshot_path):
+            return None
         
-        # Load customer data
-        customer_query = 'SELECT * FROM customers'
-        self.customers_df = pd.read_sql_query(customer_query, conn)
+        snapshot = pd.read_pickle(snapshot_path)
+        if not isinstance(snapshot, dict):  # written by an older version
+            return None
+        watermark = snapshot['watermark']
+        if watermark.get('db_path') != os.path.abspath(self.db_path):
+            return None
         
-        conn.close()
+        return snapshot['sales'], watermark
+    
+    def _write_sales_snapshot(self, inventory_signature):
+        """Persist the raw sales frame together with its high-water mark"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        snapshot_path = self._snapshot_path()
+        
+        self.watermark = {
+            'db_path': os.path.abspath(self.db_path),
+            'max_sale_id': int(self.sales_df['id'].max()) if not self.sales_df.empty else -1,
+            'max_sale_date': str(self.sales_df['sale_date'].max()) if not self.sales_df.empty else None,
+            'row_count': len(self.sales_df),
+            'inventory_signature': inventory_signature,
+            'updated_at': datetime.now().isoformat()
+        }
+        
+        # One file, written then renamed, so the frame and its watermark can
+        # never get out of step after a crash
+        pd.to_pickle({'sales': self.sales_df, 'watermark': self.watermark}, snapshot_path + '.tmp')
+        os.replace(snapshot_path + '.tmp', snapshot_path)
         
     def clean_sales_data(self):
         """Clean and preprocess sales data"""
+        from sklearn.impute import SimpleImputer
+        
         # Convert date columns
         self.sales_df['sale_date'] = pd.to_datetime(self.sales_df['sale_date'])
         
         # Handle missing values
         imputer = SimpleImputer(strategy='median')
-        numeric_columns = ['quantity', 'unit_price', 'total_amount']
-        self.sales_df[numeric_columns] = imputer.fit_transform(self.sales_df[numeric_columns])
+        self.sales_df[NUMERIC_SALES_COLUMNS] = imputer.fit_transform(self.sales_df[NUMERIC_SALES_COLUMNS])
         
         # Remove outliers (sales > 99th percentile)
         q99 = self.sales_df['total_amount'].quantile(0.99)
         self.sales_df = self.sales_df[self.sales_df['total_amount'] <= q99]
         
         # Create time-based features
-        self.sales_df['year'] = self.sales_df['sale_date'].dt.year
-        self.sales_df['month'] = self.sales_df['sale_date'].dt.month
-        self.sales_df['day'] = self.sales_df['sale_date'].dt.day
-        self.sales_df['weekday'] = self.sales_df['sale_date'].dt.weekday
-        self.sales_df['is_weekend'] = self.sales_df['weekday'].isin([5, 6]).astype(int)
+        self.sales_df = self._add_time_features(self.sales_df)
+        
+        if self.compact:
+            self._compact_frame('clean_sales_df', self.sales_df)
+        
+        self.sales_panel = None
+        self.build_product_index()
         
         return self.sales_df
     
-    def create_demand_features(self, product_id=None, days_back=30):
-        """Create demand forecasting features"""
-        if product_id:
-            product_sales = self.sales_df[self.sales_df['product_id'] == product_id].copy()
+    def _add_time_features(self, sales):
+        """Add calendar columns derived from sale_date"""
+        sales['year'] = sales['sale_date'].dt.year
+        sales['month'] = sales['sale_date'].dt.month
+        sales['day'] = sales['sale_date'].dt.day
+        sales['weekday'] = sales['sale_date'].dt.weekday
+        sales['is_weekend'] = sales['weekday'].isin([5, 6]).astype(int)
+        return sales
+    
+    def _query_sales_chunks(self, chunksize, columns='s.*, i.name, i.category, i.price, i.cost'):
+        """Stream the sales/inventory join from the DB cursor in chunks"""
+        conn = sqlite3.connect(self.db_path)
+        query = f'''
+            SELECT {columns}
+            FROM sales s
+            JOIN inventory i ON s.product_id = i.id
+            ORDER BY s.sale_date
+        '''
+        try:
+            for chunk in pd.read_sql_query(query, conn, chunksize=chunksize):
+                yield chunk
+        finally:
+            conn.close()
+    
+    def fit_cleaning_sketches(self, chunksize=100000):
+        """First pass of out-of-core cleaning: medians and 99th percentile
+        
+        Numeric columns are fed chunk by chunk into KLL quantile sketches, so
+        only O(sketch size) values are held at any time.
+        """
+        sketches = {column: KLLSketch() for column in NUMERIC_SALES_COLUMNS}
+        null_counts = dict.fromkeys(NUMERIC_SALES_COLUMNS, 0)
+        
+        for chunk in self._query_sales_chunks(chunksize, columns='s.quantity, s.unit_price, s.total_amount'):
+            for column in NUMERIC_SALES_COLUMNS:
+                values = chunk[column].to_numpy(dtype=np.float64)
+                sketches[column].update(values)
+                null_counts[column] += int(np.isnan(values).sum())
+        
+        medians = {column: sketches[column].quantile(0.5) for column in NUMERIC_SALES_COLUMNS}
+        
+        # Imputed amounts take part in the percentile, as in clean_sales_data
+        if medians['total_amount'] is not None:
+            sketches['total_amount'].update(np.full(null_counts['total_amount'], medians['total_amount']))
+        q99 = sketches['total_amount'].quantile(0.99)
+        
+        self.cleaning_sketches = sketches
+        return medians, q99
+    
+    def iter_clean_sales_chunks(self, chunksize=100000):
+        """Clean sales out-of-core, yielding one cleaned chunk at a time
+        
+        Same steps as clean_sales_data, but the imputation medians and the
+        outlier cut-off come from a streaming first pass (approximate).
+        """
+        medians, q99 = self.fit_cleaning_sketches(chunksize)
+        if q99 is None:
+            return
+        
+        for chunk in self._query_sales_chunks(chunksize):
+            chunk['sale_date'] = pd.to_datetime(chunk['sale_date'])
+            chunk[NUMERIC_SALES_COLUMNS] = chunk[NUMERIC_SALES_COLUMNS].astype(np.float64).fillna(medians)
+            chunk = chunk[chunk['total_amount'] <= q99].copy()
+            
+            yield self._add_time_features(chunk)
+    
+    def load_daily_sales_chunked(self, chunksize=100000):
+        """Per-product daily sales built from cleaned chunks, never holding all rows"""
+        partials = []
+        for chunk in self.iter_clean_sales_chunks(chunksize):
+            chunk['sale_date'] = chunk['sale_date'].dt.normalize()
+            partials.append(chunk.groupby(['product_id', 'sale_date'])[['quantity', 'total_amount']].sum())
+        
+        if not partials:
+            return pd.DataFrame(columns=['product_id', 'sale_date', 'quantity', 'total_amount'])
+        
+        # A day can straddle two chunks, so partial sums are combined once more
+        self.daily_sales_df = pd.concat(partials).groupby(level=[0, 1]).sum().reset_index()
+        return self.daily_sales_df
+    
+    def load_clean_sales_data(self, incremental=True, use_cache=True):
+        """Return cleaned sales, reusing the columnar cache when the DB is unchanged
+        
+        On a cache hit the SQL join and cleaning are skipped entirely; only the
+        small inventory and customers tables are re-read. On a miss the data
+        is loaded and cleaned as usual and the result is cached.
+        """
+        cache = CleanSalesCache(self.cache_dir)
+        fingerprint = db_fingerprint(self.db_path, compact=self.compact) if use_cache and cache.enabled else None
+        cached = cache.load(fingerprint) if fingerprint else None
+        
+        if cached is None:
+            self.load_data_from_db(incremental=incremental)
+            self.clean_sales_data()
+            if fingerprint:
+                cache.store(fingerprint, self.sales_df)
+            return self.sales_df
+        
+        conn = sqlite3.connect(self.db_path)
+        self.inventory_df = pd.read_sql_query('SELECT * FROM inventory', conn)
+        self.customers_df = pd.read_sql_query('SELECT * FROM customers', conn)
+        conn.close()
+        if self.compact:
+            self._compact_frame('inventory_df', self.inventory_df)
+            self._compact_frame('customers_df', self.customers_df)
+        
+        self.sales_df = cached
+        self.sales_panel = None
+        self.build_product_index()
+        self.last_load_stats = {'mode': 'cache', 'new_rows': 0}
+        
+        return self.sales_df
+    
+    def build_product_index(self):
+        """Partition the sales frame by product for O(1) per-product slicing
+        
+        sales_by_product holds the rows sorted by product_id (date order is kept
+        within a product) and product_offsets maps product_id -> (start, stop).
+        """
+        self.sales_by_product = self.sales_df.sort_values('product_id', kind='mergesort').reset_index(drop=True)
+        
+        product_ids = self.sales_by_product['product_id'].to_numpy()
+        boundaries = np.flatnonzero(product_ids[1:] != product_ids[:-1]) + 1
+        starts = np.concatenate(([0], boundaries)) if len(product_ids) else np.array([], dtype=int)
+        stops = np.concatenate((boundaries, [len(product_ids)])) if len(product_ids) else np.array([], dtype=int)
+        
+        self.product_offsets = {
+            product_ids[start].item(): (int(start), int(stop))
+            for start, stop in zip(starts, stops)
+        }
+        
+        return self.product_offsets
+    
+    def product_fingerprints(self):
+        """Fingerprint of each product's cleaned sales rows
+        
+        Maps product_id -> {'last_sale_id', 'rows', 'data_hash'}. data_hash
+        covers sale_date, quantity and total_amount of every row, so rows
+        changed or dropped by cleaning are detected as well as new sales.
+        """
+        if self.sales_by_product is None:
+            self.build_product_index()
+        if not self.product_offsets:
+            return {}
+        
+        sales = self.sales_by_product
+        row_hashes = pd.util.hash_pandas_object(
+            sales[['sale_date', 'quantity', 'total_amount']], index=False
+        ).to_numpy()
+        starts = np.array([start for start, _ in self.product_offsets.values()])
+        # uint64 sums wrap around, which is fine for a hash
+        data_hashes = np.add.reduceat(row_hashes, starts)
+        last_ids = np.maximum.reduceat(sales['id'].to_numpy(dtype=np.int64), starts)
+        
+        return {
+            product_id: {
+                'last_sale_id': int(last_id),
+                'rows': stop - start,
+                'data_hash': f'{data_hash:016x}'
+            }
+            for (product_id, (start, stop)), last_id, data_hash
+            in zip(self.product_offsets.items(), last_ids, data_hashes)
+        }
+    
+    def get_product_sales(self, product_id):
+        """Return the cleaned sales rows of one product"""
+        if self.sales_by_product is None:
+            return self.sales_df[self.sales_df['product_id'] == product_id]
+        
+        start, stop = self.product_offsets.get(product_id, (0, 0))
+        return self.sales_by_product.iloc[start:stop]
+    
+    def build_sales_panel(self, daily_sales=None):
+        """Build the dense product x calendar day panel of quantity and amount"""
+        self.sales_panel = SalesPanel.from_daily_sales(daily_sales if daily_sales is not None else self.sales_df)
+        return self.sales_panel
+    
+    def create_demand_features(self, product_id=None, days_back=30, daily_sales=None, calendar_days=False):
+        """Create demand forecasting features
+        
+        Pass daily_sales (e.g. from load_daily_sales_from_db) to skip the
+        in-memory aggregation of raw sale rows. With calendar_days=True the
+        features come from the dense sales panel, so lag_7 is the value seven
+        calendar days earlier and days without sales count as zero.
+        """
+        if calendar_days:
+            if self.sales_panel is None or daily_sales is not None:
+                self.build_sales_panel(daily_sales)
+            features = self.sales_panel.to_frame(lags=[1, 7, 14, 30], windows=[7, 14, 30])
+            if product_id:
+                features = features[features['product_id'] == product_id].reset_index(drop=True)
+            return features
+        
+        if daily_sales is None:
+            if product_id:
+                product_sales = self.get_product_sales(product_id).copy()
+            else:
+                product_sales = self.sales_df.copy()
+            
+            # Aggregate daily sales
+            daily_sales = product_sales.groupby(['product_id', 'sale_date']).agg({
+                'quantity': 'sum',
+                'total_amount': 'sum'
+            }).reset_index()
+        elif product_id:
+            daily_sales = daily_sales[daily_sales['product_id'] == product_id].reset_index(drop=True)
         else:
-            product_sales = self.sales_df.copy()
+            daily_sales = daily_sales.copy()
+        
+        # Create lag features and rolling averages in one sorted pass
+        return LagFeatureEngine(lags=[1, 7, 14, 30], windows=[7, 14, 30]).transform(daily_sales)
+    
+    def refresh_demand_features(self, state_path=None):
+        """Update the persisted rolling feature state with newly arrived days
         
-        # Aggregate daily sales
-        daily_sales = product_sales.groupby(['product_id', 'sale_date']).agg({
-            'quantity': 'sum',
-            'total_amount': 'sum'
-        }).reset_index()
+        Returns only the feature rows of the appended days (calendar
+        semantics, see SalesPanel). The first run seeds the state from the
+        full panel and returns all rows. Re-running on the same day replaces
+        that day, so partial days can be refreshed during the day.
+        """
+        state_path = state_path or os.path.join(self.cache_dir, 'feature_state.joblib')
         
-        # Create lag features
-        for lag in [1, 7, 14, 30]:
-            daily_sales[f'quantity_lag_{lag}'] = daily_sales.groupby('product_id')['quantity'].shift(lag)
-            daily_sales[f'amount_lag_{lag}'] = daily_sales.groupby('product_id')['total_amount'].shift(lag)
+        if not os.path.exists(state_path):
+            state = RollingFeatureState.from_panel(self.build_sales_panel())
+            state.save(state_path)
+            return self.sales_panel.to_frame(lags=state.lags, windows=state.windows)
         
-        # Create rolling averages
-        for window in [7, 14, 30]:
-            daily_sales[f'quantity_ma_{window}'] = daily_sales.groupby('product_id')['quantity'].rolling(window).mean().reset_index(0, drop=True)
-            daily_sales[f'amount_ma_{window}'] = daily_sales.groupby('product_id')['total_amount'].rolling(window).mean().reset_index(0, drop=True)
+        state = RollingFeatureState.load(state_path)
+        days = self.sales_df['sale_date'].dt.normalize()
+        new_days = sorted(day for day in days.unique() if day >= state.last_date)
+        
+        new_features = [state.append_day(day, self.sales_df[days == day]) for day in new_days]
+        state.save(state_path)
+        
+        if not new_features:
+            return state.current_features().iloc[0:0]
+        return pd.concat(new_features, ignore_index=True)
+    
+    def load_daily_sales_from_db(self, product_id=None, remove_outliers=True):
+        """Load per-product daily sales aggregated inside SQLite
+        
+        Only one row per product and calendar day is transferred to pandas.
+        Cleaning mirrors clean_sales_data: missing quantities and amounts
+        count as their column's median, and rows above the 99th percentile
+        of total_amount are excluded before aggregating. The
+        grouping uses idx_sales_product_date, created by setup_database
+        (run it with --migrate to add the index to an existing database).
+        """
+        conn = sqlite3.connect(self.db_path)
+        
+        # Medians of the non-missing values, as SimpleImputer computes them
+        params = {
+            'quantity_median': self._sql_quantile(conn, 'quantity', 0.5),
+            'amount_median': self._sql_quantile(conn, 'total_amount', 0.5)
+        }
+        conditions = []
+        if product_id is not None:
+            conditions.append('s.product_id = :product_id')
+            params['product_id'] = int(product_id)
+        if remove_outliers:
+            q99 = self._sql_quantile(conn, 'total_amount', 0.99, fill=params['amount_median'])
+            if q99 is not None:
+                conditions.append('COALESCE(s.total_amount, :amount_median) <= :q99')
+                params['q99'] = q99
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        daily_query = f'''
+            SELECT s.product_id,
+                   date(s.sale_date) AS sale_date,
+                   SUM(COALESCE(s.quantity, :quantity_median)) AS quantity,
+                   SUM(COALESCE(s.total_amount, :amount_median)) AS total_amount
+            FROM sales s
+            JOIN inventory i ON s.product_id = i.id
+            {where_clause}
+            GROUP BY s.product_id, date(s.sale_date)
+            ORDER BY s.product_id, date(s.sale_date)
+        '''
+        daily_sales = pd.read_sql_query(daily_query, conn, params=params)
+        conn.close()
+        
+        daily_sales['sale_date'] = pd.to_datetime(daily_sales['sale_date'])
+        self.daily_sales_df = daily_sales
         
         return daily_sales
     
-    def encode_categorical_features(self, df, categorical_columns):
-        """Encode categorical features"""
+    def _sql_quantile(self, conn, column, q, fill=None):
+        """Linearly interpolated quantile of a sales column computed in SQLite
+        
+        Like clean_sales_data, only sales of products in the inventory count.
+        Missing values are skipped, or count as fill when it is given (the
+        imputed median, for quantiles taken after imputation).
+        """
+        value = f's.{column}' if fill is None else f'COALESCE(s.{column}, :fill)'
+        n = conn.execute(
+            f'SELECT COUNT({value}) FROM sales s JOIN inventory i ON s.product_id = i.id',
+            {'fill': fill}
+        ).fetchone()[0]
+        if n == 0:
+            return None
+        
+        position = (n - 1) * q
+        lower = int(np.floor(position))
+        values = [row[0] for row in conn.execute(
+            f'''
+            SELECT {value} AS value FROM sales s
+            JOIN inventory i ON s.product_id = i.id
+            WHERE value IS NOT NULL
+            ORDER BY value LIMIT 2 OFFSET :offset
+            ''',
+            {'fill': fill, 'offset': lower}
+        )]
+        if len(values) == 1 or position == lower:
+            return values[0]
+        return values[0] + (values[1] - values[0]) * (position - lower)
+    
+    def encode_categorical_features(self, df, categorical_columns, grow=True):
+        """Encode categorical features
+        
+        Codes come from the persisted category dictionary, so they are stable
+        across runs and shared with the pricing and inventory models. Unseen
+        values are appended when grow=True, otherwise mapped to the unknown code.
+        """
         encoded_df = df.copy()
         
         for column in categorical_columns:
-            if column not in self.label_encoders:
-                self.label_encoders[column] = LabelEncoder()
-                encoded_df[column] = self.label_encoders[column].fit_transform(df[column].astype(str))
-            else:
-                encoded_df[column] = self.label_encoders[column].transform(df[column].astype(str))
+            encoded_df[column] = self.category_dictionary.encode(column, df[column], grow=grow)
         
+        self.category_dictionary.save_if_changed()
         return encoded_df
     
-    def prepare_forecast_data(self, product_id, forecast_days=7):
+    def prepare_forecast_data(self, product_id, forecast_days=7, daily_sales=None, calendar_days=False):
         """Prepare data for demand forecasting"""
-        # Get historical sales for the product
-        product_sales = self.sales_df[self.sales_df['product_id'] == product_id].copy()
-        
-        if product_sales.empty:
-            return None
-        
-        # Create daily aggregation
-        daily_data = product_sales.groupby('sale_date').agg({
-            'quantity': 'sum',
-            'total_amount': 'sum'
-        }).reset_index()
+        if calendar_days:
+            # Dense calendar series: row shifts below are calendar-day shifts
+            if self.sales_panel is None or daily_sales is not None:
+                self.build_sales_panel(daily_sales)
+            if product_id not in self.sales_panel.product_index:
+                return None
+            
+            row = self.sales_panel.product_index[product_id]
+            first_day = self.sales_panel.first_day[row]
+            daily_data = pd.DataFrame({
+                'sale_date': self.sales_panel.dates[first_day:],
+                'quantity': self.sales_panel.product_series(product_id, 'quantity'),
+                'total_amount': self.sales_panel.product_series(product_id, 'total_amount')
+            })
+        elif daily_sales is not None:
+            # Already aggregated per product and day (see load_daily_sales_from_db)
+            daily_data = daily_sales.loc[
+                daily_sales['product_id'] == product_id, ['sale_date', 'quantity', 'total_amount']
+            ].reset_index(drop=True)
+            
+            if daily_data.empty:
+                return None
+        else:
+            # Get historical sales for the product
+            product_sales = self.get_product_sales(product_id)
+            
+            if product_sales.empty:
+                return None
+            
+            # Create daily aggregation
+            daily_data = product_sales.groupby('sale_date').agg({
+                'quantity': 'sum',
+                'total_amount': 'sum'
+            }).reset_index()
         
         # Sort by date
         daily_data = daily_data.sort_values('sale_date')
@@ -122,18 +635,50 @@ class DataPreprocessor:
         daily_data['month'] = daily_data['sale_date'].dt.month
         daily_data['is_weekend'] = daily_data['day_of_week'].isin([5, 6]).astype(int)
         
-        # Create lag features
-        for lag in [1, 7, 14]:
-            daily_data[f'quantity_lag_{lag}'] = daily_data['quantity'].shift(lag)
-        
-        # Create rolling features
-        daily_data['quantity_ma_7'] = daily_data['quantity'].rolling(7).mean()
-        daily_data['quantity_ma_14'] = daily_data['quantity'].rolling(14).mean()
+        # Create lag and rolling features
+        daily_data = LagFeatureEngine(
+            lags=[1, 7, 14], windows=[7, 14],
+            value_columns={'quantity': 'quantity'}, group_column=None
+        ).transform(daily_data)
         
         # Remove rows with NaN values
         daily_data = daily_data.dropna()
         
         return daily_data
+    
+    def iter_product_forecast_data(self, forecast_days=7, calendar_days=False, product_ids=None):
+        """Yield (product_id, daily_frame) for every product (or product_ids) in one pass"""
+        if self.sales_by_product is None:
+            self.build_product_index()
+        if calendar_days and self.sales_panel is None:
+            self.build_sales_panel()
+        
+        for product_id in (self.product_offsets if product_ids is None else product_ids):
+            daily_data = self.prepare_forecast_data(product_id, forecast_days, calendar_days=calendar_days)
+            if daily_data is not None:
+                yield product_id, daily_data
+
+    def iter_forecast_shards(self, products_per_shard=500, forecast_days=7, calendar_days=False):
+        """Yield stacked forecast frames of products_per_shard products each
+
+        Each shard holds whole products (so per-product tails stay intact)
+        with product_id and category columns added, ready for the pooled
+        GlobalDemandForecaster.
+        """
+        categories = self.inventory_df.set_index('id')['category']
+        shard = []
+
+        for product_id, daily_data in self.iter_product_forecast_data(forecast_days, calendar_days):
+            daily_data['product_id'] = product_id
+            daily_data['category'] = categories.get(product_id)
+            shard.append(daily_data)
+
+            if len(shard) == products_per_shard:
+                yield pd.concat(shard, ignore_index=True)
+                shard = []
+
+        if shard:
+            yield pd.concat(shard, ignore_index=True)
 
 def main():
     """Example usage of DataPreprocessor"""
@@ -5,27 +5,102 @@ Implements various ML models for predicting product demand
 
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-from sklearn.model_selection import train_test_split, TimeSeriesSplit
-import xgboost as xgb
 import joblib
+import math
+import os
+import time
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    from .compiled_trees import compile_tree_ensemble, COMPILED_BATCH_LIMIT
+except ImportError:
+    from compiled_trees import compile_tree_ensemble, COMPILED_BATCH_LIMIT
+
+# Daily quantities needed to build every lag / moving-average feature
+HISTORY_DAYS = 14
+
+# Bump when the meaning of the feature columns changes; models built on
+# another version are fully retrained instead of warm-started.
+# 2: moving averages cover the days before the target, as at serving time
+FEATURE_VERSION = 2
+
+# Days after which a model is fully retrained even if warm starts would do
+FULL_RETRAIN_DAYS = 7
+
+# New rows needed before a model is warm-started rather than fully refit;
+# a few rows say too little about how the data moved
+MIN_WARM_START_ROWS = 7
+
+def _default_models():
+    """Candidate estimators for model selection
+    
+    sklearn and xgboost are imported here rather than at module level, so
+    importing this module (and ai_ml) stays fast for code that only loads
+    or serves models.
+    """
+    from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+    from sklearn.linear_model import LinearRegression
+    import xgboost as xgb
+    
+    return {
+        'linear_regression': LinearRegression(),
+        'random_forest': RandomForestRegressor(n_estimators=100, random_state=42),
+        'gradient_boosting': GradientBoostingRegressor(n_estimators=100, random_state=42),
+        'xgboost': xgb.XGBRegressor(n_estimators=100, random_state=42)
+    }
+
+def _score_fold(model, X, y, train_idx, val_idx):
+    """Fit one (model, fold) cell of the selection grid; returns (MAE, fit seconds)"""
+    from sklearn.metrics import mean_absolute_error
+    
+    start = time.perf_counter()
+    X_train, X_val = X.iloc[train_idx], X.iloc[val_idx]
+    y_train, y_val = y.iloc[train_idx], y.iloc[val_idx]
+    
+    # Handle missing values
+    X_train = X_train.fillna(X_train.mean())
+    X_val = X_val.fillna(X_train.mean())
+    
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_val)
+    
+    return mean_absolute_error(y_val, y_pred), time.perf_counter() - start
+
 class DemandForecaster:
-    def __init__(self):
-        self.models = {
-            'linear_regression': LinearRegression(),
-            'random_forest': RandomForestRegressor(n_estimators=100, random_state=42),
-            'gradient_boosting': GradientBoostingRegressor(n_estimators=100, random_state=42),
-            'xgboost': xgb.XGBRegressor(n_estimators=100, random_state=42)
-        }
+    def __init__(self, n_jobs=1, parallel_backend='processes'):
+        # n_jobs != 1 fits the (model, fold) selection grid on a worker pool
+        # of processes or threads (parallel_backend)
+        self.n_jobs = n_jobs
+        self.parallel_backend = parallel_backend
+        # Candidate estimators are built on first access (see models)
+        self._models = None
         self.best_model = None
+        # Array-backed copy of best_model for low-latency predict (see compile_model)
+        self.compiled_model = None
         self.feature_importance = None
+        self.feature_columns = None
+        self.selection_report = None
+        # Artifact metadata used to decide between warm-start and full retrains
+        self.model_name = None
+        self.validation_mae = None
+        self.trained_at = None
+        # Last sale date the model has seen; later rows are out of sample
+        self.trained_through = None
+        self.feature_version = FEATURE_VERSION
+        self.warm_updates = 0
         
+    @property
+    def models(self):
+        if self._models is None:
+            self._models = _default_models()
+        return self._models
+    
+    @models.setter
+    def models(self, models):
+        self._models = models
+    
     def prepare_features(self, data):
         """Prepare features for model training"""
         feature_columns = [
@@ -42,39 +117,51 @@ class DemandForecaster:
         
         return X, y
     
-    def train_models(self, X, y):
-        """Train multiple models and select the best one"""
+    def train_models(self, X, y, selection='full', eta=2, tolerance=0.05):
+        """Train multiple models and select the best one
+        
+        selection='full' scores every model on every fold. 'halving' runs
+        successive halving over the folds: after each fold only the best
+        1/eta candidates (plus any within tolerance of the leader) go on.
+        """
+        from sklearn.model_selection import TimeSeriesSplit
+        from sklearn.base import clone
+        
         # Use time series split for validation
         tscv = TimeSeriesSplit(n_splits=3)
-        model_scores = {}
+        folds = list(tscv.split(X))
         
-        for name, model in self.models.items():
-            scores = []
-            
-            for train_idx, val_idx in tscv.split(X):
-                X_train, X_val = X.iloc[train_idx], X.iloc[val_idx]
-                y_train, y_val = y.iloc[train_idx], y.iloc[val_idx]
-                
-                # Handle missing values
-                X_train = X_train.fillna(X_train.mean())
-                X_val = X_val.fillna(X_train.mean())
-                
-                model.fit(X_train, y_train)
-                y_pred = model.predict(X_val)
-                
-                mae = mean_absolute_error(y_val, y_pred)
-                scores.append(mae)
-            
+        if selection == 'halving':
+            fold_scores = self._successive_halving(X, y, folds, eta, tolerance)
+        else:
+            fold_scores, fit_seconds = self._score_grid(X, y, folds, list(self.models))
+            self.selection_report = {
+                'strategy': 'full',
+                'fits': len(self.models) * len(folds),
+                'full_grid_fits': len(self.models) * len(folds),
+                'fit_seconds': float(sum(map(sum, fit_seconds.values())))
+            }
+        
+        model_scores = {}
+        for name, scores in fold_scores.items():
             model_scores[name] = np.mean(scores)
             print(f"{name}: Average MAE = {np.mean(scores):.2f}")
         
         # Select best model
         best_model_name = min(model_scores, key=model_scores.get)
-        self.best_model = self.models[best_model_name]
+        # A fresh copy, so warm-start updates never leak into self.models
+        self.best_model = clone(self.models[best_model_name])
+        self.compiled_model = None
         
         # Train best model on full dataset
         X_clean = X.fillna(X.mean())
         self.best_model.fit(X_clean, y)
+        self.feature_columns = list(X.columns)
+        self.model_name = best_model_name
+        self.validation_mae = float(model_scores[best_model_name])
+        self.trained_at = datetime.now()
+        self.feature_version = FEATURE_VERSION
+        self.warm_updates = 0
         
         # Get feature importance if available
         if hasattr(self.best_model, 'feature_importances_'):
@@ -83,78 +170,363 @@ class DemandForecaster:
         print(f"Best model: {best_model_name}")
         return best_model_name, model_scores[best_model_name]
     
+    def _score_grid(self, X, y, folds, names):
+        """Score the named models on the given folds
+        
+        Returns ({name: [MAE per fold]}, {name: [fit seconds per fold]}).
+        """
+        if self.n_jobs != 1:
+            results = self._score_grid_parallel(X, y, folds, names)
+        else:
+            results = {
+                name: [_score_fold(self.models[name], X, y, train_idx, val_idx) for train_idx, val_idx in folds]
+                for name in names
+            }
+        
+        fold_scores = {name: [mae for mae, _ in results[name]] for name in names}
+        fit_seconds = {name: [seconds for _, seconds in results[name]] for name in names}
+        return fold_scores, fit_seconds
+    
+    def _score_grid_parallel(self, X, y, folds, names):
+        """Score every (model, fold) pair on a joblib worker pool
+        
+        Each task fits a fresh clone, so scores match the serial path. The
+        estimators' own thread pools (n_jobs) are shrunk so that workers x
+        threads does not exceed the number of cores.
+        """
+        from sklearn.base import clone
+        
+        n_workers = self.n_jobs if self.n_jobs > 0 else (os.cpu_count() or 1)
+        threads_per_worker = max(1, (os.cpu_count() or 1) // n_workers)
+        
+        tasks = []
+        for name in names:
+            for train_idx, val_idx in folds:
+                task_model = clone(self.models[name])
+                if 'n_jobs' in task_model.get_params():
+                    task_model.set_params(n_jobs=threads_per_worker)
+                tasks.append((name, task_model, train_idx, val_idx))
+        
+        results = joblib.Parallel(n_jobs=n_workers, prefer=self.parallel_backend)(
+            joblib.delayed(_score_fold)(task_model, X, y, train_idx, val_idx)
+            for _, task_model, train_idx, val_idx in tasks
+        )
+        
+        grouped = {name: [] for name in names}
+        for (name, _, _, _), result in zip(tasks, results):
+            grouped[name].append(result)
+        return grouped
+    
+    def _successive_halving(self, X, y, folds, eta, tolerance):
+        """Evaluate candidates fold by fold, dropping clearly worse ones early
+        
+        TimeSeriesSplit folds grow in size, so the first rung is the cheapest.
+        Returns the fold scores of the surviving candidates and records the
+        fits and (estimated) seconds saved in selection_report.
+        """
+        survivors = list(self.models)
+        fold_scores = {name: [] for name in survivors}
+        fit_seconds = {name: [] for name in survivors}
+        eliminated = {}
+        
+        for rung, fold in enumerate(folds):
+            scores, seconds = self._score_grid(X, y, [fold], survivors)
+            for name in survivors:
+                fold_scores[name] += scores[name]
+                fit_seconds[name] += seconds[name]
+            
+            if rung == len(folds) - 1 or len(survivors) == 1:
+                break
+            
+            means = {name: np.mean(fold_scores[name]) for name in survivors}
+            ranked = sorted(survivors, key=means.get)
+            keep = max(1, math.ceil(len(ranked) / eta))
+            leader = means[ranked[0]]
+            
+            next_survivors = [
+                name for rank, name in enumerate(ranked)
+                if rank < keep or means[name] <= leader * (1 + tolerance)
+            ]
+            for name in survivors:
+                if name not in next_survivors:
+                    eliminated[name] = rung + 1
+                    print(f"{name}: eliminated after fold {rung + 1} (MAE = {means[name]:.2f})")
+            survivors = next_survivors
+        
+        full_grid_fits = len(self.models) * len(folds)
+        fits = sum(len(times) for times in fit_seconds.values())
+        # Later folds are larger, so this underestimates the real saving
+        seconds_saved = sum(
+            np.mean(fit_seconds[name]) * (len(folds) - len(fit_seconds[name])) for name in eliminated
+        )
+        self.selection_report = {
+            'strategy': 'halving',
+            'fits': fits,
+            'full_grid_fits': full_grid_fits,
+            'fits_saved': full_grid_fits - fits,
+            'fit_seconds': float(sum(map(sum, fit_seconds.values()))),
+            'estimated_seconds_saved': float(seconds_saved),
+            'eliminated': eliminated
+        }
+        
+        return {name: fold_scores[name] for name in survivors}
+    
     def predict(self, X):
         """Make predictions using the best model"""
         if self.best_model is None:
             raise ValueError("Model not trained yet. Call train_models first.")
         
         X_clean = X.fillna(X.mean())
-        predictions = self.best_model.predict(X_clean)
+        if self.compiled_model is not None and len(X_clean) <= COMPILED_BATCH_LIMIT:
+            predictions = self.compiled_model.predict(X_clean)
+        else:
+            predictions = self.best_model.predict(X_clean)
         
         # Ensure predictions are non-negative
         predictions = np.maximum(predictions, 0)
         
         return predictions
     
+    def compile_model(self):
+        """Flatten a tree-ensemble best_model into NumPy arrays for predict
+        
+        Predictions are identical to the native model but without its
+        per-call overhead; predict uses it for batches of up to
+        COMPILED_BATCH_LIMIT rows. Returns the compiled model, or None when
+        best_model is not a supported ensemble (predict then stays native).
+        """
+        if self.best_model is None:
+            raise ValueError("Model not trained yet.")
+        
+        self.compiled_model = compile_tree_ensemble(self.best_model)
+        return self.compiled_model
+    
     def forecast_future_demand(self, historical_data, days_ahead=7):
         """Forecast demand for future days"""
         if self.best_model is None:
             raise ValueError("Model not trained yet.")
         
-        forecasts = []
-        last_date = historical_data['sale_date'].max()
+        _, history, last_dates = self.build_history_matrix({0: historical_data})
+        return self.forecast_batch(history, last_dates, days_ahead)[0].tolist()
+    
+    def build_history_matrix(self, product_frames):
+        """Stack the last HISTORY_DAYS quantities of many product frames
         
-        # Get the last known values for creating features
-        last_row = historical_data.iloc[-1].copy()
+        product_frames maps product_id -> frame with sale_date and quantity
+        (e.g. from prepare_forecast_data). Short histories are left-padded
+        with the product's mean quantity.
+        """
+        product_ids = list(product_frames)
+        history = np.empty((len(product_ids), HISTORY_DAYS))
+        last_dates = []
         
-        for day in range(1, days_ahead + 1):
-            future_date = last_date + timedelta(days=day)
-            
-            # Create features for future date
-            future_features = {
-                'day_of_week': future_date.weekday(),
-                'month': future_date.month,
-                'is_weekend': 1 if future_date.weekday() in [5, 6] else 0,
-            }
-            
-            # Use last known values for lag features (simplified approach)
-            if len(forecasts) > 0:
-                future_features['quantity_lag_1'] = forecasts[-1]
-            else:
-                future_features['quantity_lag_1'] = last_row.get('quantity', 0)
-            
-            future_features['quantity_lag_7'] = last_row.get('quantity_lag_7', 0)
-            future_features['quantity_lag_14'] = last_row.get('quantity_lag_14', 0)
-            future_features['quantity_ma_7'] = last_row.get('quantity_ma_7', 0)
-            future_features['quantity_ma_14'] = last_row.get('quantity_ma_14', 0)
+        for row, product_id in enumerate(product_ids):
+            frame = product_frames[product_id]
+            quantities = frame['quantity'].to_numpy(dtype=np.float64)[-HISTORY_DAYS:]
+            history[row, :] = quantities.mean() if len(quantities) else 0.0
+            history[row, HISTORY_DAYS - len(quantities):] = quantities
+            last_dates.append(frame['sale_date'].max())
+        
+        return product_ids, history, pd.DatetimeIndex(last_dates)
+    
+    def forecast_batch(self, history, last_dates, days_ahead=7, static_features=None):
+        """Recursive forecast for many products, one predict call per step
+        
+        history is a products x days array of daily quantities (most recent
+        last, at least HISTORY_DAYS columns) and last_dates the date of its
+        last column, either one date or one per product. Each predicted day
+        is fed back into the lag and moving-average features of the next
+        step. static_features maps extra feature columns to one value per
+        product (e.g. product codes). Returns a products x days_ahead array.
+        """
+        if self.best_model is None:
+            raise ValueError("Model not trained yet.")
+        
+        history = np.asarray(history, dtype=np.float64)
+        if history.ndim != 2 or history.shape[1] < HISTORY_DAYS:
+            raise ValueError(f"history must be a products x days array with at least {HISTORY_DAYS} days, "
+                             f"got shape {history.shape}; pad short histories (see build_history_matrix).")
+        history = history[:, -HISTORY_DAYS:]
+        n_products = len(history)
+        last_dates = pd.DatetimeIndex(np.broadcast_to(pd.to_datetime(last_dates), (n_products,)))
+        feature_columns = self.feature_columns or [
+            'day_of_week', 'month', 'is_weekend',
+            'quantity_lag_1', 'quantity_lag_7', 'quantity_lag_14',
+            'quantity_ma_7', 'quantity_ma_14'
+        ]
+        
+        # Known history followed by the slots the forecasts are written into
+        series = np.concatenate((history, np.zeros((n_products, days_ahead))), axis=1)
+        
+        for step in range(days_ahead):
+            t = HISTORY_DAYS + step
+            future_dates = last_dates + pd.Timedelta(days=step + 1)
+            day_of_week = future_dates.dayofweek.to_numpy()
             
-            # Create DataFrame for prediction
-            future_df = pd.DataFrame([future_features])
+            features = pd.DataFrame({
+                'day_of_week': day_of_week,
+                'month': future_dates.month.to_numpy(),
+                'is_weekend': np.isin(day_of_week, [5, 6]).astype(int),
+                'quantity_lag_1': series[:, t - 1],
+                'quantity_lag_7': series[:, t - 7],
+                'quantity_lag_14': series[:, t - 14],
+                # The target day is unknown, so averages trail up to the day before
+                'quantity_ma_7': series[:, t - 7:t].mean(axis=1),
+                'quantity_ma_14': series[:, t - 14:t].mean(axis=1)
+            })
+            for column, values in (static_features or {}).items():
+                features[column] = values
             
-            # Make prediction
-            prediction = self.predict(future_df)[0]
-            forecasts.append(prediction)
+            series[:, t] = self.predict(features[feature_columns])
         
-        return forecasts
+        return series[:, HISTORY_DAYS:]
     
-    def save_model(self, filepath):
-        """Save the trained model"""
+    def save_model(self, filepath, store=None):
+        """Save the trained model
+        
+        With a PackedModelStore, filepath is the model's name in the store.
+        Files are written then renamed: readers that memory-mapped the old
+        artifact (see ModelRegistry) keep its inode instead of seeing it
+        truncated under them.
+        """
         if self.best_model is None:
             raise ValueError("No model to save. Train a model first.")
         
-        joblib.dump({
+        if store is not None:
+            store.put(filepath, self._model_data())
+        else:
+            joblib.dump(self._model_data(), filepath + '.tmp')
+            os.replace(filepath + '.tmp', filepath)
+    
+    def _model_data(self):
+        """Everything save_model persists for this forecaster"""
+        return {
             'model': self.best_model,
-            'feature_importance': self.feature_importance
-        }, filepath)
+            'compiled_model': self.compiled_model,
+            'feature_importance': self.feature_importance,
+            'feature_columns': self.feature_columns,
+            'model_name': self.model_name,
+            'validation_mae': self.validation_mae,
+            'trained_at': self.trained_at,
+            'trained_through': self.trained_through,
+            'feature_version': self.feature_version,
+            'warm_updates': self.warm_updates
+        }
+    
+    def load_model(self, filepath, mmap_mode=None, store=None):
+        """Load a trained model
+        
+        With mmap_mode (e.g. 'r') plain NumPy arrays in the artifact, such as
+        the compiled tree arrays, are memory-mapped instead of read into RAM.
+        With a PackedModelStore, filepath is the model's name in the store.
+        """
+        if store is not None:
+            self._restore_model_data(store.get(filepath))
+        else:
+            self._restore_model_data(joblib.load(filepath, mmap_mode=mmap_mode))
     
-    def load_model(self, filepath):
-        """Load a trained model"""
-        model_data = joblib.load(filepath)
+    def _restore_model_data(self, model_data):
         self.best_model = model_data['model']
+        self.compiled_model = model_data.get('compiled_model')
         self.feature_importance = model_data.get('feature_importance')
+        self.feature_columns = model_data.get('feature_columns')
+        self.model_name = model_data.get('model_name')
+        self.validation_mae = model_data.get('validation_mae')
+        self.trained_at = model_data.get('trained_at')
+        self.trained_through = model_data.get('trained_through')
+        self.feature_version = model_data.get('feature_version', 1)
+        self.warm_updates = model_data.get('warm_updates', 0)
+    
+    def needs_full_retrain(self, X_recent, y_recent, drift_threshold=0.25, full_retrain_days=FULL_RETRAIN_DAYS,
+                           max_estimators=200, extra_estimators=10, min_new_rows=MIN_WARM_START_ROWS):
+        """Decide whether a loaded model may be warm-started
+        
+        X_recent, y_recent are the rows after trained_through, which the
+        model has not seen. Returns (needs_full, reason). A full retrain is
+        due when the artifact lacks metadata or was built on other features
+        (FEATURE_VERSION), is older than full_retrain_days, another warm
+        start would grow it past max_estimators trees, there are fewer than
+        min_new_rows new rows to learn from, or its MAE on the new rows
+        exceeds the validation MAE by more than drift_threshold.
+        """
+        from sklearn.metrics import mean_absolute_error
+        
+        if (self.best_model is None or self.validation_mae is None
+                or self.trained_at is None or self.trained_through is None):
+            return True, 'no_metadata'
+        
+        if self.feature_version != FEATURE_VERSION:
+            return True, f'feature version {self.feature_version}'
+        
+        if datetime.now() - self.trained_at >= timedelta(days=full_retrain_days):
+            return True, 'cadence'
+        
+        estimators = self.estimator_count()
+        if estimators is not None and estimators + extra_estimators > max_estimators:
+            return True, f'tree cap ({estimators} trees)'
+        
+        if len(X_recent) < min_new_rows:
+            return True, f'too few new rows ({len(X_recent)})'
+        
+        recent_mae = mean_absolute_error(y_recent, self.predict(X_recent))
+        if recent_mae > self.validation_mae * (1 + drift_threshold):
+            return True, f'drift (recent MAE {recent_mae:.2f} vs {self.validation_mae:.2f})'
+        
+        return False, 'warm_start'
+    
+    def estimator_count(self):
+        """Trees (or boosting rounds) in best_model, or None for non-ensembles"""
+        from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+        import xgboost as xgb
+        
+        if isinstance(self.best_model, xgb.XGBRegressor):
+            return self.best_model.get_booster().num_boosted_rounds()
+        if isinstance(self.best_model, (GradientBoostingRegressor, RandomForestRegressor)):
+            return self.best_model.n_estimators
+        return None
+    
+    def warm_start_update(self, X, y, extra_estimators=10):
+        """Continue training the loaded model instead of refitting from scratch
+        
+        X, y are all training rows, including those added since
+        trained_through. The added trees are fit on all of them: fit on the
+        new rows alone, every tree would pull the whole model toward those
+        few rows' residuals. XGBoost continues boosting from the saved
+        booster, gradient boosting and random forests add extra_estimators
+        stages/trees via warm_start, and models without an incremental path
+        (linear regression) are refit.
+        """
+        from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+        import xgboost as xgb
+        
+        if self.best_model is None:
+            raise ValueError("No model to update. Train or load a model first.")
+        
+        X_clean = X[self.feature_columns].fillna(X[self.feature_columns].mean()) if self.feature_columns else X.fillna(X.mean())
+        model = self.best_model
+        
+        if isinstance(model, xgb.XGBRegressor):
+            booster = model.get_booster()
+            model.set_params(n_estimators=extra_estimators)
+            model.fit(X_clean, y, xgb_model=booster)
+        elif isinstance(model, (GradientBoostingRegressor, RandomForestRegressor)):
+            model.set_params(warm_start=True, n_estimators=model.n_estimators + extra_estimators)
+            model.fit(X_clean, y)
+        else:
+            model.fit(X_clean, y)
+        
+        if hasattr(model, 'feature_importances_'):
+            self.feature_importance = dict(zip(X_clean.columns, model.feature_importances_))
+        if self.compiled_model is not None:
+            self.compile_model()
+        self.warm_updates += 1
+        
+        return self.model_name
 
 def evaluate_model_performance(y_true, y_pred):
     """Evaluate model performance"""
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+    
     mae = mean_absolute_error(y_true, y_pred)
     mse = mean_squared_error(y_true, y_pred)
     rmse = np.sqrt(mse)
@@ -5,26 +5,45 @@ Uses machine learning to optimize product pricing based on overstock levels
 
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_absolute_error, r2_score
 import joblib
 from datetime import datetime, timedelta
 
+try:
+    from .category_dictionary import CategoryDictionary, DEFAULT_CATEGORY_CODES_PATH
+    from .compiled_trees import compile_tree_ensemble
+except ImportError:
+    from category_dictionary import CategoryDictionary, DEFAULT_CATEGORY_CODES_PATH
+    from compiled_trees import compile_tree_ensemble
+
 class DynamicPricingModel:
-    def __init__(self):
-        self.models = {
-            'linear_regression': LinearRegression(),
-            'random_forest': RandomForestRegressor(n_estimators=100, random_state=42),
-            'gradient_boosting': GradientBoostingRegressor(n_estimators=100, random_state=42)
-        }
+    def __init__(self, category_dictionary=None):
+        # Candidate estimators are built on first access (see models)
+        self._models = None
         self.best_model = None
+        self.compiled_model = None
         self.feature_columns = [
             'original_price', 'overstock_percentage', 'category_encoded',
             'sales_velocity', 'days_since_last_sale', 'season_encoded'
         ]
+        self.category_dictionary = category_dictionary or CategoryDictionary(DEFAULT_CATEGORY_CODES_PATH)
         
+    @property
+    def models(self):
+        if self._models is None:
+            # sklearn is imported on first use to keep module imports fast
+            from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+            from sklearn.linear_model import LinearRegression
+            self._models = {
+                'linear_regression': LinearRegression(),
+                'random_forest': RandomForestRegressor(n_estimators=100, random_state=42),
+                'gradient_boosting': GradientBoostingRegressor(n_estimators=100, random_state=42)
+            }
+        return self._models
+    
+    @models.setter
+    def models(self, models):
+        self._models = models
+    
     def prepare_training_data(self):
         """Generate synthetic training data for the pricing model"""
         np.random.seed(42)
@@ -60,6 +79,9 @@ class DynamicPricingModel:
     
     def train_models(self):
         """Train multiple models and select the best one"""
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import mean_absolute_error, r2_score
+        
         # Prepare training data
         df = self.prepare_training_data()
         
@@ -85,6 +107,7 @@ class DynamicPricingModel:
         # Select best model (lowest MAE)
         best_model_name = min(model_scores, key=lambda x: model_scores[x]['mae'])
         self.best_model = self.models[best_model_name]
+        self.compiled_model = None
         
         print(f"Best model: {best_model_name}")
         return best_model_name, model_scores
@@ -98,13 +121,14 @@ class DynamicPricingModel:
         features = np.array([[
             product_data['original_price'],
             product_data['overstock_percentage'],
-            product_data.get('category_encoded', 0),
+            self.category_dictionary.code(product_data),
             product_data.get('sales_velocity', 5.0),
             product_data.get('days_since_last_sale', 7),
             product_data.get('season_encoded', 0)
         ]])
         
-        discount = self.best_model.predict(features)[0]
+        model = self.compiled_model if self.compiled_model is not None else self.best_model
+        discount = model.predict(features)[0]
         
         # Apply business rules
         discount = max(0, min(discount, 50))  # Cap between 0% and 50%
@@ -114,6 +138,17 @@ class DynamicPricingModel:
         
         return discount
     
+    def compile_model(self):
+        """Flatten a tree-ensemble best_model into NumPy arrays for fast single-row predicts
+        
+        Returns None (and predictions stay native) for non-tree models.
+        """
+        if self.best_model is None:
+            raise ValueError("Model not trained yet. Call train_models first.")
+        
+        self.compiled_model = compile_tree_ensemble(self.best_model)
+        return self.compiled_model
+    
     def calculate_dynamic_price(self, original_price, optimal_discount):
         """Calculate the dynamic price based on optimal discount"""
         dynamic_price = original_price * (1 - optimal_discount / 100)
@@ -179,6 +214,7 @@ class DynamicPricingModel:
         
         joblib.dump({
             'model': self.best_model,
+            'compiled_model': self.compiled_model,
             'feature_columns': self.feature_columns
         }, filepath)
     
@@ -186,6 +222,7 @@ class DynamicPricingModel:
         """Load a trained model"""
         model_data = joblib.load(filepath)
         self.best_model = model_data['model']
+        self.compiled_model = model_data.get('compiled_model')
         self.feature_columns = model_data['feature_columns']
 
 def main():
@@ -0,0 +1,142 @@
+"""
+Vectorized feature engine for Walmart Analytics Platform
+Computes lag and moving-average demand features in a single sorted pass
+"""
+
+import pandas as pd
+import numpy as np
+
+DEFAULT_VALUE_COLUMNS = {
+    'quantity': 'quantity',
+    'total_amount': 'amount'
+}
+
+def group_bounds(group_keys):
+    """Return (starts, lengths) of the contiguous groups in group_keys"""
+    n = len(group_keys)
+    if n == 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty
+
+    boundaries = np.flatnonzero(group_keys[1:] != group_keys[:-1]) + 1
+    starts = np.concatenate(([0], boundaries))
+    lengths = np.diff(np.concatenate((starts, [n])))
+
+    return starts, lengths
+
+def group_head_indices(starts, lengths, k):
+    """Row indices of the first k rows of every group"""
+    offsets = np.arange(k)
+    heads = starts[:, None] + offsets
+    return heads[offsets < lengths[:, None]]
+
+def shift_within_groups(values, bounds, lag, out=None):
+    """Shift values down by lag rows without crossing group boundaries"""
+    n = len(values)
+    shifted = np.empty(n) if out is None else out
+    lag = min(lag, n)
+    shifted[:lag] = np.nan
+    shifted[lag:] = values[:n - lag]
+    shifted[group_head_indices(*bounds, lag)] = np.nan
+    return shifted
+
+def prefix_sums(values):
+    """Prefix sums of values (NaN counted as 0) and of their NaN indicator"""
+    missing = np.isnan(values)
+    if not missing.any():
+        return np.concatenate(([0.0], np.cumsum(values))), None
+    sums = np.concatenate(([0.0], np.cumsum(np.where(missing, 0.0, values))))
+    nan_counts = np.concatenate(([0], np.cumsum(missing)))
+    return sums, nan_counts
+
+def rolling_mean_within_groups(values, bounds, window, prefix=None, out=None):
+    """Mean of the window rows before each row, NaN until there are window of them
+
+    The row itself is excluded: it is the forecast target, and at serving
+    time (DemandForecaster.forecast_batch) only the days before it are
+    known. prefix can be passed from prefix_sums to share one cumulative sum
+    across several window sizes.
+    """
+    n = len(values)
+    sums, nan_counts = prefix if prefix is not None else prefix_sums(values)
+    means = np.empty(n) if out is None else out
+
+    # Every window is a single difference of prefix sums
+    head = min(window, n)
+    means[:head] = np.nan
+    if window < n:
+        np.subtract(sums[window:n], sums[:n - window], out=means[window:])
+        means[window:] /= window
+        if nan_counts is not None:
+            window_nans = nan_counts[window:n] - nan_counts[:n - window]
+            means[window:][window_nans > 0] = np.nan
+    means[group_head_indices(*bounds, window)] = np.nan
+    return means
+
+def is_sorted_by(keys, dates):
+    """True when rows are already ordered by (keys, dates)"""
+    if len(keys) < 2:
+        return True
+    same_key = keys[1:] == keys[:-1]
+    return bool(np.all((keys[1:] > keys[:-1]) | (same_key & (dates[1:] >= dates[:-1]))))
+
+class LagFeatureEngine:
+    def __init__(self, lags=(1, 7, 14, 30), windows=(7, 14, 30), value_columns=None,
+                 group_column='product_id', date_column='sale_date'):
+        self.lags = list(lags)
+        self.windows = list(windows)
+        self.value_columns = value_columns or DEFAULT_VALUE_COLUMNS
+        self.group_column = group_column
+        self.date_column = date_column
+
+    def transform(self, daily_sales):
+        """Add lag and moving-average columns to a daily sales panel
+
+        Rows are sorted once by (group, date); every feature is then computed
+        with array operations over the contiguous per-product blocks. Column
+        names and semantics match DataPreprocessor.create_demand_features.
+        """
+        has_groups = bool(self.group_column) and self.group_column in daily_sales.columns
+        if has_groups:
+            group_keys = daily_sales[self.group_column].to_numpy()
+        else:
+            group_keys = np.zeros(len(daily_sales), dtype=np.int8)
+        dates = daily_sales[self.date_column].to_numpy()
+
+        # Sort only when the panel is not already in (product, date) order
+        if is_sorted_by(group_keys, dates):
+            features = daily_sales.reset_index(drop=True)
+        else:
+            sort_columns = [self.group_column, self.date_column] if has_groups else [self.date_column]
+            features = daily_sales.sort_values(sort_columns, kind='mergesort').reset_index(drop=True)
+            group_keys = features[self.group_column].to_numpy() if has_groups else group_keys
+        bounds = group_bounds(group_keys)
+
+        values = {
+            column: features[column].to_numpy(dtype=np.float64)
+            for column in self.value_columns
+        }
+
+        feature_names = [
+            f'{prefix}_lag_{lag}' for lag in self.lags for prefix in self.value_columns.values()
+        ] + [
+            f'{prefix}_ma_{window}' for window in self.windows for prefix in self.value_columns.values()
+        ]
+
+        # One column-major block: every feature is written in place and the
+        # block is handed to pandas without another copy
+        block = np.empty((len(features), len(feature_names)), order='F')
+        j = 0
+        for lag in self.lags:
+            for column in self.value_columns:
+                shift_within_groups(values[column], bounds, lag, out=block[:, j])
+                j += 1
+
+        prefixes = {column: prefix_sums(values[column]) for column in self.value_columns}
+        for window in self.windows:
+            for column in self.value_columns:
+                rolling_mean_within_groups(values[column], bounds, window, prefixes[column], out=block[:, j])
+                j += 1
+
+        feature_frame = pd.DataFrame(block, index=features.index, columns=feature_names, copy=False)
+        return pd.concat([features, feature_frame], axis=1)
@@ -0,0 +1,175 @@
+"""
+Incremental demand feature state for Walmart Analytics Platform
+Keeps the trailing 30 days per product so new days update features in O(products)
+"""
+
+import pandas as pd
+import numpy as np
+import joblib
+import copy
+import os
+
+class RollingFeatureState:
+    def __init__(self, lags=(1, 7, 14, 30), windows=(7, 14, 30), value_columns=None):
+        self.lags = list(lags)
+        self.windows = list(windows)
+        self.value_columns = value_columns or {'quantity': 'quantity', 'total_amount': 'amount'}
+        # A lag of k days, or a mean over the k days before today, needs
+        # k + 1 days of history including today
+        self.history_days = max(max(self.lags), max(self.windows)) + 1
+
+        self.product_ids = np.array([], dtype=np.int64)
+        self.product_index = {}
+        self.last_date = None
+        # Ring buffer per value column: products x history_days, newest at self.position
+        self.history = {column: np.zeros((0, self.history_days)) for column in self.value_columns}
+        self.window_sums = {
+            (column, window): np.zeros(0) for column in self.value_columns for window in self.windows
+        }
+        self.position = self.history_days - 1
+        # Days since each product's first sale, inclusive (0 = not seen yet)
+        self.age = np.zeros(0, dtype=np.int64)
+        # State before the last append, so the current day can be re-applied
+        self.checkpoint = None
+
+    @classmethod
+    def from_panel(cls, panel, **kwargs):
+        """Seed the state from the tail of a SalesPanel
+
+        The panel's last day is applied through append_day so that it can be
+        replaced by a later intra-day refresh.
+        """
+        state = cls(**kwargs)
+        state._add_products(panel.product_ids)
+        seeded_days = panel.n_days - 1
+        state.last_date = panel.start_date + pd.Timedelta(days=seeded_days - 1)
+
+        for column in state.value_columns:
+            tail = panel.values[column][:, max(seeded_days - state.history_days, 0):seeded_days].astype(np.float64)
+            state.history[column][:, state.history_days - tail.shape[1]:] = tail
+            for window in state.windows:
+                state.window_sums[(column, window)] = state.history[column][:, state.history_days - window:].sum(axis=1)
+
+        state.position = state.history_days - 1
+        state.age = np.maximum(seeded_days - panel.first_day, 0)
+
+        last_day = pd.DataFrame({'product_id': panel.product_ids})
+        for column in state.value_columns:
+            last_day[column] = panel.values[column][:, -1]
+        state.append_day(panel.start_date + pd.Timedelta(days=seeded_days), last_day)
+        return state
+
+    def _add_products(self, product_ids):
+        """Append rows for products the state has not seen before"""
+        new_ids = [pid for pid in pd.unique(np.asarray(product_ids)) if pid not in self.product_index]
+        if not new_ids:
+            return
+
+        for pid in new_ids:
+            self.product_index[pid.item() if hasattr(pid, 'item') else pid] = len(self.product_index)
+        self.product_ids = np.concatenate((self.product_ids, np.asarray(new_ids, dtype=self.product_ids.dtype)))
+
+        for column in self.value_columns:
+            self.history[column] = np.vstack((self.history[column], np.zeros((len(new_ids), self.history_days))))
+        for key in self.window_sums:
+            self.window_sums[key] = np.concatenate((self.window_sums[key], np.zeros(len(new_ids))))
+        self.age = np.concatenate((self.age, np.zeros(len(new_ids), dtype=np.int64)))
+
+    def _slot(self, days_back):
+        """Ring buffer column holding the value from days_back days before the newest"""
+        return (self.position - days_back) % self.history_days
+
+    def _advance(self, day_values):
+        """Shift the window by one day and fold in day_values (column -> array)"""
+        next_position = (self.position + 1) % self.history_days
+
+        for column in self.value_columns:
+            incoming = day_values[column]
+            for window in self.windows:
+                # Value leaving a window of this size once the new day is added
+                leaving = self.history[column][:, self._slot(window - 1)]
+                self.window_sums[(column, window)] += incoming - leaving
+            self.history[column][:, next_position] = incoming
+
+        self.position = next_position
+        self.age[self.age > 0] += 1
+
+    def append_day(self, date, day_sales):
+        """Fold one new day of sales into the state and return its feature rows
+
+        day_sales holds that day's rows (product_id plus the value columns);
+        several rows per product are summed. Days skipped since last_date are
+        advanced as zero-sales days first. Passing last_date again replaces
+        that day with the new totals, which allows intra-day refreshes.
+        """
+        date = pd.Timestamp(date).normalize()
+        if self.last_date is not None and date == self.last_date and self.checkpoint is not None:
+            self._restore(self.checkpoint)
+        elif self.last_date is not None and date <= self.last_date:
+            raise ValueError(f"Day {date.date()} is not after the last processed day {self.last_date.date()}")
+        self.checkpoint = self._snapshot()
+
+        self._add_products(day_sales['product_id'].to_numpy())
+
+        if self.last_date is not None:
+            zero_day = {column: np.zeros(len(self.product_ids)) for column in self.value_columns}
+            for _ in range((date - self.last_date).days - 1):
+                self._advance(zero_day)
+
+        day_totals = day_sales.groupby('product_id')[list(self.value_columns)].sum()
+        rows = np.array([self.product_index[pid] for pid in day_totals.index], dtype=np.int64)
+        day_values = {}
+        for column in self.value_columns:
+            values = np.zeros(len(self.product_ids))
+            values[rows] = np.nan_to_num(day_totals[column].to_numpy(dtype=np.float64))
+            day_values[column] = values
+
+        self._advance(day_values)
+        self.age[rows] = np.maximum(self.age[rows], 1)
+        self.last_date = date
+
+        return self.current_features()
+
+    def _snapshot(self):
+        state = {key: value for key, value in self.__dict__.items() if key != 'checkpoint'}
+        return copy.deepcopy(state)
+
+    def _restore(self, snapshot):
+        self.__dict__.update(copy.deepcopy(snapshot))
+
+    def current_features(self):
+        """Feature rows for last_date, one per product with sales history"""
+        active = self.age > 0
+        frame = {
+            'product_id': self.product_ids[active],
+            'sale_date': np.full(int(active.sum()), self.last_date)
+        }
+        for column in self.value_columns:
+            frame[column] = self.history[column][active, self.position]
+        for lag in self.lags:
+            for column, prefix in self.value_columns.items():
+                values = self.history[column][:, self._slot(lag)]
+                frame[f'{prefix}_lag_{lag}'] = np.where(self.age > lag, values, np.nan)[active]
+        for window in self.windows:
+            for column, prefix in self.value_columns.items():
+                # The window ending today, moved back one day to exclude today
+                history = self.history[column]
+                sums = self.window_sums[(column, window)] - history[:, self.position] + history[:, self._slot(window)]
+                frame[f'{prefix}_ma_{window}'] = np.where(self.age > window, sums / window, np.nan)[active]
+
+        return pd.DataFrame(frame)
+
+    def save(self, filepath):
+        """Persist the state (write-then-rename)"""
+        directory = os.path.dirname(filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        joblib.dump(self.__dict__, filepath + '.tmp')
+        os.replace(filepath + '.tmp', filepath)
+
+    @classmethod
+    def load(cls, filepath):
+        """Load a state written by save"""
+        state = cls.__new__(cls)
+        state.__dict__.update(joblib.load(filepath))
+        return state
@@ -0,0 +1,30 @@
+"""
+File locks for Walmart Analytics Platform
+Advisory inter-process locks (fcntl.flock) guarding files shared on disk
+"""
+
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # no flock on Windows; locking is skipped there
+    fcntl = None
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on path (created if missing) for the block
+
+    The lock belongs to the open file, so it is released when the block
+    exits or the process dies.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
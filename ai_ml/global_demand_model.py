@@ -0,0 +1,278 @@
+"""
+Pooled demand model for Walmart Analytics Platform
+Trains one XGBoost model on the stacked daily panel of every product
+"""
+
+import pandas as pd
+import numpy as np
+import xgboost as xgb
+import os
+from datetime import datetime
+
+try:
+    from .demand_forecasting import DemandForecaster
+    from .category_dictionary import CategoryDictionary, DEFAULT_CATEGORY_CODES_PATH, UNKNOWN_CODE
+    from .compiled_trees import COMPILED_BATCH_LIMIT
+except ImportError:
+    from demand_forecasting import DemandForecaster
+    from category_dictionary import CategoryDictionary, DEFAULT_CATEGORY_CODES_PATH, UNKNOWN_CODE
+    from compiled_trees import COMPILED_BATCH_LIMIT
+
+GLOBAL_FEATURE_COLUMNS = [
+    'day_of_week', 'month', 'is_weekend',
+    'quantity_lag_1', 'quantity_lag_7', 'quantity_lag_14',
+    'quantity_ma_7', 'quantity_ma_14',
+    'product_code', 'category_code'
+]
+
+# Dictionary columns behind product_code and category_code
+CODED_COLUMNS = ['product_id', 'category']
+
+class _ShardIter(xgb.DataIter):
+    """Feeds training shards to XGBoost one at a time
+
+    shards is a callable returning a fresh iterable of frames, because
+    XGBoost walks the data more than once (sketching, then quantizing).
+    """
+
+    def __init__(self, shards, prepare, part):
+        self._shards = shards
+        self._prepare = prepare
+        self._part = part
+        self._iterator = None
+        super().__init__()
+
+    def reset(self):
+        self._iterator = None
+
+    def next(self, input_data):
+        if self._iterator is None:
+            self._iterator = iter(self._shards())
+        for shard in self._iterator:
+            X, y = self._prepare(shard, self._part)
+            if len(X):
+                input_data(data=X, label=y)
+                return True
+        return False
+
+class GlobalDemandForecaster(DemandForecaster):
+    """One estimator for all products instead of one DemandForecaster each
+
+    Rows from every product are stacked and product_id / category are added
+    as dictionary codes, so products with short histories (including new
+    SKUs) share what was learned from the rest of the catalog.
+    """
+
+    def __init__(self, category_dictionary=None, n_estimators=300, max_depth=8,
+                 learning_rate=0.1, n_jobs=-1):
+        super().__init__()
+        # Trained by train_global, never by the per-product selection grid,
+        # so the grid's candidate estimators are never built
+        self._models = {}
+        self.category_dictionary = category_dictionary or CategoryDictionary(DEFAULT_CATEGORY_CODES_PATH)
+        self.n_estimators = n_estimators
+        self.params = {
+            'objective': 'reg:squarederror',
+            'eval_metric': 'mae',
+            'tree_method': 'hist',
+            'max_depth': max_depth,
+            'learning_rate': learning_rate,
+            'nthread': n_jobs if n_jobs > 0 else (os.cpu_count() or 1),
+            'seed': 42
+        }
+        # product code -> category code, for predictions without a category column
+        self.product_categories = {}
+
+    def prepare_features(self, data, grow=True):
+        """Demand features plus product_code and category_code
+
+        data needs a product_id column; category is optional once the
+        product has been seen in training.
+        """
+        X, y = super().prepare_features(data)
+        X = X.copy()
+        X['product_code'] = self.category_dictionary.encode('product_id', data['product_id'], grow=grow)
+        if 'category' in data:
+            X['category_code'] = self.category_dictionary.encode('category', data['category'], grow=grow)
+            self._remember_categories(X['product_code'].to_numpy(), X['category_code'].to_numpy())
+        else:
+            X['category_code'] = self._categories_for(X['product_code'].to_numpy())
+
+        return X[GLOBAL_FEATURE_COLUMNS], y
+
+    def _remember_categories(self, product_codes, category_codes):
+        pairs = np.unique(np.column_stack((product_codes, category_codes)), axis=0)
+        self.product_categories.update(
+            (int(product), int(category)) for product, category in pairs
+            if product != UNKNOWN_CODE and category != UNKNOWN_CODE
+        )
+
+    def _categories_for(self, product_codes):
+        known = pd.Series(self.product_categories, dtype=np.int64)
+        return known.reindex(product_codes).fillna(UNKNOWN_CODE).to_numpy(dtype=np.int32)
+
+    def _prepare_part(self, shard, part, validation_days=7):
+        """Features of one shard, split into the per-product tail or the rest"""
+        X, y = self.prepare_features(shard)
+        if part == 'all':
+            return X, y
+
+        holdout = (shard.groupby('product_id').cumcount(ascending=False) < validation_days).to_numpy()
+        rows = holdout if part == 'valid' else ~holdout
+        return X[rows], y[rows]
+
+    @staticmethod
+    def _shard_source(shards):
+        """Normalize a frame, a list of frames or a shard factory to a factory"""
+        if isinstance(shards, pd.DataFrame):
+            return lambda: [shards]
+        if callable(shards):
+            return shards
+        shards = list(shards)
+        return lambda: shards
+
+    def train_global(self, shards, validation_days=7, early_stopping_rounds=20, refit=True):
+        """Fit the pooled model on stacked product frames
+
+        shards is one frame, a list of frames or a callable returning an
+        iterable of frames (e.g. DataPreprocessor.iter_forecast_shards), each
+        with product_id, category, quantity and the demand features. Shards
+        are quantized one at a time, so the full panel never has to be in
+        memory as a float matrix. The last validation_days rows of every
+        product are held out to pick the number of boosting rounds; with
+        refit=True the model is then retrained on all rows.
+        """
+        source = self._shard_source(shards)
+        prepare = lambda shard, part: self._prepare_part(shard, part, validation_days)
+
+        dtrain = xgb.QuantileDMatrix(_ShardIter(source, prepare, 'train'))
+        dvalid = xgb.QuantileDMatrix(_ShardIter(source, prepare, 'valid'), ref=dtrain)
+        booster = xgb.train(
+            self.params, dtrain, num_boost_round=self.n_estimators,
+            evals=[(dvalid, 'valid')], early_stopping_rounds=early_stopping_rounds,
+            verbose_eval=False
+        )
+        rounds = booster.best_iteration + 1
+        self.validation_mae = float(booster.best_score)
+
+        if refit:
+            dall = xgb.QuantileDMatrix(_ShardIter(source, prepare, 'all'))
+            booster = xgb.train(self.params, dall, num_boost_round=rounds)
+
+        self.best_model = booster
+        self.compiled_model = None
+        self.feature_columns = list(GLOBAL_FEATURE_COLUMNS)
+        self.feature_importance = booster.get_score(importance_type='gain')
+        self.model_name = 'global_xgboost'
+        self.trained_at = datetime.now()
+        self.warm_updates = 0
+        self.category_dictionary.save_if_changed()
+
+        print(f"Global model: {rounds} rounds, validation MAE = {self.validation_mae:.2f}")
+        return self.model_name, self.validation_mae
+
+    def _with_codes(self, X):
+        """Add product/category codes to frames that only carry product_id"""
+        if 'product_code' in X and 'category_code' in X:
+            return X
+
+        X = X.copy()
+        if 'product_code' not in X:
+            X['product_code'] = self.category_dictionary.encode('product_id', X['product_id'], grow=False)
+        if 'category_code' not in X:
+            if 'category' in X:
+                X['category_code'] = self.category_dictionary.encode('category', X['category'], grow=False)
+            else:
+                X['category_code'] = self._categories_for(X['product_code'].to_numpy())
+        return X
+
+    def predict(self, X):
+        """Predict demand for rows of any products
+
+        X holds the demand features and either product_code/category_code or
+        product_id (plus optionally category). Missing lags are left to
+        XGBoost's native missing-value handling.
+        """
+        if self.best_model is None:
+            raise ValueError("Model not trained yet. Call train_global first.")
+
+        X = self._with_codes(X)
+        if self.compiled_model is not None and len(X) <= COMPILED_BATCH_LIMIT:
+            predictions = self.compiled_model.predict(X[self.feature_columns])
+        else:
+            predictions = self.best_model.predict(xgb.DMatrix(X[self.feature_columns]))
+
+        return np.maximum(predictions, 0)
+
+    def forecast_products(self, product_frames, days_ahead=7, categories=None):
+        """Recursive forecasts for many products with the single pooled model
+
+        product_frames maps product_id -> daily frame (sale_date, quantity);
+        categories optionally maps product_id -> category for products that
+        were not in the training data. Returns {product_id: forecast array}.
+        """
+        product_ids, history, last_dates = self.build_history_matrix(product_frames)
+        product_codes = self.category_dictionary.encode('product_id', product_ids, grow=False)
+        category_codes = self._categories_for(product_codes)
+
+        if categories:
+            given = [categories.get(product_id) for product_id in product_ids]
+            given_codes = self.category_dictionary.encode('category', given, grow=False)
+            category_codes = np.where(given_codes != UNKNOWN_CODE, given_codes, category_codes)
+
+        forecasts = self.forecast_batch(history, last_dates, days_ahead, static_features={
+            'product_code': product_codes,
+            'category_code': category_codes
+        })
+        return dict(zip(product_ids, forecasts))
+
+    def forecast_future_demand(self, historical_data, days_ahead=7):
+        """Forecast one product; historical_data should carry its product_id"""
+        if self.best_model is None:
+            raise ValueError("Model not trained yet.")
+
+        product_id = historical_data['product_id'].iloc[0] if 'product_id' in historical_data else None
+        return self.forecast_products({product_id: historical_data}, days_ahead)[product_id].tolist()
+
+    def warm_start_update(self, X, y, extra_estimators=10):
+        """Add extra_estimators boosting rounds fitted on X, y
+
+        As for DemandForecaster.warm_start_update, X, y should be the
+        training rows including the new ones, not only the new ones.
+        """
+        if self.best_model is None:
+            raise ValueError("No model to update. Train or load a model first.")
+
+        X = self._with_codes(X)
+        self.best_model = xgb.train(
+            self.params, xgb.DMatrix(X[self.feature_columns], label=y),
+            num_boost_round=extra_estimators, xgb_model=self.best_model
+        )
+        self.feature_importance = self.best_model.get_score(importance_type='gain')
+        if self.compiled_model is not None:
+            self.compile_model()
+        self.warm_updates += 1
+
+        return self.model_name
+
+    def _model_data(self):
+        model_data = super()._model_data()
+        model_data['params'] = self.params
+        model_data['product_categories'] = self.product_categories
+        # The codes the model was trained on, checked when it is loaded
+        model_data['category_codes'] = {
+            column: list(self.category_dictionary.categories.get(column, [])) for column in CODED_COLUMNS
+        }
+        return model_data
+
+    def _restore_model_data(self, model_data):
+        super()._restore_model_data(model_data)
+        self.params = model_data.get('params', self.params)
+        self.product_categories = model_data.get('product_categories', {})
+        # A dictionary that codes the training values differently (e.g. another
+        # file) would silently feed the model wrong codes; use the saved ones
+        category_codes = model_data.get('category_codes')
+        if category_codes is not None and not self.category_dictionary.matches(category_codes):
+            print(f"Category dictionary {self.category_dictionary.path} does not match the model's codes; "
+                  f"using the codes saved with the model")
+            self.category_dictionary = CategoryDictionary.from_categories(category_codes)
@@ -14,17 +14,34 @@ import joblib
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    from .category_dictionary import CategoryDictionary, DEFAULT_CATEGORY_CODES_PATH
+    from .compiled_trees import compile_tree_ensemble, COMPILED_BATCH_LIMIT
+except ImportError:
+    from category_dictionary import CategoryDictionary, DEFAULT_CATEGORY_CODES_PATH
+    from compiled_trees import compile_tree_ensemble, COMPILED_BATCH_LIMIT
+
 class InventoryOptimizer:
-    def __init__(self):
+    def __init__(self, category_dictionary=None):
         self.demand_forecaster = RandomForestRegressor(n_estimators=100, random_state=42)
+        # Array-backed copy of demand_forecaster, see compile_models
+        self.compiled_forecaster = None
         self.warehouse_clusterer = KMeans(n_clusters=3, random_state=42)
         self.scaler = StandardScaler()
         self.is_trained = False
+        self.category_dictionary = category_dictionary or CategoryDictionary(DEFAULT_CATEGORY_CODES_PATH)
         
     def prepare_demand_features(self, historical_data):
         """Prepare features for demand forecasting"""
         features = []
         
+        # Raw categories are encoded with the shared category dictionary
+        if 'category_encoded' not in historical_data.columns and 'category' in historical_data.columns:
+            historical_data = historical_data.assign(
+                category_encoded=self.category_dictionary.encode('category', historical_data['category'])
+            )
+            self.category_dictionary.save_if_changed()
+        
         for _, row in historical_data.iterrows():
             # Time-based features
             date = pd.to_datetime(row['date'])
@@ -72,6 +89,7 @@ class InventoryOptimizer:
         
         # Train the model
         self.demand_forecaster.fit(X, y)
+        self.compiled_forecaster = None
         
         # Calculate accuracy
         predictions = self.demand_forecaster.predict(X)
@@ -88,7 +106,7 @@ class InventoryOptimizer:
         if not self.is_trained:
             raise ValueError("Model not trained. Call train_demand_forecaster first.")
         
-        forecasts = []
+        feature_vectors = []
         
         for day in range(days_ahead):
             future_date = datetime.now() + timedelta(days=day+1)
@@ -107,14 +125,26 @@ class InventoryOptimizer:
                 product_data.get('weather_score', 0.5),    # weather_score
                 product_data.get('promotion_active', 0),   # promotion_active
                 product_data.get('price', 0),              # price
-                product_data.get('category_encoded', 0)    # category_encoded
+                self.category_dictionary.code(product_data)          # category_encoded
             ]
             
-            # Predict demand
-            demand = self.demand_forecaster.predict([feature_vector])[0]
-            forecasts.append(max(0, round(demand)))  # Ensure non-negative integer
+            feature_vectors.append(feature_vector)
+        
+        # Predict demand for all days in one call
+        model = self.demand_forecaster
+        if self.compiled_forecaster is not None and days_ahead <= COMPILED_BATCH_LIMIT:
+            model = self.compiled_forecaster
+        demand = model.predict(np.array(feature_vectors, dtype=np.float64))
+        
+        return [max(0, round(value)) for value in demand]  # Ensure non-negative integers
+    
+    def compile_models(self):
+        """Flatten the trained demand forest into NumPy arrays for low-latency forecasts"""
+        if not self.is_trained:
+            raise ValueError("Model not trained. Call train_demand_forecaster first.")
         
-        return forecasts
+        self.compiled_forecaster = compile_tree_ensemble(self.demand_forecaster)
+        return self.compiled_forecaster
     
     def analyze_warehouse_redistribution(self, warehouse_data):
         """Analyze warehouse data for redistribution opportunities"""
@@ -305,18 +335,34 @@ class InventoryOptimizer:
         
         return optimized_orders
     
-    def save_models(self, filepath_prefix):
-        """Save trained models"""
-        joblib.dump(self.demand_forecaster, f"{filepath_prefix}_demand_forecaster.joblib")
-        joblib.dump(self.warehouse_clusterer, f"{filepath_prefix}_warehouse_clusterer.joblib")
-        joblib.dump(self.scaler, f"{filepath_prefix}_scaler.joblib")
+    def save_models(self, filepath_prefix, store=None):
+        """Save trained models
+        
+        With a PackedModelStore the three models are published together as
+        one generation, under names starting with filepath_prefix.
+        """
+        if store is not None:
+            with store.transaction():
+                store.put(f"{filepath_prefix}_demand_forecaster", self.demand_forecaster)
+                store.put(f"{filepath_prefix}_warehouse_clusterer", self.warehouse_clusterer)
+                store.put(f"{filepath_prefix}_scaler", self.scaler)
+        else:
+            joblib.dump(self.demand_forecaster, f"{filepath_prefix}_demand_forecaster.joblib")
+            joblib.dump(self.warehouse_clusterer, f"{filepath_prefix}_warehouse_clusterer.joblib")
+            joblib.dump(self.scaler, f"{filepath_prefix}_scaler.joblib")
         print(f"Models saved with prefix: {filepath_prefix}")
     
-    def load_models(self, filepath_prefix):
+    def load_models(self, filepath_prefix, store=None):
         """Load trained models"""
-        self.demand_forecaster = joblib.load(f"{filepath_prefix}_demand_forecaster.joblib")
-        self.warehouse_clusterer = joblib.load(f"{filepath_prefix}_warehouse_clusterer.joblib")
-        self.scaler = joblib.load(f"{filepath_prefix}_scaler.joblib")
+        if store is not None:
+            self.demand_forecaster = store.get(f"{filepath_prefix}_demand_forecaster")
+            self.warehouse_clusterer = store.get(f"{filepath_prefix}_warehouse_clusterer")
+            self.scaler = store.get(f"{filepath_prefix}_scaler")
+        else:
+            self.demand_forecaster = joblib.load(f"{filepath_prefix}_demand_forecaster.joblib")
+            self.warehouse_clusterer = joblib.load(f"{filepath_prefix}_warehouse_clusterer.joblib")
+            self.scaler = joblib.load(f"{filepath_prefix}_scaler.joblib")
+        self.compiled_forecaster = None
         self.is_trained = True
         print(f"Models loaded from prefix: {filepath_prefix}")
 
@@ -0,0 +1,316 @@
+"""
+Job scheduler for Walmart Analytics Platform
+Asyncio scheduler for the heavy training jobs: runs them in worker processes
+or threads with concurrency limits, mutual exclusion, wall-clock budgets and
+catch-up of runs missed while the scheduler was down
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+class Schedule:
+    """A daily, weekly or monthly wall-clock trigger
+
+    weekday applies to weekly schedules and day (1-28) to monthly ones.
+    """
+
+    def __init__(self, every='day', at='00:00', weekday=None, day=1):
+        if every not in ('day', 'week', 'month'):
+            raise ValueError(f"Unsupported schedule period: {every}")
+        if every == 'month' and not 1 <= day <= 28:
+            raise ValueError("Monthly schedules run on day 1-28 so that every month has the day.")
+        self.every = every
+        self.hour, self.minute = (int(part) for part in at.split(':'))
+        self.weekday = WEEKDAYS.index(weekday) if every == 'week' else None
+        self.day = day
+
+    @classmethod
+    def daily(cls, at):
+        return cls('day', at)
+
+    @classmethod
+    def weekly(cls, weekday, at):
+        return cls('week', at, weekday=weekday)
+
+    @classmethod
+    def monthly(cls, day=1, at='00:00'):
+        return cls('month', at, day=day)
+
+    def _candidate(self, dt):
+        """Trigger time in the period (day, week or month) that contains dt"""
+        base = dt.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+        if self.every == 'week':
+            return base + timedelta(days=self.weekday - dt.weekday())
+        if self.every == 'month':
+            return base.replace(day=self.day)
+        return base
+
+    def _shift(self, dt, periods):
+        if self.every == 'day':
+            return dt + timedelta(days=periods)
+        if self.every == 'week':
+            return dt + timedelta(weeks=periods)
+        month = dt.month - 1 + periods
+        return dt.replace(year=dt.year + month // 12, month=month % 12 + 1)
+
+    def next_after(self, dt):
+        """First trigger time strictly after dt"""
+        candidate = self._candidate(dt)
+        return candidate if candidate > dt else self._shift(candidate, 1)
+
+    def last_before(self, dt):
+        """Latest trigger time at or before dt"""
+        candidate = self._candidate(dt)
+        return candidate if candidate <= dt else self._shift(candidate, -1)
+
+    def __repr__(self):
+        when = f"{self.hour:02d}:{self.minute:02d}"
+        if self.every == 'week':
+            return f"every {WEEKDAYS[self.weekday]} at {when}"
+        if self.every == 'month':
+            return f"monthly on day {self.day} at {when}"
+        return f"daily at {when}"
+
+class Job:
+    def __init__(self, name, func, schedule, args=(), kwargs=None, executor='process',
+                 max_instances=1, exclusive=(), budget=None, catch_up=True):
+        self.name = name
+        self.func = func
+        self.schedule = schedule
+        self.args = tuple(args)
+        self.kwargs = kwargs or {}
+        # 'process' runs can be killed when over budget; 'thread' runs cannot
+        self.executor = executor
+        # Runs of this job allowed at once, counting runs waiting for a lock
+        self.max_instances = max_instances
+        # Names of exclusion groups; jobs sharing a group never overlap
+        self.exclusive = (exclusive,) if isinstance(exclusive, str) else tuple(exclusive)
+        # Wall-clock seconds a run may take, or None
+        self.budget = budget
+        # Run once on startup if a trigger was missed while the scheduler was down
+        self.catch_up = catch_up
+        self.instances = 0
+        self.next_run = None
+
+def _run_job(func, args, kwargs):
+    """Entry point of a job process"""
+    func(*args, **kwargs)
+
+class AsyncJobScheduler:
+    """Run scheduled jobs on an asyncio loop without blocking it
+
+    Each run happens in a fresh process (killed if it exceeds the job's
+    budget) or on a thread pool. Runs of jobs that share an exclusion group
+    are serialized: a run waits for the group before it starts, and a job
+    already at max_instances skips the new trigger. The last completed
+    trigger of every job is kept in state_path, so triggers missed while the
+    scheduler was down, or whose run failed, are caught up once on startup.
+    """
+
+    def __init__(self, state_path='models/scheduler_state.json', thread_workers=2,
+                 process_start_method='spawn', poll_interval=1.0, max_sleep=60.0):
+        self.state_path = state_path
+        self.jobs = {}
+        self.state = self._load_state()
+        self.poll_interval = poll_interval
+        self.max_sleep = max_sleep
+        self._threads = ThreadPoolExecutor(max_workers=thread_workers)
+        self._process_context = multiprocessing.get_context(process_start_method)
+        self._locks = {}
+        self._tasks = set()
+        self._processes = set()
+        self._stopping = None
+
+    def add_job(self, name, func, schedule, **options):
+        """Register func(*args, **kwargs) to run on schedule (see Job for options)
+
+        Process jobs must be picklable, i.e. module-level functions.
+        """
+        if name in self.jobs:
+            raise ValueError(f"Duplicate job {name}")
+        job = Job(name, func, schedule, **options)
+        for group in job.exclusive:
+            self._locks.setdefault(group, asyncio.Lock())
+        self.jobs[name] = job
+        return job
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path) as f:
+            return json.load(f)
+
+    def _save_state(self):
+        if os.path.dirname(self.state_path):
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        with open(self.state_path + '.tmp', 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(self.state_path + '.tmp', self.state_path)
+
+    def missed_runs(self, now=None):
+        """Jobs whose latest trigger passed without a completed run
+
+        Jobs never seen before are only recorded, not caught up.
+        """
+        now = now or datetime.now()
+        missed = []
+        for job in self.jobs.values():
+            due = job.schedule.last_before(now)
+            record = self.state.get(job.name)
+            if record is None:
+                self.state[job.name] = {'last_trigger': due.isoformat()}
+            elif job.catch_up and datetime.fromisoformat(record['last_trigger']) < due:
+                missed.append((job, due))
+        self._save_state()
+        return missed
+
+    async def run(self):
+        """Run until stop() is called"""
+        self._stopping = asyncio.Event()
+        now = datetime.now()
+        for job, due in self.missed_runs(now):
+            logging.info(f"Catching up missed run of {job.name} (due {due})")
+            self._launch(job, due)
+        for job in self.jobs.values():
+            job.next_run = job.schedule.next_after(now)
+            logging.info(f"Scheduled {job.name}: {job.schedule}, next run {job.next_run}")
+
+        while not self._stopping.is_set():
+            now = datetime.now()
+            for job in self.jobs.values():
+                if job.next_run <= now:
+                    self._launch(job, job.next_run)
+                    job.next_run = job.schedule.next_after(now)
+
+            # Sleep in bounded steps so wall-clock jumps are noticed
+            wake = min(job.next_run for job in self.jobs.values())
+            delay = min(max((wake - datetime.now()).total_seconds(), 0), self.max_sleep)
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+        await self._shutdown()
+
+    def stop(self):
+        if self._stopping is not None:
+            self._stopping.set()
+
+    def _launch(self, job, trigger):
+        if job.instances >= job.max_instances:
+            logging.warning(f"Skipping {job.name} run due {trigger}: "
+                            f"{job.instances} run(s) already active (max_instances={job.max_instances})")
+            return None
+        job.instances += 1
+        task = asyncio.create_task(self._run_job(job, trigger))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run_job(self, job, trigger):
+        """Wait for the job's exclusion groups, then run it within its budget"""
+        locks = [self._locks[group] for group in sorted(job.exclusive)]  # fixed order avoids deadlocks
+        acquired = []
+        try:
+            for lock in locks:
+                if lock.locked():
+                    logging.info(f"{job.name} waiting for exclusive group to be free")
+                await lock.acquire()
+                acquired.append(lock)
+
+            logging.info(f"Starting {job.name} (trigger {trigger})")
+            start = time.monotonic()
+            try:
+                if job.executor == 'process':
+                    status = await self._run_in_process(job)
+                else:
+                    status = await self._run_in_thread(job)
+            except Exception as e:  # e.g. the job process could not be started
+                status = f'failed ({str(e).strip().splitlines()[0]})'
+            duration = time.monotonic() - start
+            logging.log(logging.INFO if status == 'completed' else logging.ERROR,
+                        f"{job.name} {status} after {duration:.1f}s")
+
+            # Only a finished run consumes its trigger; failed or killed runs
+            # keep the previous one, so they are caught up on the next start
+            previous = self.state.get(job.name, {}).get('last_trigger')
+            finished = status in ('completed', 'over_budget') or previous is None
+            self.state[job.name] = {
+                'last_trigger': trigger.isoformat() if finished else previous,
+                'last_status': status,
+                'last_duration': duration,
+                'finished_at': datetime.now().isoformat()
+            }
+            self._save_state()
+            return status
+        finally:
+            for lock in acquired:
+                lock.release()
+            job.instances -= 1
+
+    async def _run_in_process(self, job):
+        process = self._process_context.Process(
+            target=_run_job, args=(job.func, job.args, job.kwargs), name=f'job-{job.name}', daemon=False
+        )
+        process.start()
+        self._processes.add(process)
+        deadline = time.monotonic() + job.budget if job.budget else None
+        try:
+            while process.is_alive():
+                if deadline is not None and time.monotonic() >= deadline:
+                    logging.error(f"{job.name} exceeded its {job.budget:.0f}s budget, terminating")
+                    self._terminate(process)
+                    return 'timed_out'
+                await asyncio.sleep(self.poll_interval)
+            process.join()
+            return 'completed' if process.exitcode == 0 else f'failed (exit code {process.exitcode})'
+        except asyncio.CancelledError:
+            self._terminate(process)
+            raise
+        finally:
+            self._processes.discard(process)
+
+    @staticmethod
+    def _terminate(process, grace=10.0):
+        process.terminate()
+        process.join(grace)
+        if process.is_alive():
+            process.kill()
+            process.join()
+
+    async def _run_in_thread(self, job):
+        """Threads cannot be interrupted: an over-budget run is reported but
+        keeps its exclusion groups until it actually finishes"""
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._threads, _run_job, job.func, job.args, job.kwargs)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=job.budget)
+            return 'completed'
+        except asyncio.TimeoutError:
+            logging.error(f"{job.name} exceeded its {job.budget:.0f}s budget; threads cannot be stopped, waiting")
+            try:
+                await future
+            except Exception as e:
+                logging.error(f"{job.name} failed: {str(e)}")
+                return 'failed'
+            return 'over_budget'
+        except Exception as e:
+            logging.error(f"{job.name} failed: {str(e)}")
+            return 'failed'
+
+    async def _shutdown(self):
+        """Cancel pending runs and terminate running job processes"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for process in list(self._processes):
+            self._terminate(process)
+        self._threads.shutdown(wait=False)
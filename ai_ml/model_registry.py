@@ -0,0 +1,241 @@
+"""
+Model registry for Walmart Analytics Platform
+Versioned manifests over saved model artifacts, memory-mapped loading and a
+byte-bounded LRU cache of loaded models for serving
+"""
+
+import numpy as np
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+try:
+    from .demand_forecasting import DemandForecaster
+except ImportError:
+    from demand_forecasting import DemandForecaster
+
+MANIFEST_NAME = 'manifest.json'
+
+DEMAND_MODEL_PATTERN = re.compile(r'^demand_model_product_(.+)\.joblib$')
+
+def mapped_bytes(obj, _seen=None):
+    """Bytes of the memory-mapped arrays reachable from obj
+
+    Those pages live in the OS page cache and are shared between workers,
+    so they are not counted against the cache budget.
+    """
+    _seen = _seen if _seen is not None else set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    if isinstance(obj, np.memmap):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sum(mapped_bytes(value, _seen) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(mapped_bytes(value, _seen) for value in obj)
+    if hasattr(obj, '__dict__') and not isinstance(obj, type):
+        return mapped_bytes(vars(obj), _seen)
+    return 0
+
+class ModelRegistry:
+    """Serve per-product demand models without reloading them on every call
+
+    The manifest lists every artifact with a version that is bumped whenever
+    the file changes; each write produces a new numbered manifest, and
+    manifest.json points at the latest. Loaded models are kept in an LRU
+    cache bounded by max_bytes of resident memory. Artifacts are loaded with
+    mmap_mode, so plain NumPy arrays (e.g. compiled tree arrays) are mapped
+    from disk instead of being copied into the process.
+
+    With a PackedModelStore the store's index is the manifest: its
+    generation is the manifest version and each entry's generation is the
+    model version. Models are then read from the packs without mmap.
+
+    get() re-reads the manifest (or the store's CURRENT pointer) at most
+    every refresh_interval seconds, so a long-running server picks up newly
+    published models; None disables the check.
+    """
+
+    def __init__(self, models_dir='models', max_bytes=512 * 1024 ** 2, mmap_mode='r', store=None,
+                 refresh_interval=30.0):
+        self.models_dir = models_dir
+        self.max_bytes = max_bytes
+        self.mmap_mode = mmap_mode
+        self.store = store
+        self.refresh_interval = refresh_interval
+        self.manifest = {'version': 0, 'models': {}}
+        self._checked_at = time.monotonic()
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refresh()
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.models_dir, MANIFEST_NAME)
+
+    def refresh(self):
+        """Re-read manifest.json; returns True if a newer version was found"""
+        self._checked_at = time.monotonic()
+        if self.store is not None:
+            self.store.refresh()
+            if self.store.generation == self.manifest['version']:
+                return False
+            self.manifest = self._store_manifest()
+            return True
+
+        if not os.path.exists(self.manifest_path):
+            return False
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        if manifest['version'] == self.manifest['version']:
+            return False
+        self.manifest = manifest
+        return True
+
+    def build_manifest(self):
+        """Scan models_dir and publish a new manifest version if anything changed
+
+        An artifact's version is bumped when its size or mtime changes;
+        removed artifacts are dropped. Returns the current manifest version.
+        """
+        self.refresh()
+        if self.store is not None:
+            return self.manifest['version']  # the store publishes its own index
+        previous = self.manifest['models']
+        models = {}
+
+        for entry in os.scandir(self.models_dir) if os.path.isdir(self.models_dir) else []:
+            match = DEMAND_MODEL_PATTERN.match(entry.name)
+            if not match:
+                continue
+            stat = entry.stat()
+            record = {
+                'path': entry.name,
+                'product_id': match.group(1),
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns
+            }
+            old = previous.get(entry.name)
+            unchanged = old and old['size'] == record['size'] and old['mtime_ns'] == record['mtime_ns']
+            record['version'] = old['version'] if unchanged else (old['version'] + 1 if old else 1)
+            models[entry.name] = record
+
+        if models != previous:
+            self._write_manifest(models)
+        return self.manifest['version']
+
+    def _store_manifest(self):
+        models = {}
+        for name, (_, _, length, _, generation) in self.store.entries.items():
+            match = DEMAND_MODEL_PATTERN.match(name)
+            if match:
+                models[name] = {'path': name, 'product_id': match.group(1), 'size': length, 'version': generation}
+        return {'version': self.store.generation, 'models': models}
+
+    def _write_manifest(self, models):
+        """Write manifests/manifest_<version>.json and point manifest.json at it"""
+        version = self.manifest['version'] + 1
+        manifest = {'version': version, 'created_at': datetime.now().isoformat(), 'models': models}
+
+        history_dir = os.path.join(self.models_dir, 'manifests')
+        os.makedirs(history_dir, exist_ok=True)
+        with open(os.path.join(history_dir, f'manifest_{version:06d}.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        with open(self.manifest_path + '.tmp', 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(self.manifest_path + '.tmp', self.manifest_path)
+
+        self.manifest = manifest
+
+    @staticmethod
+    def demand_model_name(product_id):
+        return f'demand_model_product_{product_id}.joblib'
+
+    def get_demand_forecaster(self, product_id):
+        """Loaded DemandForecaster for product_id (cached), or None if absent"""
+        return self.get(self.demand_model_name(product_id))
+
+    def _refresh_if_due(self):
+        if self.refresh_interval is None:
+            return
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.refresh_interval:
+                return
+            self._checked_at = time.monotonic()  # one caller refreshes, the others carry on
+        self.refresh()
+
+    def get(self, name):
+        """Return the loaded model for a manifest entry, loading it on a miss"""
+        self._refresh_if_due()
+        record = self.manifest['models'].get(name)
+        if record is None:
+            return None
+
+        with self._lock:
+            cached = self._cache.get(name)
+            if cached is not None and cached[2] == record['version']:
+                self._cache.move_to_end(name)
+                self.hits += 1
+                return cached[0]
+            self.misses += 1
+
+        forecaster, nbytes = self._load(record)
+
+        with self._lock:
+            if name in self._cache:
+                self.resident_bytes -= self._cache.pop(name)[1]
+            self._cache[name] = (forecaster, nbytes, record['version'])
+            self.resident_bytes += nbytes
+            self._evict()
+        return forecaster
+
+    def _load(self, record):
+        """Load one artifact; returns (forecaster, resident bytes estimate)"""
+        forecaster = DemandForecaster()
+        if self.store is not None:
+            forecaster.load_model(record['path'], store=self.store)
+        else:
+            forecaster.load_model(os.path.join(self.models_dir, record['path']), mmap_mode=self.mmap_mode)
+        # The unpickled objects are about as large as the file, minus mapped arrays
+        nbytes = max(record['size'] - mapped_bytes(forecaster), 0)
+        return forecaster, nbytes
+
+    def _evict(self):
+        """Drop least recently used models until the cache fits max_bytes
+
+        The most recent entry always stays, even if it alone exceeds the budget.
+        """
+        while self.resident_bytes > self.max_bytes and len(self._cache) > 1:
+            _, (_, nbytes, _) = self._cache.popitem(last=False)
+            self.resident_bytes -= nbytes
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.resident_bytes = 0
+
+    def stats(self):
+        """Cache counters for monitoring"""
+        requests = self.hits + self.misses
+        return {
+            'manifest_version': self.manifest['version'],
+            'models': len(self.manifest['models']),
+            'cached': len(self._cache),
+            'resident_bytes': self.resident_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / requests if requests else 0.0
+        }
@@ -0,0 +1,346 @@
+"""
+Packed model store for Walmart Analytics Platform
+Keeps many serialized models in a few append-only pack files with an offset
+index, published atomically as numbered generations
+"""
+
+import joblib
+import io
+import json
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    from .file_lock import file_lock
+except ImportError:
+    from file_lock import file_lock
+
+CURRENT_NAME = 'CURRENT'
+
+# Held by the writer of a transaction and by prune, across processes
+LOCK_NAME = 'LOCK'
+
+def serialize(obj, compress=0):
+    """joblib payload of obj as stored in a pack"""
+    buffer = io.BytesIO()
+    joblib.dump(obj, buffer, compress=compress)
+    return buffer.getvalue()
+
+class PackedModelStore:
+    """Many models in a few files, with random access to any one of them
+
+    Layout under root:
+      CURRENT                   name of the live index file
+      index-<generation>.json   name -> [pack, offset, length, crc32, generation]
+      pack-<generation>-<n>.bin concatenated joblib payloads
+
+    A generation only writes the models that changed; its index still lists
+    every live model, pointing into older packs for the unchanged ones.
+    Generations published by checkpoint() write a delta index instead: the
+    entries changed since its base index, and the names deleted, so a
+    checkpoint costs what it wrote rather than the size of the catalog.
+    The transaction's final commit writes a full index again.
+    Pack and index files are written under a temporary name and renamed, and
+    CURRENT is replaced last, so a crash mid-run leaves the previous
+    generation intact. Pack files are never modified once published, so
+    readers can keep using the generation they loaded. Writers and prune()
+    hold an exclusive lock on root/LOCK, so two processes never publish the
+    same generation.
+    """
+
+    def __init__(self, root='models/store', max_pack_bytes=1024 ** 3, compress=0):
+        self.root = root
+        self.max_pack_bytes = max_pack_bytes
+        self.compress = compress
+        self.generation = 0
+        self.entries = {}
+        self._index_name = None
+        self._index_is_delta = False
+        self._files = {}
+        self._writer = None
+        self._lock = threading.Lock()
+        self._store_locked = False
+        self.refresh()
+
+    def refresh(self):
+        """Load the index CURRENT points to; returns True if it changed"""
+        current_path = os.path.join(self.root, CURRENT_NAME)
+        if not os.path.exists(current_path):
+            return False
+        with open(current_path) as f:
+            index_name = f.read().strip()
+        if index_name == self._index_name:
+            return False
+
+        self.generation, self.entries, self._index_is_delta = self._read_index(index_name)
+        self._index_name = index_name
+        return True
+
+    def _read_index(self, index_name):
+        """(generation, entries, is_delta) of an index, resolving delta chains"""
+        chain = []
+        while index_name is not None:
+            with open(os.path.join(self.root, index_name)) as f:
+                chain.append(json.load(f))
+            index_name = chain[-1].get('base')
+
+        entries = {}
+        for index in reversed(chain):
+            for name in index.get('deleted', []):
+                entries.pop(name, None)
+            entries.update(index['entries'])
+        return chain[0]['generation'], entries, len(chain) > 1
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def names(self):
+        return list(self.entries)
+
+    def get_bytes(self, name):
+        """Raw payload of one model, read with a single positioned read"""
+        pack, offset, length, crc, _ = self.entries[name]
+        with self._lock:
+            fd = self._files.get(pack)
+            if fd is None:
+                fd = self._files[pack] = os.open(os.path.join(self.root, pack), os.O_RDONLY)
+        payload = os.pread(fd, length, offset)
+        if len(payload) != length or zlib.crc32(payload) != crc:
+            raise IOError(f"Corrupt entry {name} in {pack}")
+        return payload
+
+    def get(self, name):
+        """Deserialize one model without touching the rest of the pack"""
+        return joblib.load(io.BytesIO(self.get_bytes(name)))
+
+    @contextmanager
+    def transaction(self):
+        """Group puts into one generation, published when the block exits
+
+        On an exception nothing is published and the partial pack is removed.
+        Nested transactions join the outer one.
+        """
+        if self._writer is not None:
+            yield self
+            return
+
+        with self._store_lock():
+            self._begin()
+            try:
+                yield self
+            except BaseException:
+                self.abort()
+                raise
+            self.commit()
+
+    @contextmanager
+    def _store_lock(self):
+        """Exclusive lock on the store across processes; re-entrant here"""
+        if self._store_locked:
+            yield
+            return
+        with file_lock(os.path.join(self.root, LOCK_NAME)):
+            self._store_locked = True
+            try:
+                yield
+            finally:
+                self._store_locked = False
+
+    def _begin(self):
+        if self._writer is not None:
+            raise RuntimeError("A transaction is already open on this store.")
+        os.makedirs(self.root, exist_ok=True)
+        self.refresh()
+        self._writer = {
+            'generation': self.generation + 1,
+            'entries': dict(self.entries),
+            'changed': {},
+            'deleted': set(),
+            'packs': [],
+            'handle': None,
+            'dirty': False
+        }
+
+    def _roll_pack(self):
+        writer = self._writer
+        if writer['handle'] is not None:
+            writer['handle'].close()
+        pack = f"pack-{writer['generation']:06d}-{len(writer['packs']):03d}.bin"
+        writer['packs'].append(pack)
+        writer['handle'] = open(os.path.join(self.root, pack + '.tmp'), 'wb')
+
+    def put(self, name, obj):
+        """Serialize obj under name; outside a transaction it is published at once"""
+        if self._writer is None:
+            with self.transaction():
+                return self.put(name, obj)
+
+        self._append(name, serialize(obj, self.compress))
+
+    def put_bytes(self, name, payload):
+        """Store an already serialized payload (see serialize) under name"""
+        if self._writer is None:
+            with self.transaction():
+                return self.put_bytes(name, payload)
+        self._append(name, payload)
+
+    def _append(self, name, payload):
+        """Write one payload to the open pack, starting a new pack when it is full"""
+        writer = self._writer
+        handle = writer['handle']
+        if handle is None or (handle.tell() and handle.tell() + len(payload) > self.max_pack_bytes):
+            self._roll_pack()
+            handle = writer['handle']
+        entry = [writer['packs'][-1], handle.tell(), len(payload), zlib.crc32(payload), writer['generation']]
+        writer['entries'][name] = writer['changed'][name] = entry
+        writer['dirty'] = True
+        handle.write(payload)
+
+    def delete(self, name):
+        if self._writer is None:
+            with self.transaction():
+                return self.delete(name)
+        if self._writer['entries'].pop(name, None) is not None:
+            self._writer['changed'].pop(name, None)
+            self._writer['deleted'].add(name)
+            self._writer['dirty'] = True
+
+    def commit(self, delta=False):
+        """Publish the open transaction as the next generation
+
+        With delta the index lists only what changed on top of the current
+        index. A transaction that wrote and deleted nothing publishes
+        nothing, unless a full commit has a delta chain to fold.
+        """
+        writer, self._writer = self._writer, None
+        if not writer['dirty'] and (delta or not self._index_is_delta):
+            return self.generation
+        if writer['handle'] is not None:
+            writer['handle'].flush()
+            os.fsync(writer['handle'].fileno())
+            writer['handle'].close()
+        for pack in writer['packs']:
+            os.replace(os.path.join(self.root, pack + '.tmp'), os.path.join(self.root, pack))
+
+        index = {'generation': writer['generation'], 'created_at': datetime.now().isoformat()}
+        if delta and self._index_name is not None:
+            index.update(base=self._index_name, deleted=sorted(writer['deleted']), entries=writer['changed'])
+        else:
+            index['entries'] = writer['entries']
+        index_name = f"index-{writer['generation']:06d}.json"
+        self._write_atomic(index_name, json.dumps(index))
+        self._write_atomic(CURRENT_NAME, index_name)
+        self.refresh()
+        return self.generation
+
+    def checkpoint(self):
+        """Publish the open transaction as a delta and continue in a fresh one"""
+        if self._writer is None:
+            raise RuntimeError("No open transaction to checkpoint.")
+        generation = self.commit(delta=True)
+        self._begin()
+        return generation
+
+    def abort(self):
+        """Discard the open transaction"""
+        writer, self._writer = self._writer, None
+        if writer is None:
+            return
+        if writer['handle'] is not None:
+            writer['handle'].close()
+        for pack in writer['packs']:
+            tmp_path = os.path.join(self.root, pack + '.tmp')
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _write_atomic(self, name, text):
+        path = os.path.join(self.root, name)
+        with open(path + '.tmp', 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+    def compact(self):
+        """Rewrite all live models into a fresh generation, then prune"""
+        with self.transaction():
+            for name in list(self.entries):
+                self._append(name, self.get_bytes(name))
+        return self.prune(keep=1)
+
+    def prune(self, keep=2):
+        """Delete index files other than the last keep full generations and
+        the deltas published since the newest of them, and pack files none
+        of the remaining indexes reference
+
+        Readers still holding a pruned generation must refresh() first.
+        """
+        keep = max(keep, 1)  # never drop the live generation
+        with self._store_lock():
+            indexes = {}
+            for name in sorted(os.listdir(self.root)):
+                if name.startswith('index-') and name.endswith('.json'):
+                    with open(os.path.join(self.root, name)) as f:
+                        indexes[name] = json.load(f)
+            full = [name for name, index in indexes.items() if index.get('base') is None]
+            # Deltas after the newest full index chain back to it
+            kept = set(full[-keep:]) | {name for name in indexes if not full or name > full[-1]}
+            removed = []
+            for name in indexes:
+                if name not in kept:
+                    os.remove(os.path.join(self.root, name))
+                    removed.append(name)
+
+            referenced = set()
+            for name in kept:
+                referenced.update(entry[0] for entry in indexes[name]['entries'].values())
+
+            with self._lock:
+                for name in os.listdir(self.root):
+                    # With the store lock held no other process is writing, so
+                    # .tmp files are leftovers of a crashed writer (unless this
+                    # object has a transaction open)
+                    stale_tmp = name.endswith('.tmp') and self._writer is None
+                    if stale_tmp or (name.startswith('pack-') and name.endswith('.bin') and name not in referenced):
+                        if name in self._files:
+                            os.close(self._files.pop(name))
+                        os.remove(os.path.join(self.root, name))
+                        removed.append(name)
+        return removed
+
+    def close(self):
+        with self._lock:
+            for fd in self._files.values():
+                os.close(fd)
+            self._files.clear()
+
+class StagedModelStore:
+    """Read-through view of a PackedModelStore that buffers writes
+
+    Worker processes cannot join the parent's transaction, so they read
+    existing models from the store and hand their serialized writes back
+    with take_writes(); the parent adds them with put_bytes().
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.writes = []
+
+    def __contains__(self, name):
+        return name in self.store
+
+    def get(self, name):
+        return self.store.get(name)
+
+    def put(self, name, obj):
+        self.writes.append((name, serialize(obj, self.store.compress)))
+
+    def take_writes(self):
+        writes, self.writes = self.writes, []
+        return writes
@@ -3,14 +3,38 @@ Model training pipeline for automated ML model updates
 Handles scheduled retraining and model performance monitoring
 """
 
-import schedule
+import asyncio
+import signal
+import sys
 import time
+import argparse
 import logging
-from datetime import datetime
+import os
+import json
+import traceback
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from functools import partial
+from datetime import datetime, date, timedelta
 from data_preprocessing import DataPreprocessor
-from demand_forecasting import DemandForecaster
+from demand_forecasting import DemandForecaster, FEATURE_VERSION, FULL_RETRAIN_DAYS
+from global_demand_model import GlobalDemandForecaster
+from statistical_forecasting import StatisticalForecaster, DemandRouter
+from model_registry import ModelRegistry
+from model_store import PackedModelStore, StagedModelStore
+from shared_sales import SharedDailySales
+from sales_cache import db_fingerprint
+from pipeline_dag import StageGraph
+from run_journal import RunJournal
+from job_scheduler import AsyncJobScheduler, Schedule
 from customer_segmentation import CustomerSegmentation
 
+# Outcomes after which a product's fingerprint is recorded (failures are retried)
+FINGERPRINTED_STATUSES = ('trained', 'warm_started', 'insufficient_data')
+
+FINGERPRINTS_NAME = 'demand_fingerprints.json'
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -22,106 +46,694 @@ logging.basicConfig(
 )
 
 class ModelTrainingPipeline:
-    def __init__(self):
+    def __init__(self, model_selection='halving', demand_model='per_product', router=None, model_store=None,
+                 n_workers=1, journal_path='models/run_journal.db', checkpoint_every=100,
+                 max_retries=2, retry_backoff=30.0, models_dir='models', store_keep=2):
+        # demand_model='global' trains one pooled model instead of one per product
+        self.model_selection = model_selection
+        self.demand_model = demand_model
+        # n_workers > 1 retrains per-product models on a process pool (None = all cores)
+        if n_workers is not None and (not isinstance(n_workers, int) or n_workers < 1):
+            raise ValueError(f"n_workers must be a positive integer or None, got {n_workers!r}")
+        self.n_workers = n_workers
+        # Optional PackedModelStore (or its directory) replacing the per-product joblib files
+        self.model_store = PackedModelStore(model_store) if isinstance(model_store, str) else model_store
+        # Store generations kept when a retraining run prunes the store
+        self.store_keep = store_keep
+        # Per-product run journal for resuming interrupted runs (None disables),
+        # opened for the duration of each retraining run.
+        # With a model store progress is published every checkpoint_every products, and failed
+        # products are retried max_retries times, retry_backoff * 2**n seconds apart
+        self.journal_path = journal_path
+        self.journal = None
+        self.checkpoint_every = checkpoint_every
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        # Directory of the model artifacts (per-product files when there is no store)
+        self.models_dir = models_dir
+        # Slow movers go to the vectorized statistical models (router=False disables)
+        self.router = DemandRouter() if router is None else router
         self.preprocessor = DataPreprocessor()
         self.demand_forecaster = DemandForecaster()
         self.customer_segmentation = CustomerSegmentation()
+        # Cache key of the cleaned sales currently loaded in the preprocessor
+        self._clean_sales_key = None
+        
+    def retrain_demand_models(self, full_retrain=False, resume=False):
+        """Retrain demand forecasting models with latest data
+        
+        Existing models are warm-started with the rows added since their
+        training cutoff unless full_retrain is set, the model is due for its
+        periodic full retrain or has reached its tree cap, or drift on those
+        new rows is detected. Products whose cleaned sales still match
+        the fingerprint recorded with their model are skipped (status
+        'unchanged') unless full_retrain is set. With resume, the last
+        interrupted run in the journal is continued: products it completed are
+        not retrained again. Returns one result dict per product (product_id,
+        status, seconds, error), or None if the run failed.
+        """
+        if self.demand_model == 'global':
+            return self.retrain_global_demand_model()
         
-    def retrain_demand_models(self):
-        """Retrain demand forecasting models with latest data"""
         try:
             logging.info("Starting demand model retraining...")
             
-            # Load and preprocess data
-            self.preprocessor.load_data_from_db()
-            clean_data = self.preprocessor.clean_sales_data()
+            # Load and preprocess data (cached when the DB is unchanged, otherwise
+            # only sales newer than the last run are queried)
+            self.preprocessor.load_clean_sales_data(incremental=True)
             
-            # Get unique products
-            products = clean_data['product_id'].unique()
-            
-            for product_id in products:
-                logging.info(f"Training model for product {product_id}")
-                
-                # Prepare data for this product
-                product_data = self.preprocessor.prepare_forecast_data(product_id)
-                
-                if product_data is not None and len(product_data) > 30:
-                    X, y = self.demand_forecaster.prepare_features(product_data)
-                    
-                    if len(X) > 10:  # Minimum data requirement
-                        self.demand_forecaster.train_models(X, y)
-                        
-                        # Save model
-                        model_path = f"models/demand_model_product_{product_id}.joblib"
-                        self.demand_forecaster.save_model(model_path)
-                        
-                        logging.info(f"Model saved for product {product_id}")
+            ml_products, statistical_products = self.route_demand_products()
+            self.fit_statistical_demand_models(statistical_products)
+            results = self.retrain_product_models(
+                ml_products, self.preprocessor.product_fingerprints(), full_retrain, resume
+            )
+            self.publish_demand_models()
             
+            self._log_retrain_summary(results)
             logging.info("Demand model retraining completed successfully")
+            return results
             
         except Exception as e:
             logging.error(f"Error in demand model retraining: {str(e)}")
     
+    def retrain_product_models(self, product_ids, fingerprints, full_retrain=False, resume=False):
+        """Retrain the per-product models of product_ids, skipping unchanged ones
+        
+        Results are written to the run journal as they arrive. With a model
+        store, the open generation is published every checkpoint_every
+        products as a delta of the models written since, so a crash loses
+        at most one checkpoint of work. Failed products then go through the
+        retry queue. Fingerprints are saved once, when the run ends; the
+        journal is what a resumed run relies on.
+        """
+        self.journal = RunJournal(self.journal_path) if self.journal_path else None
+        try:
+            return self._retrain_product_models(product_ids, fingerprints, full_retrain, resume)
+        finally:
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+    
+    def _retrain_product_models(self, product_ids, fingerprints, full_retrain, resume):
+        previous = self.load_fingerprints()
+        unchanged = []
+        if not full_retrain:
+            product_ids, unchanged = self.split_unchanged_products(product_ids, fingerprints, previous)
+            logging.info(f"Skipping {len(unchanged)} unchanged products, {len(product_ids)} to retrain")
+        unchanged = [
+            {'product_id': product_id, 'status': 'unchanged', 'seconds': 0.0, 'error': None}
+            for product_id in unchanged
+        ]
+        
+        run_id = None
+        resumed = []  # products completed by the interrupted run being resumed
+        if self.journal is not None:
+            run_id, completed = self.journal.begin_run('demand', list(product_ids) + [r['product_id'] for r in unchanged], {
+                'full_retrain': full_retrain,
+                'model_selection': self.model_selection
+            }, resume=resume)
+            if completed:
+                logging.info(f"Resuming run {run_id}: {len(completed)} products already completed")
+                statuses = self.journal.statuses(run_id)
+                resumed = [
+                    {'product_id': product_id, 'status': statuses[str(product_id)]}
+                    for product_id in product_ids if str(product_id) in completed
+                ]
+                product_ids = [product_id for product_id in product_ids if str(product_id) not in completed]
+            self.journal.record(run_id, unchanged)
+        
+        results = {}
+        durable = []  # finished since the last checkpoint
+        
+        def checkpoint():
+            if not durable:
+                return
+            if self.model_store is not None:
+                self.model_store.checkpoint()
+                if self.journal is not None:
+                    self.journal.record(run_id, durable)
+            durable.clear()
+        
+        def on_result(result):
+            results[result['product_id']] = result
+            durable.append(result)
+            if self.model_store is None and self.journal is not None:
+                self.journal.record(run_id, [result])  # the artifact is already on disk
+            if len(durable) >= self.checkpoint_every:
+                checkpoint()
+        
+        # With a model store each checkpoint is published as one generation
+        with self.model_store.transaction() if self.model_store is not None else nullcontext():
+            self._retrain_products(product_ids, full_retrain, on_result)
+            for attempt in range(1, self.max_retries + 1):
+                failed = [product_id for product_id, result in results.items() if result['status'] == 'failed']
+                if not failed:
+                    break
+                checkpoint()
+                delay = self.retry_backoff * 2 ** (attempt - 1)
+                logging.info(f"Retrying {len(failed)} failed products in {delay:.0f}s (attempt {attempt + 1})")
+                if self.journal is not None:
+                    self.journal.schedule_retry(run_id, failed, delay)
+                time.sleep(delay)
+                self._retrain_products(failed, full_retrain, on_result)
+            if results or resumed:
+                # Published with the transaction's last generation
+                self.save_fingerprints(fingerprints, previous, resumed + list(results.values()))
+        if self.model_store is not None:
+            # Checkpoints publish a generation each; drop the ones no longer needed
+            removed = self.model_store.prune(keep=self.store_keep)
+            logging.info(f"Pruned {len(removed)} old model store files")
+        
+        if self.journal is not None:
+            if self.model_store is not None:
+                self.journal.record(run_id, durable)
+            self.journal.finish_run(run_id)
+            summary = self.journal.summary(run_id)
+            logging.info(f"Run {run_id} finished: {summary['counts']}, {summary['seconds']:.0f}s of training")
+        return list(results.values()) + unchanged
+    
+    def _retrain_products(self, product_ids, full_retrain, on_result):
+        if self.n_workers == 1:
+            # Walk the product partition index built by clean_sales_data
+            for product_id, product_data in self.preprocessor.iter_product_forecast_data(product_ids=product_ids):
+                on_result(self._retrain_one(product_id, product_data, full_retrain))
+        else:
+            self.retrain_products_parallel(product_ids, full_retrain, on_result)
+    
+    def publish_demand_models(self):
+        """Publish the new artifact versions for serving workers"""
+        version = ModelRegistry(self.models_dir, store=self.model_store).build_manifest()
+        logging.info(f"Model manifest version {version} published")
+        return version
+    
+    def split_unchanged_products(self, product_ids, fingerprints, previous):
+        """Split product_ids into (to_retrain, unchanged)
+        
+        A product is unchanged when its fingerprint matches the one recorded
+        after its last successful retrain under the same model selection and
+        feature version, and its model artifact still exists and is not due
+        for its periodic full retrain (or it had too little data for one).
+        """
+        due = (datetime.now() - timedelta(days=FULL_RETRAIN_DAYS)).isoformat()
+        to_retrain, unchanged = [], []
+        for product_id in product_ids:
+            record = previous.get(str(product_id))
+            current = fingerprints.get(product_id)
+            same = (
+                record is not None and current is not None
+                and all(record.get(key) == value for key, value in current.items())
+                and record.get('model_selection') == self.model_selection
+                and record.get('feature_version') == FEATURE_VERSION
+                and (record.get('status') == 'insufficient_data' or (
+                    self._has_demand_model(product_id) and (record.get('trained_at') or '') > due
+                ))
+            )
+            (unchanged if same else to_retrain).append(product_id)
+        return to_retrain, unchanged
+    
+    def load_fingerprints(self):
+        """Fingerprints recorded by the last run, keyed by str(product_id)"""
+        if self.model_store is not None:
+            return json.loads(self.model_store.get_bytes(FINGERPRINTS_NAME)) if FINGERPRINTS_NAME in self.model_store else {}
+        
+        path = os.path.join(self.models_dir, FINGERPRINTS_NAME)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+    
+    def save_fingerprints(self, fingerprints, previous, results):
+        """Record the fingerprints of the products retrained in results
+        
+        Stored next to the model artifacts: in the models directory, or in
+        the model store as part of the run's generation. Failed products keep
+        their old record, so they are retried on the next run. Returns the
+        saved records.
+        """
+        records = dict(previous)
+        for result in results:
+            product_id = result['product_id']
+            if result['status'] in FINGERPRINTED_STATUSES and product_id in fingerprints:
+                now = datetime.now().isoformat()
+                # Last full retrain, which warm starts do not reset
+                trained_at = now if result['status'] == 'trained' else records.get(str(product_id), {}).get('trained_at')
+                records[str(product_id)] = dict(
+                    fingerprints[product_id],
+                    model_selection=self.model_selection,
+                    feature_version=FEATURE_VERSION,
+                    status=result['status'],
+                    trained_at=trained_at,
+                    updated_at=now
+                )
+        
+        payload = json.dumps(records, sort_keys=True)
+        if self.model_store is not None:
+            self.model_store.put_bytes(FINGERPRINTS_NAME, payload.encode('utf-8'))
+            return records
+        
+        os.makedirs(self.models_dir, exist_ok=True)
+        path = os.path.join(self.models_dir, FINGERPRINTS_NAME)
+        with open(path + '.tmp', 'w') as f:
+            f.write(payload)
+        os.replace(path + '.tmp', path)
+        return records
+    
+    def _demand_model_path(self, product_id):
+        """Artifact path of a product's model, or its name in the model store"""
+        name = ModelRegistry.demand_model_name(product_id)
+        return name if self.model_store is not None else os.path.join(self.models_dir, name)
+    
+    def _has_demand_model(self, product_id):
+        model_path = self._demand_model_path(product_id)
+        return model_path in self.model_store if self.model_store is not None else os.path.exists(model_path)
+    
+    def retrain_products_parallel(self, product_ids=None, full_retrain=False, on_result=None):
+        """Retrain per-product models on a process pool
+        
+        The daily sales are published once as memory-mapped arrays (see
+        SharedDailySales); tasks only carry a product id. Each worker has its
+        own forecaster. With a model store, workers send back serialized
+        models that are added to the open transaction here. on_result is
+        called with each result as it completes.
+        """
+        shared = SharedDailySales.publish(self.preprocessor.sales_df)
+        product_ids = shared.product_ids if product_ids is None else list(product_ids)
+        store_root = self.model_store.root if self.model_store is not None else None
+        results = []
+        
+        logging.info(f"Retraining {len(product_ids)} products on {self.n_workers or os.cpu_count()} workers "
+                     f"({shared.nbytes / 1024 ** 2:.1f} MB shared daily sales)")
+        try:
+            with ProcessPoolExecutor(
+                max_workers=self.n_workers,
+                initializer=_init_retrain_worker,
+                initargs=(shared.directory, self.model_selection, store_root, self.models_dir)
+            ) as executor:
+                futures = {
+                    executor.submit(_retrain_worker, product_id, full_retrain): product_id
+                    for product_id in product_ids
+                }
+                for future in as_completed(futures):
+                    try:
+                        result, writes = future.result()
+                    except Exception as e:  # raised outside _retrain_one, or the worker died
+                        result, writes = _failed_result(futures[future], e), []
+                    for name, payload in writes:
+                        self.model_store.put_bytes(name, payload)
+                    results.append(result)
+                    if on_result is not None:
+                        on_result(result)
+        finally:
+            shared.close()
+        
+        return results
+    
+    def _retrain_one(self, product_id, product_data, full_retrain=False):
+        """retrain_product_model with timing; failures are returned, not raised"""
+        start = time.perf_counter()
+        try:
+            status = self.retrain_product_model(product_id, product_data, full_retrain)
+        except Exception as e:
+            logging.error(f"Error retraining product {product_id}: {str(e)}")
+            return _failed_result(product_id, e, time.perf_counter() - start)
+        return {'product_id': product_id, 'status': status, 'seconds': time.perf_counter() - start, 'error': None}
+    
+    def _log_retrain_summary(self, results):
+        counts = {}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        logging.info("Per-product retraining: " + ", ".join(f"{status}={count}" for status, count in sorted(counts.items())))
+        
+        for result in results:
+            if result['status'] == 'failed':
+                logging.error(f"Product {result['product_id']} failed: {result['error']}")
+    
+    def retrain_product_model(self, product_id, product_data, full_retrain=False):
+        """Warm-start or fully retrain the demand model of one product
+        
+        Returns 'warm_started', 'trained' or 'insufficient_data'.
+        """
+        logging.info(f"Training model for product {product_id}")
+        
+        if len(product_data) <= 30:
+            return 'insufficient_data'
+        
+        X, y = self.demand_forecaster.prepare_features(product_data)
+        if len(X) <= 10:  # Minimum data requirement
+            return 'insufficient_data'
+        
+        model_path = self._demand_model_path(product_id)
+        store = self.model_store
+        if store is None:
+            os.makedirs(self.models_dir, exist_ok=True)
+        
+        trained_through = product_data['sale_date'].max()
+        
+        if not full_retrain and self._has_demand_model(product_id):
+            self.demand_forecaster.load_model(model_path, store=store)
+            # Only rows after the model's training cutoff are out of sample,
+            # so they are the drift check; the update itself sees every row
+            cutoff = self.demand_forecaster.trained_through
+            new_rows = (product_data['sale_date'] > cutoff).to_numpy() if cutoff is not None else np.zeros(len(X), dtype=bool)
+            X_new, y_new = X[new_rows], y[new_rows]
+            needs_full, reason = self.demand_forecaster.needs_full_retrain(X_new, y_new)
+            
+            if not needs_full:
+                self.demand_forecaster.warm_start_update(X, y)
+                self.demand_forecaster.trained_through = trained_through
+                self.demand_forecaster.compile_model()
+                self.demand_forecaster.save_model(model_path, store=store)
+                logging.info(f"Model warm-started for product {product_id}")
+                return 'warm_started'
+            
+            logging.info(f"Full retrain for product {product_id}: {reason}")
+        
+        self.demand_forecaster.train_models(X, y, selection=self.model_selection)
+        self.demand_forecaster.trained_through = trained_through
+        report = self.demand_forecaster.selection_report
+        logging.info(f"Model selection for product {product_id}: "
+                     f"{report['fits']}/{report['full_grid_fits']} fits")
+        
+        # Save model with its compiled tree arrays for serving
+        self.demand_forecaster.compile_model()
+        self.demand_forecaster.save_model(model_path, store=store)
+        
+        logging.info(f"Model saved for product {product_id}")
+        return 'trained'
+    
+    def route_demand_products(self):
+        """Split the loaded products into (ml_products, statistical_products)
+        
+        Without a router every product goes to the ML models.
+        """
+        if not self.router:
+            return list(self.preprocessor.product_offsets), []
+        
+        panel = self.preprocessor.build_sales_panel()
+        ml_products, statistical_products = self.router.route(panel)
+        logging.info(f"{len(ml_products)} high-velocity products routed to ML models")
+        return ml_products, statistical_products
+    
+    def fit_statistical_demand_models(self, statistical_products):
+        """Fit the statistical fast path for low-volume products
+        
+        All routed products are fitted at once over the sales panel and saved
+        as one artifact.
+        """
+        if not statistical_products:
+            return
+        
+        panel = self.preprocessor.sales_panel if self.preprocessor.sales_panel is not None else self.preprocessor.build_sales_panel()
+        forecaster = StatisticalForecaster().fit_panel(panel, statistical_products)
+        path = os.path.join(self.models_dir, 'demand_model_statistical.joblib')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        forecaster.save_model(path)
+        methods = dict(zip(*np.unique(forecaster.methods, return_counts=True)))
+        logging.info(f"Statistical models fitted for {len(statistical_products)} products: "
+                     + ", ".join(f"{method}={count}" for method, count in methods.items()))
+    
+    def retrain_global_demand_model(self, products_per_shard=500):
+        """Train the pooled demand model on every product in one fit
+        
+        Returns the model name and validation MAE, or None if training failed.
+        """
+        try:
+            logging.info("Starting global demand model training...")
+            
+            self.preprocessor.load_clean_sales_data(incremental=True)
+            return self.train_global_demand_model(products_per_shard)
+            
+        except Exception as e:
+            logging.error(f"Error in global demand model training: {str(e)}")
+    
+    def train_global_demand_model(self, products_per_shard=500):
+        """Fit and save the pooled model on the already loaded sales"""
+        forecaster = GlobalDemandForecaster(category_dictionary=self.preprocessor.category_dictionary)
+        
+        model_name, mae = forecaster.train_global(
+            lambda: self.preprocessor.iter_forecast_shards(products_per_shard)
+        )
+        path = os.path.join(self.models_dir, 'demand_model_global.joblib')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        forecaster.save_model(path)
+        
+        logging.info(f"Global demand model saved ({model_name}, validation MAE {mae:.2f})")
+        return {'model_name': model_name, 'validation_mae': mae}
+    
     def update_customer_segments(self):
-        """Update customer segmentation with latest data"""
+        """Update customer segmentation with latest data
+        
+        Returns the segment names by cluster, or None if the update failed.
+        """
         try:
             logging.info("Starting customer segmentation update...")
             
             # Load latest customer data
             self.customer_segmentation.load_customer_data()
-            
-            # Perform clustering
-            cluster_labels, analysis = self.customer_segmentation.perform_kmeans_clustering()
-            
-            # Assign segment names
-            segment_names = self.customer_segmentation.assign_segment_names()
-            
-            logging.info(f"Customer segmentation updated. Found {len(segment_names)} segments")
+            segment_names = self.segment_loaded_customers()
             logging.info("Customer segmentation update completed successfully")
+            return segment_names
             
         except Exception as e:
             logging.error(f"Error in customer segmentation update: {str(e)}")
     
-    def run_full_pipeline(self):
-        """Run the complete model training pipeline"""
+    def segment_loaded_customers(self):
+        """Cluster the loaded customer data and name the segments"""
+        # Perform clustering
+        cluster_labels, analysis = self.customer_segmentation.perform_kmeans_clustering()
+        
+        # Assign segment names
+        segment_names = self.customer_segmentation.assign_segment_names()
+        
+        logging.info(f"Customer segmentation updated. Found {len(segment_names)} segments")
+        return segment_names
+    
+    def build_stage_graph(self, full_retrain=False, resume=False):
+        """The full pipeline as a StageGraph
+        
+        Demand branch:       clean_sales -> demand_features -> train_demand -> publish_demand
+        Segmentation branch: segment_customers
+        
+        The branches share no stages, so they run concurrently. Stage outputs
+        are small (fingerprints, product lists, results); the cleaned sales
+        themselves live in the preprocessor's columnar cache and are loaded
+        from it only when a demand stage has to run.
+        """
+        graph = StageGraph(os.path.join(self.preprocessor.cache_dir, 'stages'))
+        
+        graph.add_stage('clean_sales', self._clean_sales_stage, source_key=self._sales_fingerprint)
+        graph.add_stage('demand_features', self._demand_features_stage, deps=['clean_sales'],
+                        params={'router': vars(self.router) if self.router else None})
+        # Training and publishing write models, so they always run; unchanged
+        # products are still skipped cheaply by their fingerprints
+        graph.add_stage('train_demand', partial(self._train_demand_stage, full_retrain=full_retrain, resume=resume),
+                        deps=['clean_sales', 'demand_features'], always_run=True, params={
+                            'demand_model': self.demand_model,
+                            'model_selection': self.model_selection,
+                            'full_retrain': full_retrain
+                        })
+        graph.add_stage('publish_demand', self._publish_demand_stage, deps=['train_demand'], always_run=True)
+        
+        # Customer features depend on today's date (days since last purchase)
+        graph.add_stage('segment_customers', self._segment_customers_stage,
+                        source_key=lambda: [db_fingerprint(self.customer_segmentation.db_path), date.today().isoformat()])
+        return graph
+    
+    def _sales_fingerprint(self):
+        """Key of the cleaned sales in the preprocessor's columnar cache"""
+        return db_fingerprint(self.preprocessor.db_path, compact=self.preprocessor.compact)
+    
+    def _clean_sales_stage(self):
+        self.preprocessor.load_clean_sales_data(incremental=True)
+        self._clean_sales_key = self._sales_fingerprint()
+        return {'fingerprint': self._clean_sales_key, 'rows': len(self.preprocessor.sales_df)}
+    
+    def _ensure_clean_sales(self, clean_sales):
+        """Load the cleaned sales of a (possibly cached) clean_sales stage"""
+        if self._clean_sales_key != clean_sales['fingerprint']:
+            self._clean_sales_stage()
+    
+    def _demand_features_stage(self, clean_sales):
+        self._ensure_clean_sales(clean_sales)
+        ml_products, statistical_products = self.route_demand_products()
+        return {
+            'ml_products': ml_products,
+            'statistical_products': statistical_products,
+            'fingerprints': self.preprocessor.product_fingerprints()
+        }
+    
+    def _train_demand_stage(self, clean_sales, demand_features, full_retrain=False, resume=False):
+        self._ensure_clean_sales(clean_sales)
+        if self.demand_model == 'global':
+            return self.train_global_demand_model()
+        
+        self.fit_statistical_demand_models(demand_features['statistical_products'])
+        results = self.retrain_product_models(
+            demand_features['ml_products'], demand_features['fingerprints'], full_retrain, resume
+        )
+        self._log_retrain_summary(results)
+        return results
+    
+    def _publish_demand_stage(self, train_demand):
+        return self.publish_demand_models()
+    
+    def _segment_customers_stage(self):
+        self.customer_segmentation.load_customer_data()
+        segment_names = self.segment_loaded_customers()
+        sizes = self.customer_segmentation.customer_data['segment_name'].value_counts()
+        return {
+            'segment_names': {int(cluster): name for cluster, name in segment_names.items()},
+            'segment_sizes': {name: int(size) for name, size in sizes.items()}
+        }
+    
+    def run_pipeline(self, full_retrain=False, targets=None, force=(), resume=False):
+        """Run the stage graph; unchanged stages are reused from the cache
+        
+        resume continues an interrupted demand retraining run (see RunJournal).
+        """
+        if full_retrain:
+            force = tuple(force) + ('train_demand', 'publish_demand')
+        report = self.build_stage_graph(full_retrain, resume).run(targets=targets, force=force)
+        
+        for name, entry in report.items():
+            logging.info(f"Stage {name}: {entry['status']} ({entry['seconds']:.1f}s)")
+        failed = [name for name, entry in report.items() if entry['status'] == 'failed']
+        if failed:
+            logging.error(f"Pipeline stages failed: {', '.join(failed)}")
+        return report
+    
+    def run_full_pipeline(self, resume=False):
+        """Run the complete model training pipeline; returns the stage report"""
         logging.info("Starting full model training pipeline...")
         
         start_time = datetime.now()
         
-        # Retrain demand models
-        self.retrain_demand_models()
-        
-        # Update customer segments
-        self.update_customer_segments()
+        # Retrain demand models from scratch and update customer segments,
+        # reusing the data stages whose inputs match the last successful run
+        report = self.run_pipeline(full_retrain=True, resume=resume)
         
         end_time = datetime.now()
         duration = end_time - start_time
         
         logging.info(f"Full pipeline completed in {duration}")
+        return report
 
-def schedule_model_training():
-    """Schedule automated model training"""
-    pipeline = ModelTrainingPipeline()
+def _failed_result(product_id, error, seconds=0.0):
+    return {
+        'product_id': product_id,
+        'status': 'failed',
+        'seconds': seconds,
+        'error': ''.join(traceback.format_exception_only(type(error), error)).strip()
+    }
+
+# Per-process state of retrain_products_parallel workers
+_worker = {}
+
+def _init_retrain_worker(shared_dir, model_selection, store_root, models_dir):
+    """Open the shared daily sales and build this worker's own pipeline"""
+    store = StagedModelStore(PackedModelStore(store_root)) if store_root is not None else None
+    _worker['sales'] = SharedDailySales.open(shared_dir)
+    _worker['pipeline'] = ModelTrainingPipeline(
+        model_selection=model_selection, router=False, model_store=store, journal_path=None,
+        models_dir=models_dir
+    )
+
+def _retrain_worker(product_id, full_retrain):
+    """Retrain one product; returns (result, serialized store writes)"""
+    pipeline = _worker['pipeline']
+    daily_sales = _worker['sales'].product_daily_sales(product_id)
     
-    # Schedule daily demand model updates
-    schedule.every().day.at("02:00").do(pipeline.retrain_demand_models)
+    # Errors raised here reach the parent through the future and are recorded as failures
+    product_data = pipeline.preprocessor.prepare_forecast_data(product_id, daily_sales=daily_sales) if daily_sales is not None else None
+    if product_data is None:
+        return {'product_id': product_id, 'status': 'no_data', 'seconds': 0.0, 'error': None}, []
     
-    # Schedule weekly customer segmentation updates
-    schedule.every().sunday.at("03:00").do(pipeline.update_customer_segments)
+    result = pipeline._retrain_one(product_id, product_data, full_retrain)
+    store = pipeline.model_store
+    return result, store.take_writes() if store is not None else []
+
+def pipeline_failures(outcome):
+    """What went wrong in the return value of a pipeline method
+    
+    The methods log and swallow their exceptions, so failure shows up as a
+    None outcome, failed or blocked stages in a stage report, or failed
+    products in per-product results. Returns a list of descriptions, empty
+    when the run succeeded.
+    """
+    if outcome is None:
+        return ['run failed']
+    if isinstance(outcome, dict):
+        return [
+            f"stage {name} {entry['status']}" for name, entry in outcome.items()
+            if isinstance(entry, dict) and entry.get('status') in ('failed', 'blocked')
+        ]
+    if isinstance(outcome, list):
+        return [f"product {result['product_id']} failed" for result in outcome if result.get('status') == 'failed']
+    return []
+
+def run_pipeline_job(method, **kwargs):
+    """Run one ModelTrainingPipeline method in a fresh pipeline (job process entry point)
+    
+    Raises if the run failed, so the job process exits non-zero and the
+    scheduler records the run as failed instead of completed.
+    """
+    outcome = getattr(ModelTrainingPipeline(), method)(**kwargs)
+    failures = pipeline_failures(outcome)
+    if failures:
+        raise RuntimeError(f"{method}: {'; '.join(failures)}")
+    return outcome
+
+def build_training_scheduler(state_path='models/scheduler_state.json'):
+    """The training jobs, each in its own process
+    
+    All jobs share the 'training' exclusion group, so a slow daily retrain
+    delays the weekly or monthly run instead of overlapping with it.
+    """
+    scheduler = AsyncJobScheduler(state_path=state_path)
+    hour = 3600
+    
+    # Daily demand model updates
+    scheduler.add_job('daily_demand_retraining', run_pipeline_job, Schedule.daily('02:00'),
+                      args=('retrain_demand_models',), exclusive='training', budget=4 * hour)
     
-    # Schedule monthly full pipeline run
-    schedule.every().month.do(pipeline.run_full_pipeline)
+    # Weekly customer segmentation updates
+    scheduler.add_job('weekly_customer_segmentation', run_pipeline_job, Schedule.weekly('sunday', '03:00'),
+                      args=('update_customer_segments',), exclusive='training', budget=2 * hour)
+    
+    # Monthly full pipeline run
+    scheduler.add_job('monthly_full_pipeline', run_pipeline_job, Schedule.monthly(day=1, at='04:00'),
+                      args=('run_full_pipeline',), exclusive='training', budget=12 * hour)
+    return scheduler
+
+def schedule_model_training():
+    """Schedule automated model training"""
+    scheduler = build_training_scheduler()
     
     logging.info("Model training scheduled:")
     logging.info("- Daily demand model retraining at 2:00 AM")
     logging.info("- Weekly customer segmentation at 3:00 AM on Sundays")
-    logging.info("- Monthly full pipeline run")
+    logging.info("- Monthly full pipeline run at 4:00 AM on the 1st")
+    
+    async def main():
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, scheduler.stop)
+        await scheduler.run()
     
-    while True:
-        schedule.run_pending()
-        time.sleep(60)  # Check every minute
+    asyncio.run(main())
 
 if __name__ == "__main__":
-    # For manual execution
-    pipeline = ModelTrainingPipeline()
-    pipeline.run_full_pipeline()
+    parser = argparse.ArgumentParser(description="Run the model training pipeline")
+    parser.add_argument('--resume', action='store_true',
+                        help='continue the last interrupted demand retraining run from the run journal')
+    parser.add_argument('--workers', type=int, default=1, help='processes for per-product retraining')
+    parser.add_argument('--schedule', action='store_true', help='run the training scheduler instead of a single run')
+    args = parser.parse_args()
+    
+    if args.schedule:
+        schedule_model_training()
+    else:
+        # For manual execution
+        pipeline = ModelTrainingPipeline(n_workers=args.workers)
+        report = pipeline.run_full_pipeline(resume=args.resume)
+        sys.exit(1 if pipeline_failures(report) else 0)
@@ -12,14 +12,37 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report
 import random
 
+try:
+    from .data_preprocessing import DataPreprocessor
+except ImportError:
+    from data_preprocessing import DataPreprocessor
+
 class PromotionEngine:
     def __init__(self, db_path='walmart_analytics.db'):
         self.db_path = db_path
         self.promotion_model = None
         self.customer_preferences = {}
         
-    def load_customer_purchase_history(self):
-        """Load customer purchase history with product categories"""
+    def load_customer_purchase_history(self, use_sales_cache=False):
+        """Load customer purchase history with product categories
+        
+        With use_sales_cache=True the history is built from the cached
+        cleaned sales frame (see DataPreprocessor.load_clean_sales_data)
+        instead of re-running the join; cleaned data has outliers removed.
+        """
+        if use_sales_cache:
+            preprocessor = DataPreprocessor(self.db_path)
+            sales = preprocessor.load_clean_sales_data()
+            segments = preprocessor.customers_df[['id', 'segment']].rename(columns={'id': 'customer_id'})
+            
+            history = sales.merge(segments, on='customer_id').rename(columns={'name': 'product_name'})
+            self.purchase_history = history[[
+                'customer_id', 'product_id', 'product_name', 'category', 'price',
+                'quantity', 'total_amount', 'sale_date', 'segment'
+            ]].sort_values('sale_date', ascending=False, kind='mergesort').reset_index(drop=True)
+            
+            return self.purchase_history
+        
         conn = sqlite3.connect(self.db_path)
         
         query = '''
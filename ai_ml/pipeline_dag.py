@@ -0,0 +1,219 @@
+"""
+Stage graph for Walmart Analytics Platform pipelines
+Runs named stages in dependency order with content-addressed cached outputs,
+skipping stages whose inputs are unchanged and running independent branches
+concurrently
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+import joblib
+import pandas as pd
+
+# Bump when the cache layout changes so stale stage outputs are not reused
+STAGE_CACHE_VERSION = 1
+
+def content_digest(obj):
+    """Hash of an output's contents
+
+    Frames are reduced to their columns, dtypes and row hashes, so equal data
+    hashes the same regardless of how pandas laid out its blocks.
+    """
+    return joblib.hash(_hashable(obj))
+
+def _hashable(obj):
+    if isinstance(obj, pd.DataFrame):
+        return ('DataFrame', list(obj.columns), [str(dtype) for dtype in obj.dtypes],
+                pd.util.hash_pandas_object(obj).to_numpy())
+    if isinstance(obj, pd.Series):
+        return ('Series', obj.name, str(obj.dtype), pd.util.hash_pandas_object(obj).to_numpy())
+    if isinstance(obj, dict):
+        return {key: _hashable(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_hashable(value) for value in obj)
+    return obj
+
+class Stage:
+    def __init__(self, name, func, deps=(), params=None, version=1, source_key=None, always_run=False):
+        # func(**{dep: output}) returns the stage output, which must be picklable
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        # JSON-serializable settings that change the output (part of the key)
+        self.params = params or {}
+        # Bump when func changes meaning, to invalidate cached outputs
+        self.version = version
+        # For stages reading outside state (e.g. the database): a callable
+        # returning a fingerprint of that state
+        self.source_key = source_key
+        # Stages with side effects (e.g. writing models) run every time; their
+        # output is kept in memory only and never reused from the cache
+        self.always_run = always_run
+
+class StageGraph:
+    """A small DAG of named stages with a content-addressed output cache
+
+    A stage's key hashes its name, version, params, source fingerprint and
+    the digests of its dependencies' outputs; its output is stored under
+    cache_dir/<stage>/<key>.joblib. When that file exists the stage is
+    skipped. Output digests are content hashes, so a stage that reruns but
+    produces the same output does not invalidate its dependents. Stages
+    added with always_run=True are never skipped.
+
+    Cached outputs are only loaded when a dependent stage has to run, and
+    stages whose dependencies are done run concurrently on a thread pool.
+    A failed stage blocks its dependents; other branches still run, and a
+    rerun resumes from the failed stage.
+    """
+
+    def __init__(self, cache_dir='data_cache/stages', max_workers=4, keep=2):
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.keep = keep
+        self.stages = {}
+        self.report = {}
+        self._outputs = {}
+        self._digests = {}
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, func, deps=(), params=None, version=1, source_key=None, always_run=False):
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage {name}")
+        unknown = [dep for dep in deps if dep not in self.stages]
+        if unknown:
+            raise ValueError(f"Stage {name} depends on unknown stages {unknown}; add dependencies first")
+        self.stages[name] = Stage(name, func, deps, params, version, source_key, always_run)
+        return self.stages[name]
+
+    def _required(self, targets):
+        """Targets and their transitive dependencies, in insertion (topological) order"""
+        required, stack = set(), list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage {name}")
+            if name not in required:
+                required.add(name)
+                stack.extend(self.stages[name].deps)
+        return [name for name in self.stages if name in required]
+
+    def stage_key(self, stage):
+        state = {
+            'cache_version': STAGE_CACHE_VERSION,
+            'stage': stage.name,
+            'version': stage.version,
+            'params': stage.params,
+            'source': stage.source_key() if stage.source_key is not None else None,
+            'inputs': {dep: self._digests[dep] for dep in stage.deps}
+        }
+        return hashlib.sha1(json.dumps(state, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _paths(self, name, key):
+        stage_dir = os.path.join(self.cache_dir, name)
+        return os.path.join(stage_dir, f'{key}.joblib'), os.path.join(stage_dir, f'{key}.json')
+
+    def output(self, name):
+        """Output of a completed stage, loaded from the cache on first use"""
+        with self._lock:
+            if name in self._outputs:
+                return self._outputs[name]
+        output_path, _ = self._paths(name, self._keys[name])
+        output = joblib.load(output_path)
+        with self._lock:
+            return self._outputs.setdefault(name, output)
+
+    def _execute(self, name, force):
+        """Run or reuse one stage; returns its report entry"""
+        stage = self.stages[name]
+        start = time.perf_counter()
+        key = self.stage_key(stage)
+        self._keys[name] = key
+        output_path, meta_path = self._paths(name, key)
+
+        # The metadata file is written last, so it marks a complete entry
+        if name not in force and not stage.always_run and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self._digests[name] = json.load(f)['digest']
+            os.utime(meta_path)  # keep recently used entries from being pruned
+            return {'status': 'cached', 'key': key, 'seconds': time.perf_counter() - start}
+
+        inputs = {dep: self.output(dep) for dep in stage.deps}
+        logging.info(f"Running stage {name}")
+        output = stage.func(**inputs)
+        digest = content_digest(output)
+        with self._lock:
+            self._outputs[name] = output
+        self._digests[name] = digest
+        if stage.always_run:
+            return {'status': 'ran', 'key': key, 'seconds': time.perf_counter() - start}
+
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        joblib.dump(output, output_path + '.tmp')
+        os.replace(output_path + '.tmp', output_path)
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump({'stage': name, 'digest': digest, 'created_at': datetime.now().isoformat()}, f)
+        os.replace(meta_path + '.tmp', meta_path)
+        self._prune(name)
+        return {'status': 'ran', 'key': key, 'seconds': time.perf_counter() - start}
+
+    def run(self, targets=None, force=()):
+        """Run targets (default: every stage) and whatever they depend on
+
+        force lists stages to rerun even when their cached output is valid.
+        Returns the report: stage -> {'status', 'key', 'seconds', 'error'}
+        with status 'ran', 'cached', 'failed' or 'blocked'.
+        """
+        order = self._required(targets if targets is not None else list(self.stages))
+        force = set(force)
+        self.report = {}
+        self._outputs.clear()
+        self._digests.clear()
+        self._keys.clear()
+
+        pending = list(order)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for name in list(pending):
+                    deps = self.stages[name].deps
+                    if any(self.report.get(dep, {}).get('status') in ('failed', 'blocked') for dep in deps):
+                        pending.remove(name)
+                        self.report[name] = {'status': 'blocked', 'key': None, 'seconds': 0.0, 'error': None}
+                    elif all(dep in self._digests for dep in deps):
+                        pending.remove(name)
+                        running[executor.submit(self._execute, name, force)] = name
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.report[name] = dict(future.result(), error=None)
+                    except Exception as e:
+                        logging.error(f"Stage {name} failed: {str(e)}")
+                        self.report[name] = {'status': 'failed', 'key': self._keys.get(name), 'seconds': 0.0, 'error': str(e)}
+
+        return self.report
+
+    def _prune(self, name):
+        """Keep the most recently used cached outputs of a stage"""
+        stage_dir = os.path.join(self.cache_dir, name)
+        metas = sorted(
+            (entry for entry in os.scandir(stage_dir) if entry.name.endswith('.json')),
+            key=lambda entry: entry.stat().st_mtime_ns,
+            reverse=True
+        )
+        for entry in metas[self.keep:]:
+            key = entry.name[:-len('.json')]
+            for path in self._paths(name, key):
+                if os.path.exists(path):
+                    os.remove(path)
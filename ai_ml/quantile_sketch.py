@@ -0,0 +1,84 @@
+"""
+Streaming quantile sketch for Walmart Analytics Platform
+KLL-style mergeable sketch so quantiles can be estimated chunk by chunk
+"""
+
+import numpy as np
+
+class KLLSketch:
+    """Approximate quantiles in O(k log n) memory
+
+    Items live in compactor levels; an item on level h stands for 2**h input
+    values. When a level overflows it is sorted and every other item (random
+    offset) is promoted to the next level. Rank error is roughly 1.7 / k.
+    """
+
+    def __init__(self, k=400, seed=42):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        """Add a batch of values (NaNs are ignored)"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+
+        self.count += len(values)
+        self.levels[0] = np.concatenate((self.levels[0], values))
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Fold another sketch into this one"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate((self.levels[level], items))
+        self.count += other.count
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                items = np.sort(items)
+                # An odd item out stays behind so weights are preserved exactly
+                keep = items[:1] if len(items) % 2 else items[:0]
+                pairs = items[len(keep):]
+                promoted = pairs[self.rng.integers(2)::2]
+
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate((self.levels[level + 1], promoted))
+            level += 1
+
+    def quantile(self, q):
+        """Estimated q-quantile (0 <= q <= 1) of everything seen so far"""
+        if self.count == 0:
+            return None
+
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([
+            np.full(len(level_items), 2 ** level, dtype=np.float64)
+            for level, level_items in enumerate(self.levels)
+        ])
+        order = np.argsort(items, kind='mergesort')
+        items, cumulative = items[order], np.cumsum(weights[order])
+
+        target = q * cumulative[-1]
+        return float(items[min(np.searchsorted(cumulative, target), len(items) - 1)])
+
+    @property
+    def size(self):
+        """Number of retained items"""
+        return sum(len(items) for items in self.levels)
@@ -0,0 +1,168 @@
+"""
+Run journal for Walmart Analytics Platform training runs
+Records every run and the per-product status, timing and error of each
+attempt in SQLite, so an interrupted run can be resumed
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+# Product outcomes that need no further work in a run
+COMPLETED_STATUSES = ('trained', 'warm_started', 'insufficient_data', 'no_data', 'unchanged')
+
+class RunJournal:
+    """Durable log of training runs and their per-product results
+
+    Each record is committed as soon as it is written (WAL mode), so after a
+    crash the journal shows exactly which products finished. A run that
+    never reached finish_run() stays 'running' and can be resumed with
+    begin_run(resume=True) under the same params; starting a new run
+    instead marks it 'abandoned'.
+    """
+
+    def __init__(self, path='models/run_journal.db'):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                params TEXT,
+                started_at TEXT NOT NULL,
+                finished_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS product_runs (
+                run_id INTEGER NOT NULL,
+                product_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                seconds REAL,
+                error TEXT,
+                updated_at TEXT,
+                next_attempt_at TEXT,
+                PRIMARY KEY (run_id, product_id)
+            );
+        ''')
+        self.conn.commit()
+
+    def begin_run(self, kind, product_ids, params=None, resume=False):
+        """Start a run over product_ids, or resume the last unfinished one
+
+        Returns (run_id, completed) where completed is the set of product ids
+        (as str) already done in a resumed run; it is empty for a new run.
+        Raises ValueError when the run to resume was started with other
+        params, since its completed products would not match this run.
+        """
+        now = datetime.now().isoformat()
+        params = json.loads(json.dumps(params or {}, default=str))
+        with self._lock:
+            run = self.conn.execute(
+                "SELECT id, params FROM runs WHERE kind = ? AND status = 'running' ORDER BY id DESC LIMIT 1", (kind,)
+            ).fetchone() if resume else None
+            if run is not None and json.loads(run[1] or '{}') != params:
+                raise ValueError(f"Cannot resume {kind} run {run[0]}: it was started with {run[1]}, not {json.dumps(params)}")
+
+            if run is None:
+                # Unfinished runs that are not resumed now never will be
+                self.conn.execute(
+                    "UPDATE runs SET status = 'abandoned', finished_at = ? WHERE kind = ? AND status = 'running'",
+                    (now, kind)
+                )
+                run_id = self.conn.execute(
+                    "INSERT INTO runs (kind, status, params, started_at) VALUES (?, 'running', ?, ?)",
+                    (kind, json.dumps(params), now)
+                ).lastrowid
+                completed = set()
+            else:
+                run_id = run[0]
+                completed = {
+                    product_id for product_id, in self.conn.execute(
+                        f"SELECT product_id FROM product_runs WHERE run_id = ? AND status IN "
+                        f"({', '.join('?' * len(COMPLETED_STATUSES))})",
+                        (run_id, *COMPLETED_STATUSES)
+                    )
+                }
+
+            # Products new to a resumed run are added as pending
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO product_runs (run_id, product_id, status, updated_at) VALUES (?, ?, 'pending', ?)",
+                [(run_id, str(product_id), now) for product_id in product_ids]
+            )
+            self.conn.commit()
+        return run_id, completed
+
+    def record(self, run_id, results):
+        """Write per-product results (dicts as returned by the pipeline)"""
+        now = datetime.now().isoformat()
+        with self._lock:
+            self.conn.executemany('''
+                INSERT INTO product_runs (run_id, product_id, status, attempts, seconds, error, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (run_id, product_id) DO UPDATE SET
+                    status = excluded.status,
+                    attempts = product_runs.attempts + excluded.attempts,
+                    seconds = excluded.seconds,
+                    error = excluded.error,
+                    updated_at = excluded.updated_at,
+                    next_attempt_at = NULL
+            ''', [
+                (run_id, str(result['product_id']), result['status'], 0 if result['status'] == 'unchanged' else 1,
+                 result['seconds'], result['error'], now)
+                for result in results
+            ])
+            self.conn.commit()
+
+    def schedule_retry(self, run_id, product_ids, delay_seconds):
+        """Mark failed products as queued for another attempt after delay_seconds"""
+        next_attempt = (datetime.now() + timedelta(seconds=delay_seconds)).isoformat()
+        with self._lock:
+            self.conn.executemany(
+                "UPDATE product_runs SET status = 'retry_queued', next_attempt_at = ? WHERE run_id = ? AND product_id = ?",
+                [(next_attempt, run_id, str(product_id)) for product_id in product_ids]
+            )
+            self.conn.commit()
+
+    def finish_run(self, run_id):
+        """Close a run; it is 'failed' if any product is left failed"""
+        with self._lock:
+            failed = self.conn.execute(
+                "SELECT COUNT(*) FROM product_runs WHERE run_id = ? AND status IN ('failed', 'retry_queued')", (run_id,)
+            ).fetchone()[0]
+            self.conn.execute(
+                "UPDATE runs SET status = ?, finished_at = ? WHERE id = ?",
+                ('failed' if failed else 'completed', datetime.now().isoformat(), run_id)
+            )
+            self.conn.commit()
+
+    def statuses(self, run_id):
+        """product_id (as str) -> latest status in a run"""
+        with self._lock:
+            return dict(self.conn.execute(
+                "SELECT product_id, status FROM product_runs WHERE run_id = ?", (run_id,)
+            ).fetchall())
+
+    def summary(self, run_id):
+        """Status counts, total seconds and failures of a run"""
+        with self._lock:
+            counts = dict(self.conn.execute(
+                "SELECT status, COUNT(*) FROM product_runs WHERE run_id = ? GROUP BY status", (run_id,)
+            ).fetchall())
+            seconds = self.conn.execute(
+                "SELECT COALESCE(SUM(seconds), 0) FROM product_runs WHERE run_id = ?", (run_id,)
+            ).fetchone()[0]
+            failures = self.conn.execute(
+                "SELECT product_id, attempts, error FROM product_runs WHERE run_id = ? AND status = 'failed'", (run_id,)
+            ).fetchall()
+        return {'run_id': run_id, 'counts': counts, 'seconds': seconds, 'failures': failures}
+
+    def close(self):
+        self.conn.close()
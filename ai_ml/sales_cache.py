@@ -0,0 +1,105 @@
+"""
+Columnar cache of cleaned sales frames for Walmart Analytics Platform
+Stores clean_sales_data output as Arrow files keyed by a database fingerprint
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # the cache is disabled without pyarrow
+    feather = None
+
+# Bump when clean_sales_data changes so stale cache files are not reused
+CACHE_FORMAT_VERSION = 1
+
+FINGERPRINT_TABLES = ['sales', 'inventory', 'customers']
+
+def db_fingerprint(db_path, **extra):
+    """Hash of row counts, max ids and file mtime/size of the database
+
+    In WAL mode committed writes land in the -wal file and the main file is
+    only touched at checkpoints, so that file's mtime/size is included too.
+    """
+    conn = sqlite3.connect(db_path)
+    tables = {}
+    for table in FINGERPRINT_TABLES:
+        count, max_id = conn.execute(f'SELECT COUNT(*), MAX(id) FROM {table}').fetchone()
+        tables[table] = [count, max_id]
+    conn.close()
+
+    stat = os.stat(db_path)
+    state = {
+        'version': CACHE_FORMAT_VERSION,
+        'db_path': os.path.abspath(db_path),
+        'tables': tables,
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'wal': _file_state(db_path + '-wal'),
+        'extra': extra
+    }
+    return hashlib.sha1(json.dumps(state, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def _file_state(path):
+    """(mtime_ns, size) of path, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+class CleanSalesCache:
+    def __init__(self, cache_dir='data_cache', keep=2):
+        self.cache_dir = os.path.join(cache_dir, 'clean_sales')
+        self.keep = keep
+
+    @property
+    def enabled(self):
+        return feather is not None
+
+    def path_for(self, fingerprint):
+        return os.path.join(self.cache_dir, f'{fingerprint}.arrow')
+
+    def load(self, fingerprint):
+        """Return the cached frame for fingerprint, or None on a miss
+
+        The Arrow file is memory-mapped, so numeric columns are not read
+        through Python file buffers. The table is converted column by column
+        and released as it goes (self_destruct), so the frame is not held
+        next to a full second copy of the table.
+        """
+        path = self.path_for(fingerprint)
+        if not self.enabled or not os.path.exists(path):
+            return None
+
+        table = feather.read_table(path, memory_map=True)
+        frame = table.to_pandas(self_destruct=True, split_blocks=True)
+        del table  # unusable after self_destruct
+        return frame
+
+    def store(self, fingerprint, df):
+        """Write df for fingerprint (write-then-rename) and prune older entries"""
+        if not self.enabled:
+            return None
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path_for(fingerprint)
+        # Uncompressed Arrow IPC is what makes memory-mapped reads possible
+        feather.write_feather(df.reset_index(drop=True), path + '.tmp', compression='uncompressed')
+        os.replace(path + '.tmp', path)
+
+        self._prune(keep_path=path)
+        return path
+
+    def _prune(self, keep_path):
+        entries = [
+            os.path.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir) if name.endswith('.arrow')
+        ]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[self.keep:]:
+            if path != keep_path:
+                os.remove(path)
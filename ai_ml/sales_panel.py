@@ -0,0 +1,125 @@
+"""
+Dense product x day sales panel for Walmart Analytics Platform
+Stores daily demand as compact float32 matrices with calendar-correct lags
+"""
+
+import pandas as pd
+import numpy as np
+
+class SalesPanel:
+    def __init__(self, product_ids, start_date, values, first_day):
+        self.product_ids = np.asarray(product_ids)
+        self.start_date = pd.Timestamp(start_date).normalize()
+        self.values = values
+        self.first_day = np.asarray(first_day, dtype=np.int64)
+        self.product_index = {pid.item(): row for row, pid in enumerate(self.product_ids)}
+
+    @classmethod
+    def from_daily_sales(cls, sales, value_columns=('quantity', 'total_amount'),
+                         start_date=None, end_date=None, dtype=np.float32):
+        """Build a zero-filled panel from raw or daily-aggregated sales rows
+
+        Timestamps are truncated to calendar days, so several sales on the
+        same day are summed into one cell.
+        """
+        days = pd.to_datetime(sales['sale_date']).dt.normalize()
+        start = pd.Timestamp(start_date).normalize() if start_date is not None else days.min()
+        end = pd.Timestamp(end_date).normalize() if end_date is not None else days.max()
+        n_days = (end - start).days + 1 if len(sales) else 0
+
+        product_ids, rows = np.unique(sales['product_id'].to_numpy(), return_inverse=True)
+        cols = ((days - start).dt.days).to_numpy()
+        in_range = (cols >= 0) & (cols < n_days)
+        rows, cols = rows[in_range], cols[in_range]
+
+        values = {}
+        for column in value_columns:
+            matrix = np.zeros((len(product_ids), n_days), dtype=np.float64)
+            column_values = np.nan_to_num(sales[column].to_numpy(dtype=np.float64)[in_range])
+            np.add.at(matrix, (rows, cols), column_values)
+            values[column] = matrix.astype(dtype)
+
+        # Days before a product's first sale carry no history
+        first_day = np.full(len(product_ids), n_days, dtype=np.int64)
+        np.minimum.at(first_day, rows, cols)
+
+        return cls(product_ids, start, values, first_day)
+
+    @property
+    def n_days(self):
+        return next(iter(self.values.values())).shape[1] if self.values else 0
+
+    @property
+    def dates(self):
+        return pd.date_range(self.start_date, periods=self.n_days, freq='D')
+
+    @property
+    def nbytes(self):
+        return sum(matrix.nbytes for matrix in self.values.values())
+
+    def day_index(self, date):
+        return (pd.Timestamp(date).normalize() - self.start_date).days
+
+    def get(self, product_id, date, column='quantity'):
+        """O(1) lookup of one product/day cell (0 for days without sales)"""
+        day = self.day_index(date)
+        if product_id not in self.product_index or not 0 <= day < self.n_days:
+            return 0.0
+        return float(self.values[column][self.product_index[product_id], day])
+
+    def product_series(self, product_id, column='quantity'):
+        """Zero-copy row view from the product's first sale to the panel end"""
+        row = self.product_index[product_id]
+        return self.values[column][row, self.first_day[row]:]
+
+    def _history_mask(self, offset):
+        """True where day - offset falls before the product's first sale"""
+        day_numbers = np.arange(self.n_days)
+        return (day_numbers[None, :] - offset) < self.first_day[:, None]
+
+    def lag(self, k, column='quantity'):
+        """Value k calendar days earlier; NaN before the product's history starts"""
+        matrix = self.values[column]
+        lagged = np.full(matrix.shape, np.nan, dtype=matrix.dtype)
+        if k < self.n_days:
+            lagged[:, k:] = matrix[:, :self.n_days - k]
+        lagged[self._history_mask(k)] = np.nan
+        return lagged
+
+    def rolling_mean(self, window, column='quantity'):
+        """Mean over the window calendar days before each day (zero-sale days
+        included); the day itself is the forecast target and is excluded"""
+        matrix = self.values[column]
+        sums = np.zeros((matrix.shape[0], self.n_days + 1), dtype=np.float64)
+        np.cumsum(matrix, axis=1, dtype=np.float64, out=sums[:, 1:])
+
+        means = np.full(matrix.shape, np.nan, dtype=matrix.dtype)
+        if window < self.n_days:
+            means[:, window:] = (sums[:, window:self.n_days] - sums[:, :self.n_days - window]) / window
+        means[self._history_mask(window)] = np.nan
+        return means
+
+    def to_frame(self, lags=(1, 7, 14, 30), windows=(7, 14, 30), value_columns=None):
+        """Long product/day frame with lag and moving-average features
+
+        One row per product and calendar day from the product's first sale,
+        with the same column names as DataPreprocessor.create_demand_features.
+        """
+        value_columns = value_columns or {'quantity': 'quantity', 'total_amount': 'amount'}
+        observed = ~self._history_mask(0)
+        rows, days = np.nonzero(observed)
+
+        frame = {
+            'product_id': self.product_ids[rows],
+            'sale_date': self.start_date + pd.to_timedelta(days, unit='D')
+        }
+        for column in value_columns:
+            frame[column] = self.values[column][observed]
+        for k in lags:
+            for column, prefix in value_columns.items():
+                frame[f'{prefix}_lag_{k}'] = self.lag(k, column)[observed]
+        for window in windows:
+            for column, prefix in value_columns.items():
+                frame[f'{prefix}_ma_{window}'] = self.rolling_mean(window, column)[observed]
+
+        return pd.DataFrame(frame)
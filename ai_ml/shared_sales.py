@@ -0,0 +1,125 @@
+"""
+Shared daily sales for Walmart Analytics Platform
+Publishes per-product daily sales once as memory-mapped arrays so worker
+processes can slice any product without the frame being pickled per task
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+SHARED_COLUMNS = ['sale_date', 'quantity', 'total_amount']
+
+# Published directories are named <prefix><owner pid>_<random>
+SHARED_PREFIX = 'daily_sales_'
+
+def shared_memory_dir():
+    """RAM-backed directory when the OS has one, else the default temp dir"""
+    return '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # alive, owned by another user
+        return True
+    return True
+
+def sweep_stale_segments(parent=None):
+    """Remove published directories whose owner process no longer exists
+
+    close() cannot run when the owner is killed, and /dev/shm is RAM, so
+    leftovers are swept before each publish. Returns the removed paths.
+    """
+    parent = parent or shared_memory_dir() or tempfile.gettempdir()
+    removed = []
+    for entry in os.scandir(parent):
+        owner = entry.name[len(SHARED_PREFIX):].split('_', 1)[0]
+        if not (entry.name.startswith(SHARED_PREFIX) and entry.is_dir() and owner.isdigit()):
+            continue
+        if not _pid_alive(int(owner)):
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed.append(entry.path)
+    return removed
+
+class SharedDailySales:
+    """Daily sales grouped by product, stored as one .npy file per column
+
+    Rows are sorted by product_id then sale_date, and offsets maps each
+    product to its (start, stop) row range. Workers open the directory with
+    mmap_mode='r', so the pages are shared through the OS page cache and
+    each product is a zero-copy slice.
+    """
+
+    def __init__(self, directory, columns, offsets, owner=False):
+        self.directory = directory
+        self.columns = columns
+        self.offsets = offsets
+        self.owner = owner
+
+    @classmethod
+    def publish(cls, sales, directory=None):
+        """Aggregate cleaned sales rows per product and day and write them out
+
+        Without a directory a fresh one is created in shared memory and
+        removed again by close(); ones left by killed owners are swept first.
+        """
+        owner = directory is None
+        if owner:
+            sweep_stale_segments()
+            directory = tempfile.mkdtemp(prefix=f'{SHARED_PREFIX}{os.getpid()}_', dir=shared_memory_dir())
+        os.makedirs(directory, exist_ok=True)
+
+        daily = sales.groupby(['product_id', 'sale_date'], observed=True)[['quantity', 'total_amount']].sum().reset_index()
+
+        product_ids = daily['product_id'].to_numpy()
+        boundaries = np.flatnonzero(product_ids[1:] != product_ids[:-1]) + 1
+        starts = np.concatenate(([0], boundaries)) if len(product_ids) else []
+        stops = np.concatenate((boundaries, [len(product_ids)])) if len(product_ids) else []
+        offsets = [[product_ids[start].item(), int(start), int(stop)] for start, stop in zip(starts, stops)]
+
+        for column in SHARED_COLUMNS:
+            np.save(os.path.join(directory, f'{column}.npy'), daily[column].to_numpy())
+        with open(os.path.join(directory, 'offsets.json'), 'w') as f:
+            json.dump(offsets, f)
+
+        return cls.open(directory, owner=owner)
+
+    @classmethod
+    def open(cls, directory, owner=False):
+        """Map a published directory read-only"""
+        columns = {
+            column: np.load(os.path.join(directory, f'{column}.npy'), mmap_mode='r')
+            for column in SHARED_COLUMNS
+        }
+        with open(os.path.join(directory, 'offsets.json')) as f:
+            offsets = {product_id: (start, stop) for product_id, start, stop in json.load(f)}
+        return cls(directory, columns, offsets, owner=owner)
+
+    @property
+    def product_ids(self):
+        return list(self.offsets)
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in self.columns.values())
+
+    def product_daily_sales(self, product_id):
+        """Daily rows of one product in the load_daily_sales_from_db layout, or None"""
+        if product_id not in self.offsets:
+            return None
+        start, stop = self.offsets[product_id]
+        frame = pd.DataFrame({column: np.array(values[start:stop]) for column, values in self.columns.items()})
+        frame.insert(0, 'product_id', product_id)
+        return frame
+
+    def close(self):
+        """Drop the mappings; the owner also removes the published files"""
+        self.columns = {}
+        if self.owner:
+            shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,278 @@
+"""
+Statistical fast-path forecasters for Walmart Analytics Platform
+Fits exponential smoothing, weekday seasonal naive and Croston models for
+every product at once over the product x day quantity matrix
+"""
+
+import pandas as pd
+import numpy as np
+import joblib
+
+METHODS = ['ses', 'holt', 'seasonal_naive', 'croston']
+
+def _started(t, first_day):
+    """Products whose history has begun by day t, and those starting on t"""
+    return t > first_day, t == first_day
+
+def fit_ses(values, first_day, alphas):
+    """Simple exponential smoothing for all products and alphas at once
+
+    Returns (level, alpha) per product, using the alpha with the lowest
+    one-step-ahead squared error.
+    """
+    n_products, n_days = values.shape
+    a = np.asarray(alphas, dtype=np.float64)[:, None]
+    level = np.zeros((len(a), n_products))
+    sse = np.zeros((len(a), n_products))
+
+    for t in range(n_days):
+        y = values[:, t]
+        active, starting = _started(t, first_day)
+        error = y - level
+        sse += np.where(active, error ** 2, 0.0)
+        level = np.where(starting, y, np.where(active, level + a * error, level))
+
+    best = np.argmin(sse, axis=0)
+    columns = np.arange(n_products)
+    return level[best, columns], a[best, 0]
+
+def fit_holt(values, first_day, alphas, betas):
+    """Holt's linear trend method over an alpha x beta grid
+
+    Returns (level, trend) per product for the best grid point.
+    """
+    n_products, n_days = values.shape
+    grid = np.array([(alpha, beta) for alpha in alphas for beta in betas], dtype=np.float64)
+    a, b = grid[:, :1], grid[:, 1:]
+    level = np.zeros((len(grid), n_products))
+    trend = np.zeros((len(grid), n_products))
+    sse = np.zeros((len(grid), n_products))
+
+    for t in range(n_days):
+        y = values[:, t]
+        active, starting = _started(t, first_day)
+        error = y - (level + trend)
+        sse += np.where(active, error ** 2, 0.0)
+
+        new_level = a * y + (1 - a) * (level + trend)
+        new_trend = b * (new_level - level) + (1 - b) * trend
+        level = np.where(starting, y, np.where(active, new_level, level))
+        trend = np.where(active, new_trend, trend)
+
+    best = np.argmin(sse, axis=0)
+    columns = np.arange(n_products)
+    return level[best, columns], trend[best, columns]
+
+def fit_croston(values, first_day, alphas, sba=True):
+    """Croston's method for intermittent demand
+
+    Demand sizes and inter-demand intervals are smoothed separately and only
+    on days with demand. sba applies the Syntetos-Boylan bias correction.
+    Returns (size, interval, alpha) per product.
+    """
+    n_products, n_days = values.shape
+    a = np.asarray(alphas, dtype=np.float64)[:, None]
+    size = np.zeros((len(a), n_products))
+    interval = np.ones((len(a), n_products))
+    seen = np.zeros(n_products, dtype=bool)
+    since_demand = np.ones(n_products)
+    sse = np.zeros((len(a), n_products))
+
+    for t in range(n_days):
+        y = values[:, t]
+        active = t >= first_day
+        error = y - size / interval
+        sse += np.where(active & seen, error ** 2, 0.0)
+
+        demand = active & (y > 0)
+        first = demand & ~seen
+        update = demand & seen
+        size = np.where(first, y, np.where(update, size + a * (y - size), size))
+        interval = np.where(first, since_demand, np.where(update, interval + a * (since_demand - interval), interval))
+
+        seen |= demand
+        since_demand = np.where(demand, 1.0, since_demand + active)
+
+    best = np.argmin(sse, axis=0)
+    columns = np.arange(n_products)
+    alpha = a[best, 0]
+    size, interval = size[best, columns], interval[best, columns]
+    if sba:
+        size = size * (1 - alpha / 2)
+    return size, interval, alpha
+
+def fit_seasonal_naive(values, first_day, seasons=1, season_length=7):
+    """Average of the last `seasons` values for each weekday slot
+
+    Returns a products x season_length array aligned so that column
+    (h - 1) % season_length is the forecast for h days ahead. Slots without
+    history fall back to the product's mean daily quantity.
+    """
+    n_products, n_days = values.shape
+    span = min(seasons * season_length, n_days)
+    tail = values[:, n_days - span:].astype(np.float64)
+    days = np.arange(n_days - span, n_days)
+    observed = days[None, :] >= first_day[:, None]
+
+    # Days before the first sale are zero in the panel, so a plain sum works
+    fallback = values.sum(axis=1, dtype=np.float64) / np.maximum(n_days - first_day, 1)
+
+    profile = np.empty((n_products, season_length))
+    for slot in range(season_length):
+        # Day index (within the tail) of this slot, counting back from the end
+        offsets = np.arange(span - season_length + slot, -1, -season_length)
+        slot_values = tail[:, offsets]
+        slot_observed = observed[:, offsets]
+        n_observed = slot_observed.sum(axis=1)
+        sums = np.where(slot_observed, slot_values, 0.0).sum(axis=1)
+        profile[:, slot] = np.where(n_observed > 0, sums / np.maximum(n_observed, 1), fallback)
+
+    return profile
+
+class StatisticalForecaster:
+    """Vectorized per-product statistical models over a product x day matrix
+
+    method='auto' scores every method on the last validation_days of each
+    product (fit on the rest, multi-step forecast) and keeps the best one
+    per product before refitting on the full history.
+    """
+
+    def __init__(self, method='auto', alphas=(0.05, 0.1, 0.2, 0.3, 0.5), betas=(0.01, 0.05, 0.1, 0.2),
+                 seasons=4, validation_days=14):
+        self.method = method
+        self.alphas = alphas
+        self.betas = betas
+        self.seasons = seasons
+        self.validation_days = validation_days
+        self.product_ids = None
+        self.product_index = {}
+        self.methods = None
+        self.validation_mae = None
+        self.states = None
+        self.last_date = None
+
+    def _fit_states(self, values, first_day, methods):
+        states = {}
+        if 'ses' in methods:
+            states['ses'] = fit_ses(values, first_day, self.alphas)[:1]
+        if 'holt' in methods:
+            states['holt'] = fit_holt(values, first_day, self.alphas, self.betas)
+        if 'croston' in methods:
+            states['croston'] = fit_croston(values, first_day, self.alphas)[:2]
+        if 'seasonal_naive' in methods:
+            states['seasonal_naive'] = (fit_seasonal_naive(values, first_day, self.seasons),)
+        return states
+
+    @staticmethod
+    def _forecast_states(states, days_ahead):
+        """method -> products x days_ahead forecasts from fitted states"""
+        horizon = np.arange(1, days_ahead + 1)
+        forecasts = {}
+        if 'ses' in states:
+            level, = states['ses']
+            forecasts['ses'] = np.repeat(level[:, None], days_ahead, axis=1)
+        if 'holt' in states:
+            level, trend = states['holt']
+            forecasts['holt'] = level[:, None] + trend[:, None] * horizon[None, :]
+        if 'croston' in states:
+            size, interval = states['croston']
+            forecasts['croston'] = np.repeat((size / interval)[:, None], days_ahead, axis=1)
+        if 'seasonal_naive' in states:
+            profile, = states['seasonal_naive']
+            forecasts['seasonal_naive'] = profile[:, (horizon - 1) % profile.shape[1]]
+        return {method: np.maximum(forecast, 0) for method, forecast in forecasts.items()}
+
+    def fit(self, values, first_day=None, product_ids=None, last_date=None):
+        """Fit every product (row of values) in one pass per method
+
+        first_day gives the column of each product's first sale (defaults to
+        0); last_date is the calendar date of the last column.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        n_products, n_days = values.shape
+        first_day = np.zeros(n_products, dtype=np.int64) if first_day is None else np.asarray(first_day)
+        methods = METHODS if self.method == 'auto' else [self.method]
+
+        if len(methods) > 1 and n_days > self.validation_days:
+            cutoff = n_days - self.validation_days
+            holdout = self._forecast_states(
+                self._fit_states(values[:, :cutoff], first_day, methods), self.validation_days
+            )
+            actual = values[:, cutoff:]
+            errors = np.stack([np.abs(holdout[method] - actual).mean(axis=1) for method in methods])
+            choice = np.argmin(errors, axis=0)
+            # Products with hardly any history before the holdout keep SES
+            choice[first_day >= cutoff - 7] = methods.index('ses')
+            self.validation_mae = errors[choice, np.arange(n_products)]
+        else:
+            choice = np.zeros(n_products, dtype=np.int64)
+            self.validation_mae = None
+
+        self.methods = np.asarray(methods, dtype=object)[choice]
+        self.states = self._fit_states(values, first_day, methods)
+        self.product_ids = np.asarray(product_ids) if product_ids is not None else np.arange(n_products)
+        self.product_index = {pid.item(): row for row, pid in enumerate(self.product_ids)}
+        self.last_date = pd.Timestamp(last_date) if last_date is not None else None
+        return self
+
+    def fit_panel(self, panel, product_ids=None, column='quantity'):
+        """Fit on the rows of a SalesPanel (all products or product_ids)"""
+        rows = np.arange(len(panel.product_ids)) if product_ids is None else np.array(
+            [panel.product_index[pid] for pid in product_ids], dtype=np.int64
+        )
+        return self.fit(
+            panel.values[column][rows], panel.first_day[rows],
+            product_ids=panel.product_ids[rows], last_date=panel.dates[-1] if panel.n_days else None
+        )
+
+    def forecast(self, days_ahead=7):
+        """products x days_ahead forecasts, each product with its own method"""
+        if self.states is None:
+            raise ValueError("Model not fitted yet. Call fit first.")
+
+        forecasts = self._forecast_states(self.states, days_ahead)
+        result = np.empty((len(self.methods), days_ahead))
+        for method, forecast in forecasts.items():
+            rows = self.methods == method
+            result[rows] = forecast[rows]
+        return result
+
+    def forecast_product(self, product_id, days_ahead=7):
+        """Forecast list for one product"""
+        row = self.product_index[product_id]
+        return self.forecast(days_ahead)[row].tolist()
+
+    def save_model(self, filepath):
+        """Save the fitted states"""
+        if self.states is None:
+            raise ValueError("No model to save. Fit the model first.")
+        joblib.dump(self.__dict__, filepath)
+
+    def load_model(self, filepath):
+        """Load fitted states written by save_model"""
+        self.__dict__.update(joblib.load(filepath))
+
+class DemandRouter:
+    """Split products between the statistical fast path and the ML models
+
+    Products selling fewer than velocity_threshold units per day on average
+    over the last window_days, or with less than min_history_days of
+    history, go to StatisticalForecaster; the rest get DemandForecaster.
+    """
+
+    def __init__(self, velocity_threshold=2.0, window_days=28, min_history_days=30):
+        self.velocity_threshold = velocity_threshold
+        self.window_days = window_days
+        self.min_history_days = min_history_days
+
+    def route(self, panel, column='quantity'):
+        """Returns (ml_product_ids, statistical_product_ids)"""
+        values = panel.values[column]
+        window = min(self.window_days, panel.n_days)
+        history_days = panel.n_days - panel.first_day
+        velocity = values[:, panel.n_days - window:].sum(axis=1, dtype=np.float64) / np.maximum(
+            np.minimum(history_days, window), 1
+        )
+
+        fast = (velocity >= self.velocity_threshold) & (history_days >= self.min_history_days)
+        return panel.product_ids[fast].tolist(), panel.product_ids[~fast].tolist()
@@ -0,0 +1,24 @@
+import pandas as pd
+
+import data_preprocessing
+import dynamic_pricing_model
+import inventory_optimization
+from data_preprocessing import DataPreprocessor
+from dynamic_pricing_model import DynamicPricingModel
+from inventory_optimization import InventoryOptimizer
+
+def test_preprocessor_codes_are_shared_with_pricing_and_inventory(tmp_path, monkeypatch):
+    path = str(tmp_path / 'category_codes.json')
+    for module in (data_preprocessing, dynamic_pricing_model, inventory_optimization):
+        monkeypatch.setattr(module, 'DEFAULT_CATEGORY_CODES_PATH', path)
+
+    # A preprocessor with its own cache_dir still uses the shared file
+    preprocessor = DataPreprocessor(cache_dir=str(tmp_path / 'cache'))
+    encoded = preprocessor.encode_categorical_features(
+        pd.DataFrame({'category': ['Garden', 'Toys', 'Garden']}), ['category']
+    )
+    codes = dict(zip(['Garden', 'Toys'], encoded['category'].iloc[:2]))
+
+    for model in (DynamicPricingModel(), InventoryOptimizer()):
+        for category, code in codes.items():
+            assert model.category_dictionary.code({'category': category}) == code
@@ -0,0 +1,52 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from data_preprocessing import DataPreprocessor
+
+def _database(path):
+    rng = np.random.default_rng(0)
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE inventory (id INTEGER PRIMARY KEY, name TEXT, sku TEXT, category TEXT, price REAL, cost REAL);
+        CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE sales (id INTEGER PRIMARY KEY, product_id INTEGER, customer_id INTEGER, quantity INTEGER,
+                            unit_price REAL, total_amount REAL, sale_date TIMESTAMP);
+    ''')
+    conn.executemany('INSERT INTO inventory VALUES (?, ?, ?, ?, ?, ?)',
+                     [(1, 'A', 'SKU-1', 'Garden', 10.0, 6.0), (2, 'B', 'SKU-2', 'Toys', 20.0, 12.0)])
+    conn.execute("INSERT INTO customers VALUES (1, 'C')")
+    rows = []
+    for i in range(400):
+        quantity = int(rng.integers(1, 6))
+        amount = float(quantity * rng.uniform(5, 50))
+        rows.append((
+            i + 1, int(rng.integers(1, 4)), 1,  # product 3 is missing from the inventory
+            None if i % 17 == 0 else quantity, 10.0,
+            None if i % 11 == 0 else (amount * 20 if i % 50 == 0 else amount),
+            f'2026-01-{1 + i % 28:02d} {i % 24:02d}:00:00'
+        ))
+    conn.executemany('INSERT INTO sales VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+
+def test_pushed_down_daily_sales_match_the_pandas_cleaning(tmp_path):
+    db_path = str(tmp_path / 'sales.db')
+    _database(db_path)
+
+    preprocessor = DataPreprocessor(db_path, cache_dir=str(tmp_path / 'cache'))
+    preprocessor.load_data_from_db()
+    preprocessor.clean_sales_data()
+    cleaned = preprocessor.sales_df
+    expected = (
+        cleaned.assign(sale_date=cleaned['sale_date'].dt.normalize())
+        .groupby(['product_id', 'sale_date'], as_index=False)[['quantity', 'total_amount']].sum()
+    )
+
+    daily = DataPreprocessor(db_path, cache_dir=str(tmp_path / 'cache')).load_daily_sales_from_db()
+
+    pd.testing.assert_frame_equal(
+        daily[['product_id', 'sale_date', 'quantity', 'total_amount']].reset_index(drop=True),
+        expected.reset_index(drop=True), check_dtype=False
+    )
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+from sklearn.base import clone
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+
+from demand_forecasting import DemandForecaster
+
+def _data(rng, n, shift=0.0):
+    X = pd.DataFrame(rng.normal(size=(n, 3)), columns=['a', 'b', 'c'])
+    y = 5 + 2 * X['a'] - X['b'] + rng.normal(scale=0.2, size=n) + shift
+    return X, y
+
+@pytest.mark.parametrize('model', [
+    GradientBoostingRegressor(n_estimators=100, random_state=0),
+    RandomForestRegressor(n_estimators=50, random_state=0),
+    xgb.XGBRegressor(n_estimators=100, random_state=0, verbosity=0)
+], ids=['gb', 'rf', 'xgb'])
+def test_warm_start_stays_close_to_a_full_refit(model):
+    rng = np.random.default_rng(0)
+    X_old, y_old = _data(rng, 300)
+    # A week whose demand sits well above what the model learned
+    X_new, y_new = _data(rng, 7, shift=3.0)
+    X, y = pd.concat([X_old, X_new], ignore_index=True), pd.concat([y_old, y_new], ignore_index=True)
+
+    forecaster = DemandForecaster()
+    forecaster.best_model = clone(model).fit(X_old, y_old)
+    forecaster.feature_columns = list(X.columns)
+    forecaster.trained_at = datetime.now()
+    forecaster.warm_start_update(X, y)
+
+    refit = clone(model).fit(X, y)
+    warm_predictions = forecaster.predict(X_old)
+    refit_predictions = np.maximum(refit.predict(X_old), 0)
+    assert abs(warm_predictions.mean() - refit_predictions.mean()) < 0.1
+    assert np.abs(warm_predictions - y_old).mean() < np.abs(refit_predictions - y_old).mean() + 0.2
+
+def test_too_few_new_rows_fall_back_to_a_full_retrain():
+    rng = np.random.default_rng(0)
+    X, y = _data(rng, 300)
+    forecaster = DemandForecaster()
+    forecaster.best_model = GradientBoostingRegressor(n_estimators=20, random_state=0).fit(X, y)
+    forecaster.feature_columns = list(X.columns)
+    forecaster.validation_mae = 1.0
+    forecaster.trained_at = datetime.now()
+    forecaster.trained_through = pd.Timestamp('2026-01-01')
+
+    needs_full, reason = forecaster.needs_full_retrain(X.head(1), y.head(1))
+    assert needs_full and reason.startswith('too few new rows')
+    assert forecaster.needs_full_retrain(X.head(7), y.head(7)) == (False, 'warm_start')
+
+def test_forecast_batch_rejects_short_histories():
+    rng = np.random.default_rng(0)
+    X, y = _data(rng, 100)
+    forecaster = DemandForecaster()
+    forecaster.best_model = GradientBoostingRegressor(n_estimators=5).fit(X, y)
+
+    with pytest.raises(ValueError, match='at least 14 days'):
+        forecaster.forecast_batch(np.ones((3, 13)), pd.Timestamp('2026-01-31'))
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from category_dictionary import CategoryDictionary
+from global_demand_model import GlobalDemandForecaster
+
+FEATURES = ['day_of_week', 'month', 'is_weekend', 'quantity_lag_1', 'quantity_lag_7',
+            'quantity_lag_14', 'quantity_ma_7', 'quantity_ma_14']
+
+def _panel():
+    rng = np.random.default_rng(0)
+    frames = []
+    for product_id, category, level in [(11, 'Garden', 2.0), (12, 'Toys', 8.0), (13, 'Garden', 4.0)]:
+        frame = pd.DataFrame(rng.normal(size=(60, len(FEATURES))), columns=FEATURES)
+        frame['product_id'] = product_id
+        frame['category'] = category
+        frame['quantity'] = level + frame['quantity_lag_1'] + rng.normal(scale=0.1, size=60)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+def test_load_uses_the_codes_the_model_was_trained_on(tmp_path):
+    panel = _panel()
+    model = GlobalDemandForecaster(CategoryDictionary(str(tmp_path / 'train_codes.json')), n_estimators=30, n_jobs=1)
+    model.train_global(panel)
+    expected = model.predict(panel)
+    model.save_model(str(tmp_path / 'global.joblib'))
+
+    # A serving process whose dictionary coded the same values differently
+    other = CategoryDictionary(str(tmp_path / 'serving_codes.json'))
+    other.encode('product_id', [13, 12, 11])
+    other.encode('category', ['Toys', 'Garden'])
+    served = GlobalDemandForecaster(other)
+    served.load_model(str(tmp_path / 'global.joblib'))
+
+    assert served.category_dictionary is not other
+    np.testing.assert_allclose(served.predict(panel), expected)
+
+def test_load_keeps_a_matching_dictionary(tmp_path):
+    dictionary = CategoryDictionary(str(tmp_path / 'codes.json'))
+    model = GlobalDemandForecaster(dictionary, n_estimators=10, n_jobs=1)
+    model.train_global(_panel())
+    model.save_model(str(tmp_path / 'global.joblib'))
+
+    # Values added after training keep the trained codes valid
+    shared = CategoryDictionary(str(tmp_path / 'codes.json'))
+    shared.encode('category', ['Electronics'])
+    served = GlobalDemandForecaster(shared)
+    served.load_model(str(tmp_path / 'global.joblib'))
+    assert served.category_dictionary is shared
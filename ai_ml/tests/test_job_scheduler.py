@@ -0,0 +1,33 @@
+from datetime import datetime
+
+import pytest
+
+from job_scheduler import Schedule
+
+def test_monthly_rolls_over_the_year():
+    schedule = Schedule.monthly(day=15, at='02:00')
+    assert schedule.next_after(datetime(2026, 12, 20)) == datetime(2027, 1, 15, 2, 0)
+    assert schedule.last_before(datetime(2027, 1, 10)) == datetime(2026, 12, 15, 2, 0)
+
+def test_monthly_trigger_time_is_exclusive_and_inclusive():
+    schedule = Schedule.monthly(day=1, at='00:00')
+    trigger = datetime(2026, 3, 1)
+    assert schedule.next_after(trigger) == datetime(2026, 4, 1)
+    assert schedule.last_before(trigger) == trigger
+    # Short months are never skipped
+    assert schedule.next_after(datetime(2026, 2, 28, 23, 59)) == datetime(2026, 3, 1)
+
+def test_monthly_day_must_exist_in_every_month():
+    with pytest.raises(ValueError):
+        Schedule.monthly(day=31)
+
+def test_weekly_crosses_month_and_year():
+    schedule = Schedule.weekly('monday', at='03:30')
+    # Wednesday 2026-12-30 -> Monday 2027-01-04
+    assert schedule.next_after(datetime(2026, 12, 30)) == datetime(2027, 1, 4, 3, 30)
+    assert schedule.last_before(datetime(2026, 12, 30)) == datetime(2026, 12, 28, 3, 30)
+
+def test_daily_crosses_year():
+    schedule = Schedule.daily('02:00')
+    assert schedule.next_after(datetime(2026, 12, 31, 3, 0)) == datetime(2027, 1, 1, 2, 0)
+    assert schedule.last_before(datetime(2027, 1, 1, 1, 0)) == datetime(2026, 12, 31, 2, 0)
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+from demand_forecasting import DemandForecaster
+from model_registry import ModelRegistry, mapped_bytes
+
+def _forecaster(seed):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(200, 3)), columns=['a', 'b', 'c'])
+    y = X['a'] * 2 + rng.normal(scale=0.1, size=200)
+    forecaster = DemandForecaster()
+    forecaster.best_model = RandomForestRegressor(n_estimators=20, random_state=seed).fit(X, y)
+    forecaster.feature_columns = list(X.columns)
+    forecaster.compile_model()
+    # Small enough for the compiled (memory-mapped) predict path
+    return forecaster, X.head(50)
+
+def test_rewriting_a_mapped_artifact_keeps_readers_valid(tmp_path):
+    name = ModelRegistry.demand_model_name(1)
+    path = str(tmp_path / name)
+    old, X = _forecaster(0)
+    old.save_model(path)
+
+    registry = ModelRegistry(str(tmp_path), refresh_interval=None)
+    registry.build_manifest()
+    served = registry.get(name)
+    assert mapped_bytes(served) > 0
+    expected = served.predict(X)
+
+    # The nightly retrain rewrites the artifact the registry has mapped
+    new, _ = _forecaster(1)
+    new.save_model(path)
+    np.testing.assert_array_equal(served.predict(X), expected)
+
+    registry.build_manifest()
+    np.testing.assert_array_equal(registry.get(name).predict(X), new.predict(X))
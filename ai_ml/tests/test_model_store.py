@@ -0,0 +1,105 @@
+import json
+import os
+
+import pytest
+
+from model_store import PackedModelStore
+
+def test_transaction_publishes_one_generation(tmp_path):
+    store = PackedModelStore(str(tmp_path))
+    with store.transaction():
+        store.put('a', {'value': 1})
+        store.put('b', [1, 2, 3])
+
+    assert store.generation == 1
+    reader = PackedModelStore(str(tmp_path))
+    assert reader.get('a') == {'value': 1}
+    assert reader.get('b') == [1, 2, 3]
+
+def test_failed_transaction_publishes_nothing(tmp_path):
+    store = PackedModelStore(str(tmp_path))
+    store.put('a', 1)
+
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.put('a', 2)
+            raise RuntimeError('boom')
+
+    assert store.generation == 1
+    assert PackedModelStore(str(tmp_path)).get('a') == 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+def test_checkpoint_publishes_and_continues(tmp_path):
+    store = PackedModelStore(str(tmp_path))
+    with store.transaction():
+        store.put('a', 1)
+        assert store.checkpoint() == 1
+        assert PackedModelStore(str(tmp_path)).get('a') == 1
+        store.put('b', 2)
+
+    reader = PackedModelStore(str(tmp_path))
+    assert reader.generation == 2
+    assert reader.get('a') == 1
+    assert reader.get('b') == 2
+
+def test_prune_keeps_referenced_packs(tmp_path):
+    store = PackedModelStore(str(tmp_path))
+    store.put('a', 1)
+    store.put('b', 2)
+    store.put('b', 3)
+
+    removed = store.prune(keep=1)
+
+    assert 'index-000001.json' in removed
+    assert 'index-000002.json' in removed
+    # 'a' still lives in the first pack; 'b' from the second is superseded
+    assert 'pack-000001-000.bin' not in removed
+    assert 'pack-000002-000.bin' in removed
+    reader = PackedModelStore(str(tmp_path))
+    assert reader.get('a') == 1
+    assert reader.get('b') == 3
+
+def test_checkpoints_write_delta_indexes(tmp_path):
+    store = PackedModelStore(str(tmp_path))
+    with store.transaction():
+        for i in range(50):
+            store.put(f'model_{i}', i)
+
+    with store.transaction():
+        store.put('model_0', 'new')
+        store.delete('model_1')
+        store.checkpoint()
+        with open(tmp_path / 'index-000002.json') as f:
+            delta = json.load(f)
+        assert delta['base'] == 'index-000001.json'
+        assert list(delta['entries']) == ['model_0'] and delta['deleted'] == ['model_1']
+
+        reader = PackedModelStore(str(tmp_path))
+        assert len(reader) == 49 and reader.get('model_0') == 'new'
+        store.put('model_2', 'newer')
+
+    # The final commit folds the chain into a full index
+    with open(tmp_path / 'index-000003.json') as f:
+        assert 'base' not in json.load(f)
+    reader = PackedModelStore(str(tmp_path))
+    assert len(reader) == 49 and reader.get('model_2') == 'newer' and 'model_1' not in reader
+
+def test_prune_keeps_the_live_delta_chain(tmp_path):
+    store = PackedModelStore(str(tmp_path))
+    store.put('a', 1)
+    store.put('a', 2)
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.put('b', 3)
+            store.checkpoint()
+            store.put('c', 4)
+            store.checkpoint()
+            raise RuntimeError('crashed after two checkpoints')
+
+    store.prune(keep=1)
+
+    reader = PackedModelStore(str(tmp_path))
+    assert (reader.get('a'), reader.get('b'), reader.get('c')) == (2, 3, 4)
+    assert sorted(name for name in os.listdir(tmp_path) if name.startswith('index-')) == [
+        'index-000002.json', 'index-000003.json', 'index-000004.json'
+    ]
@@ -0,0 +1,81 @@
+import json
+import os
+
+import pytest
+
+from model_registry import ModelRegistry
+from model_store import PackedModelStore
+from model_training_pipeline import ModelTrainingPipeline, FINGERPRINTS_NAME
+
+def _fake_retrain(pipeline, retrained=None):
+    """Stand-in for _retrain_products that writes a small artifact per product"""
+    def retrain(product_ids, full_retrain, on_result):
+        for product_id in product_ids:
+            pipeline.model_store.put(pipeline._demand_model_path(product_id), {'product_id': product_id})
+            if retrained is not None:
+                retrained.append(product_id)
+            on_result({'product_id': product_id, 'status': 'trained', 'seconds': 0.0, 'error': None})
+    return retrain
+
+def _run(store_root, product_ids, journal_path=None, resume=False, retrain=None, retrained=None, **options):
+    pipeline = ModelTrainingPipeline(model_store=store_root, journal_path=journal_path, router=False,
+                                     checkpoint_every=2, **options)
+    pipeline._retrain_products = (retrain or _fake_retrain)(pipeline) if retrained is None else _fake_retrain(pipeline, retrained)
+    fingerprints = {product_id: {'rows': 1} for product_id in product_ids}
+    return pipeline.retrain_product_models(product_ids, fingerprints, full_retrain=True, resume=resume)
+
+def test_store_generations_stay_bounded_across_runs(tmp_path):
+    root = str(tmp_path / 'store')
+    product_ids = list(range(10))
+    for _ in range(4):
+        results = _run(root, product_ids, store_keep=2)
+        assert len(results) == len(product_ids)
+
+    names = os.listdir(root)
+    assert len([name for name in names if name.startswith('index-')]) == 2
+    store = PackedModelStore(root)
+    assert store.get(ModelRegistry.demand_model_name(3)) == {'product_id': 3}
+    # Packs written by pruned generations are gone
+    packs = {name for name in names if name.startswith('pack-')}
+    assert {entry[0] for entry in store.entries.values()} <= packs
+    assert len(packs) < 4 * len(product_ids) // 2
+
+def test_checkpoints_only_write_what_changed(tmp_path, monkeypatch):
+    root = str(tmp_path / 'store')
+    _run(root, list(range(10)))
+    before = set(os.listdir(root))
+    pipeline_names = lambda index: [name for name in index['entries'] if name.startswith('demand_model_product_')]
+
+    # Keep the run's checkpoint indexes around to inspect them
+    monkeypatch.setattr(PackedModelStore, 'prune', lambda self, keep=2: [])
+    _run(root, list(range(10)))
+    indexes = sorted(name for name in set(os.listdir(root)) - before if name.startswith('index-'))
+    checkpoints = []
+    for name in indexes[:-1]:
+        with open(os.path.join(root, name)) as f:
+            checkpoints.append(json.load(f))
+    assert checkpoints and all(index.get('base') for index in checkpoints)
+    # Two products per checkpoint, and no fingerprints until the run ends
+    assert all(len(pipeline_names(index)) <= 2 and FINGERPRINTS_NAME not in index['entries'] for index in checkpoints)
+
+def test_resumed_run_records_fingerprints_of_earlier_products(tmp_path):
+    root = str(tmp_path / 'store')
+    journal_path = str(tmp_path / 'journal.db')
+    product_ids = list(range(10))
+
+    def crash_after_five(pipeline):
+        retrain = _fake_retrain(pipeline)
+        def crashing(product_ids, full_retrain, on_result):
+            retrain(product_ids[:5], full_retrain, on_result)
+            raise KeyboardInterrupt
+        return crashing
+
+    with pytest.raises(KeyboardInterrupt):
+        _run(root, product_ids, journal_path=journal_path, retrain=crash_after_five)
+    retrained = []
+    _run(root, product_ids, journal_path=journal_path, resume=True, retrained=retrained)
+
+    # The four products checkpointed before the crash are not retrained
+    assert retrained == product_ids[4:]
+    pipeline = ModelTrainingPipeline(model_store=root, journal_path=None, router=False)
+    assert sorted(int(product_id) for product_id in pipeline.load_fingerprints()) == product_ids
@@ -0,0 +1,77 @@
+from pipeline_dag import StageGraph
+
+def _graph(tmp_path, source, calls):
+    """load (keyed on source) -> double -> report"""
+    graph = StageGraph(cache_dir=str(tmp_path / 'stages'), max_workers=2)
+
+    def load():
+        calls.append('load')
+        return {'value': source['value']}
+
+    def double(load):
+        calls.append('double')
+        return load['value'] * 2
+
+    def report(double):
+        calls.append('report')
+        return double > 10
+
+    graph.add_stage('load', load, source_key=lambda: source['value'])
+    graph.add_stage('double', double, deps=['load'])
+    graph.add_stage('report', report, deps=['double'])
+    return graph
+
+def _statuses(report):
+    return {name: entry['status'] for name, entry in report.items()}
+
+def test_unchanged_source_is_served_from_cache(tmp_path):
+    source, calls = {'value': 3}, []
+    _graph(tmp_path, source, calls).run()
+    assert calls == ['load', 'double', 'report']
+
+    calls.clear()
+    report = _graph(tmp_path, source, calls).run()
+    assert calls == []
+    assert set(_statuses(report).values()) == {'cached'}
+
+def test_changed_source_reruns_dependents(tmp_path):
+    source, calls = {'value': 3}, []
+    _graph(tmp_path, source, calls).run()
+
+    source['value'] = 4
+    calls.clear()
+    graph = _graph(tmp_path, source, calls)
+    report = graph.run()
+    assert _statuses(report) == {'load': 'ran', 'double': 'ran', 'report': 'ran'}
+    assert graph.output('double') == 8
+
+def test_equal_output_does_not_invalidate_dependents(tmp_path):
+    source, calls = {'value': 3}, []
+    graph = _graph(tmp_path, source, calls)
+    graph.run()
+
+    # A forced rerun producing the same output keeps downstream keys valid
+    calls.clear()
+    report = graph.run(force=['load'])
+    assert calls == ['load']
+    assert _statuses(report) == {'load': 'ran', 'double': 'cached', 'report': 'cached'}
+
+def test_always_run_stage_is_never_cached(tmp_path):
+    graph = StageGraph(cache_dir=str(tmp_path / 'stages'))
+    calls = []
+    graph.add_stage('publish', lambda: calls.append('publish'), always_run=True)
+    graph.run()
+    graph.run()
+    assert calls == ['publish', 'publish']
+
+def test_failed_stage_blocks_dependents(tmp_path):
+    graph = StageGraph(cache_dir=str(tmp_path / 'stages'))
+
+    def fail():
+        raise RuntimeError('boom')
+
+    graph.add_stage('fail', fail)
+    graph.add_stage('after', lambda fail: fail, deps=['fail'])
+    graph.add_stage('other', lambda: 1)
+    report = graph.run()
+    assert _statuses(report) == {'fail': 'failed', 'after': 'blocked', 'other': 'ran'}
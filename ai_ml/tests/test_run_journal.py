@@ -0,0 +1,44 @@
+import pytest
+
+from run_journal import RunJournal
+
+def _result(product_id, status, error=None):
+    return {'product_id': product_id, 'status': status, 'seconds': 0.1, 'error': error}
+
+def test_resume_skips_completed_products(tmp_path):
+    journal = RunJournal(str(tmp_path / 'journal.db'))
+    run_id, completed = journal.begin_run('demand', [1, 2, 3], params={'full': False})
+    assert completed == set()
+    journal.record(run_id, [_result(1, 'trained'), _result(2, 'failed', 'boom')])
+    journal.close()
+
+    # A crash before finish_run leaves the run resumable
+    journal = RunJournal(str(tmp_path / 'journal.db'))
+    resumed_id, completed = journal.begin_run('demand', [1, 2, 3, 4], params={'full': False}, resume=True)
+    assert resumed_id == run_id
+    assert completed == {'1'}
+    assert journal.summary(run_id)['counts'] == {'trained': 1, 'failed': 1, 'pending': 2}
+    journal.close()
+
+def test_resume_with_other_params_raises(tmp_path):
+    journal = RunJournal(str(tmp_path / 'journal.db'))
+    journal.begin_run('demand', [1], params={'full': False})
+    with pytest.raises(ValueError):
+        journal.begin_run('demand', [1], params={'full': True}, resume=True)
+    journal.close()
+
+def test_new_run_abandons_unfinished_ones(tmp_path):
+    journal = RunJournal(str(tmp_path / 'journal.db'))
+    old_id, _ = journal.begin_run('demand', [1])
+    new_id, completed = journal.begin_run('demand', [1])
+    assert new_id != old_id and completed == set()
+
+    status = journal.conn.execute('SELECT status FROM runs WHERE id = ?', (old_id,)).fetchone()[0]
+    assert status == 'abandoned'
+
+    journal.record(new_id, [_result(1, 'trained')])
+    journal.finish_run(new_id)
+    # Nothing is left to resume, so a resume starts a new run
+    resumed_id, completed = journal.begin_run('demand', [1], resume=True)
+    assert resumed_id not in (old_id, new_id) and completed == set()
+    journal.close()
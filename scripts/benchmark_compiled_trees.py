@@ -0,0 +1,73 @@
+"""
+Benchmark for compiled tree ensembles
+Compares CompiledTreeEnsemble.predict against the native predict of random
+forest, gradient boosting and XGBoost regressors for several batch sizes
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import xgboost as xgb
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ai_ml'))
+from compiled_trees import compile_tree_ensemble
+
+def make_demand_data(n_rows, seed=42):
+    """Synthetic rows with the DemandForecaster feature layout"""
+    rng = np.random.default_rng(seed)
+    day_of_week = rng.integers(0, 7, n_rows)
+    level = rng.gamma(2.0, 3.0, n_rows)
+
+    X = np.column_stack([
+        day_of_week,
+        rng.integers(1, 13, n_rows),
+        (day_of_week >= 5).astype(int),
+        rng.poisson(level), rng.poisson(level), rng.poisson(level),
+        level + rng.normal(0, 0.5, n_rows), level + rng.normal(0, 0.3, n_rows)
+    ]).astype(np.float64)
+    y = rng.poisson(level * (1 + 0.3 * (day_of_week >= 5))).astype(np.float64)
+    return X, y
+
+def time_per_call(func, X, min_seconds):
+    """Mean seconds per call, repeating until min_seconds have elapsed"""
+    calls, start = 0, time.perf_counter()
+    while True:
+        func(X)
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / calls
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--train-rows', type=int, default=5000)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 100, 100000])
+    parser.add_argument('--min-seconds', type=float, default=1.0)
+    args = parser.parse_args()
+
+    X_train, y_train = make_demand_data(args.train_rows)
+    models = {
+        'random_forest': RandomForestRegressor(n_estimators=100, random_state=42),
+        'gradient_boosting': GradientBoostingRegressor(n_estimators=100, random_state=42),
+        'xgboost': xgb.XGBRegressor(n_estimators=100, random_state=42)
+    }
+
+    print(f"{'model':<18} {'batch':>7} {'native':>12} {'compiled':>12} {'speedup':>8}")
+    for name, model in models.items():
+        model.fit(X_train, y_train)
+        compiled = compile_tree_ensemble(model)
+
+        for batch_size in args.batch_sizes:
+            X, _ = make_demand_data(batch_size, seed=batch_size)
+            assert np.array_equal(model.predict(X), compiled.predict(X)), f"{name}: predictions differ"
+
+            native = time_per_call(model.predict, X, args.min_seconds)
+            fast = time_per_call(compiled.predict, X, args.min_seconds)
+            print(f"{name:<18} {batch_size:>7} {native * 1e3:>10.3f}ms {fast * 1e3:>10.3f}ms {native / fast:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
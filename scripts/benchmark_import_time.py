@@ -0,0 +1,96 @@
+"""
+Import-time benchmark for the ai_ml package
+Runs `python -X importtime` for each module in a fresh interpreter and
+records the total import time and the heaviest dependencies it pulled in
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+DEFAULT_MODULES = [
+    'ai_ml',
+    'ai_ml.data_preprocessing',
+    'ai_ml.demand_forecasting',
+    'ai_ml.dynamic_pricing_model',
+    'ai_ml.inventory_optimization',
+    'ai_ml.customer_segmentation',
+    'ai_ml.customer_targeting',
+    'ai_ml.personalized_promotions',
+    'ai_ml.model_registry',
+    'ai_ml.global_demand_model'
+]
+
+LINE_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+def import_profile(statement):
+    """Parse -X importtime output of one statement in a fresh interpreter
+
+    Returns [(module, self_us, cumulative_us, depth)] in completion order.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{statement!r} failed:\n{result.stderr[-2000:]}")
+
+    profile = []
+    for line in result.stderr.splitlines():
+        match = LINE_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            profile.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return profile
+
+def summarize(module, profile, top):
+    # Top-level entries are the imports made directly by the statement
+    total_us = sum(cumulative for _, _, cumulative, depth in profile if depth == 0)
+    packages = {}
+    for name, _, cumulative, _ in profile:
+        package = name.split('.')[0]
+        if package != module.split('.')[0]:
+            packages[package] = max(packages.get(package, 0), cumulative)
+
+    return {
+        'module': module,
+        'total_ms': total_us / 1000,
+        'modules_imported': len(profile),
+        'heaviest': [
+            {'package': package, 'cumulative_ms': us / 1000}
+            for package, us in sorted(packages.items(), key=lambda item: -item[1])[:top]
+        ]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--repeats', type=int, default=3, help='best of N fresh interpreters')
+    parser.add_argument('--top', type=int, default=3, help='heaviest dependencies to report')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    # Warm the OS file cache so the first module is not penalized
+    import_profile('import ai_ml')
+
+    results = []
+    for module in args.modules:
+        runs = [summarize(module, import_profile(f'import {module}'), args.top) for _ in range(args.repeats)]
+        best = min(runs, key=lambda run: run['total_ms'])
+        results.append(best)
+
+        heaviest = ', '.join(f"{item['package']} {item['cumulative_ms']:.0f}ms" for item in best['heaviest'])
+        print(f"{module:<32} {best['total_ms']:9.1f}ms  {best['modules_imported']:5d} modules  {heaviest}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'results': results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
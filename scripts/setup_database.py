@@ -3,10 +3,30 @@ Database setup script for Walmart Analytics Platform
 Creates tables for inventory, sales, customers, and forecasts
 """
 
+import argparse
 import sqlite3
 from datetime import datetime, timedelta
 import random
 
+# (name, table and columns) of the indexes the analytics queries rely on
+INDEXES = [
+    # Per-product daily aggregation (GROUP BY product_id, date(sale_date))
+    ('idx_sales_product_date', 'sales (product_id, sale_date)')
+]
+
+def create_indexes(cursor):
+    """Create any missing index from INDEXES (safe to run repeatedly)"""
+    for name, target in INDEXES:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {target}')
+
+def migrate_database(db_path='walmart_analytics.db'):
+    """Bring an existing database up to date without reseeding it"""
+    conn = sqlite3.connect(db_path)
+    create_indexes(conn.cursor())
+    conn.commit()
+    conn.close()
+    print("Database indexes are up to date!")
+
 def create_database():
     conn = sqlite3.connect('walmart_analytics.db')
     cursor = conn.cursor()
@@ -99,6 +119,8 @@ def create_database():
         )
     ''')
     
+    create_indexes(cursor)
+    
     conn.commit()
     print("Database tables created successfully!")
     
@@ -178,4 +200,11 @@ def seed_sample_data(cursor, conn):
     print("Sample data seeded successfully!")
 
 if __name__ == "__main__":
-    create_database()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--migrate', metavar='DB_PATH', nargs='?', const='walmart_analytics.db',
+                        help='add missing indexes to an existing database instead of creating and seeding one')
+    args = parser.parse_args()
+    if args.migrate:
+        migrate_database(args.migrate)
+    else:
+        create_database()